@@ -0,0 +1,79 @@
+"""
+Shared AWS client factory
+Caches one boto3 session per region and one client per service and region,
+configured with adaptive retries and a connection pool sized for concurrent
+callers. Setting MLOPS_AWS_BACKEND=local swaps in the offline backend.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+BACKEND_ENV = 'MLOPS_AWS_BACKEND'
+BACKENDS = ('aws', 'local')
+
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+RETRY_CONFIG = {'mode': 'adaptive', 'max_attempts': 8}
+
+_lock = threading.Lock()
+_sessions: Dict[Optional[str], boto3.session.Session] = {}
+# (backend, service, region) -> (client, pool size)
+_clients: Dict[Tuple[str, str, Optional[str]], Tuple[object, int]] = {}
+
+
+def get_backend() -> str:
+    backend = os.environ.get(BACKEND_ENV, 'aws')
+    if backend not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} must be one of {BACKENDS}, got {backend!r}")
+    return backend
+
+
+def get_session(region: Optional[str] = None) -> boto3.session.Session:
+    """Return the cached boto3 session for a region"""
+    with _lock:
+        if region not in _sessions:
+            _sessions[region] = boto3.session.Session(region_name=region)
+        return _sessions[region]
+
+
+def get_client(service: str, region: Optional[str] = None,
+               max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS):
+    """Return a shared client for a service and region.
+
+    Clients are thread-safe and reused across callers. A caller asking for a
+    larger connection pool than the cached client has gets a rebuilt client,
+    which then serves everyone.
+    """
+    backend = get_backend()
+    key = (backend, service, region)
+    with _lock:
+        cached = _clients.get(key)
+        if cached and cached[1] >= max_pool_connections:
+            return cached[0]
+
+    if backend == 'local':
+        from src.local_backend import create_local_client
+        client = create_local_client(service, region)
+    else:
+        session = get_session(region)
+        config = Config(max_pool_connections=max_pool_connections, retries=dict(RETRY_CONFIG))
+        # Session.client is not thread-safe, clients are
+        with _lock:
+            client = session.client(service, region_name=region, config=config)
+
+    with _lock:
+        cached = _clients.get(key)
+        if cached and cached[1] >= max_pool_connections:
+            return cached[0]
+        _clients[key] = (client, max_pool_connections)
+    return client
+
+
+def clear_clients():
+    """Drop cached sessions and clients, e.g. after switching backends"""
+    with _lock:
+        _sessions.clear()
+        _clients.clear()
@@ -1,11 +1,16 @@
 import pandas as pd
 import numpy as np
 from sklearn.datasets import make_classification
-import boto3
 import os
+import sys
 
-def generate_synthetic_data(n_samples=10000, test_size=0.2):
-    """Generate synthetic binary classification dataset"""
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.aws_clients import get_client
+from src.models.features import feature_dtype
+
+def generate_synthetic_data(n_samples=10000, test_size=0.2, dtype=None):
+    """Generate synthetic binary classification dataset with features in the feature dtype"""
     X, y = make_classification(
         n_samples=n_samples,
         n_features=20,
@@ -14,6 +19,7 @@ def generate_synthetic_data(n_samples=10000, test_size=0.2):
         n_clusters_per_class=1,
         random_state=42
     )
+    X = X.astype(feature_dtype(dtype), copy=False)
     
     # Create feature names
     feature_names = [f'feature_{i}' for i in range(X.shape[1])]
@@ -31,7 +37,7 @@ def generate_synthetic_data(n_samples=10000, test_size=0.2):
 
 def upload_to_s3(df, bucket_name, key):
     """Upload DataFrame to S3 as CSV"""
-    s3 = boto3.client('s3')
+    s3 = get_client('s3')
     csv_buffer = df.to_csv(index=False)
     s3.put_object(Bucket=bucket_name, Key=key, Body=csv_buffer)
     print(f"Uploaded {key} to s3://{bucket_name}/{key}")
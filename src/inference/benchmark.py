@@ -0,0 +1,196 @@
+"""
+Local inference benchmark harness
+Loads a model artifact through the SageMaker inference handlers and replays a
+fixed request workload against them, measuring cold start, memory, latency
+and throughput without a deployed endpoint
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+CONTENT_TYPE = 'text/csv'
+ACCEPT = 'application/json'
+
+
+def load_handlers():
+    """Import the inference handlers the SageMaker container runs"""
+    from src.inference import inference
+    return inference
+
+
+def extract_artifact(artifact: str, workdir: str) -> str:
+    """Return a model directory for a model.tar.gz (local or s3://) or directory"""
+    if os.path.isdir(artifact):
+        return artifact
+
+    if artifact.startswith('s3://'):
+        from src.aws_clients import get_client
+        bucket, key = artifact[len('s3://'):].split('/', 1)
+        local_path = os.path.join(workdir, 'model.tar.gz')
+        get_client('s3').download_file(bucket, key, local_path)
+        artifact = local_path
+
+    model_dir = os.path.join(workdir, 'model')
+    os.makedirs(model_dir, exist_ok=True)
+    with tarfile.open(artifact, 'r:gz') as tar:
+        tar.extractall(model_dir)
+    return model_dir
+
+
+def replay_payloads(n_requests: int = 200, rows_per_request: int = 1, seed: int = 42,
+                    float_format: Optional[str] = None) -> List[str]:
+    """Build a fixed workload of CSV request bodies from the synthetic test set"""
+    from src.data.generate_data import generate_synthetic_data
+
+    _, test_df = generate_synthetic_data(n_samples=5000)
+    features = test_df.drop('target', axis=1)
+    rng = np.random.RandomState(seed)
+    return [
+        features.iloc[rng.randint(0, len(features), size=rows_per_request)].to_csv(index=False, float_format=float_format)
+        for _ in range(n_requests)
+    ]
+
+
+def invoke(handlers, model, payload: str):
+    """Run one request through input_fn, predict_fn and output_fn"""
+    data = handlers.input_fn(payload, CONTENT_TYPE)
+    prediction = handlers.predict_fn(data, model)
+    return handlers.output_fn(prediction, ACCEPT)
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    """Percentiles in milliseconds of per-request latencies given in seconds"""
+    if not latencies:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'mean_ms': None, 'max_ms': None}
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    return {
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'mean_ms': float(latencies_ms.mean()),
+        'max_ms': float(latencies_ms.max()),
+    }
+
+
+def run_replay(handlers, model, payloads: List[str], concurrency: int = 1, warmup: int = 5) -> Dict:
+    """Replay payloads with ``concurrency`` requests in flight; returns latency and throughput"""
+    for payload in payloads[:warmup]:
+        invoke(handlers, model, payload)
+
+    def timed(payload):
+        started = time.perf_counter()
+        try:
+            invoke(handlers, model, payload)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, str(e)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, payloads))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, error in results if error is None]
+    errors = [error for _, error in results if error is not None]
+    return {
+        'concurrency': concurrency,
+        'requests': len(payloads),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'elapsed_seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        **latency_summary(latencies),
+    }
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _cold_start_probe(model_dir: str, payloads: List[str]) -> Dict:
+    """Runs in a fresh interpreter: import, load and first request, as a cold container would"""
+    started = time.perf_counter()
+    handlers = load_handlers()
+    imported = time.perf_counter()
+    import_rss_mb = _peak_rss_mb()
+
+    model = handlers.model_fn(model_dir)
+    loaded = time.perf_counter()
+    loaded_rss_mb = _peak_rss_mb()
+
+    invoke(handlers, model, payloads[0])
+    first_request = time.perf_counter()
+    for payload in payloads[1:]:
+        invoke(handlers, model, payload)
+
+    return {
+        'import_seconds': imported - started,
+        'model_load_seconds': loaded - imported,
+        'first_request_seconds': first_request - loaded,
+        'cold_start_seconds': first_request - started,
+        'import_rss_mb': import_rss_mb,
+        'loaded_rss_mb': loaded_rss_mb,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def measure_cold_start(model_dir: str, payloads: List[str]) -> Dict:
+    """Measure cold start time and resident memory of a model in a fresh interpreter"""
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(payloads, f)
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--cold-start-probe', model_dir, f.name],
+            capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Cold start probe failed: {e.stderr.strip()}") from e
+    finally:
+        os.remove(f.name)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_artifact(artifact: str, payloads: List[str], concurrency_levels: Optional[List[int]] = None,
+                       workdir: Optional[str] = None) -> Dict:
+    """Cold start, memory and a concurrency sweep for one model artifact"""
+    concurrency_levels = concurrency_levels or [1]
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        model_dir = extract_artifact(artifact, tmp)
+        cold_start = measure_cold_start(model_dir, payloads[:20])
+
+        handlers = load_handlers()
+        model = handlers.model_fn(model_dir)
+        sweep = [run_replay(handlers, model, payloads, concurrency) for concurrency in concurrency_levels]
+
+    return {
+        'artifact': artifact,
+        'requests_per_level': len(payloads),
+        'cold_start': cold_start,
+        'sweep': sweep,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--cold-start-probe':
+        with open(sys.argv[3]) as f:
+            probe_payloads = json.load(f)
+        print(json.dumps(_cold_start_probe(sys.argv[2], probe_payloads)))
+    else:
+        print(f"Usage: {sys.argv[0]} --cold-start-probe MODEL_DIR PAYLOADS_JSON")
+        exit(1)
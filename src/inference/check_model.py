@@ -1,35 +1,42 @@
 #!/usr/bin/env python3
 """
-Check if model artifacts exist in S3 before deployment
+Check the registered model manifest in S3 before deployment
 """
 
 import os
-import boto3
+import sys
 from botocore.exceptions import ClientError
 
-def check_model_exists(bucket_name, model_key='models/model.tar.gz'):
-    """Check if model artifacts exist in S3"""
-    s3_client = boto3.client('s3')
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.aws_clients import get_client
+from src.models.registry import LATEST_MANIFEST_KEY, ArtifactRegistry
+
+def check_model_exists(bucket_name):
+    """Check the latest model manifest in S3"""
+    registry = ArtifactRegistry(get_client('s3'), bucket_name)
     
     try:
-        response = s3_client.head_object(Bucket=bucket_name, Key=model_key)
-        size_mb = response['ContentLength'] / (1024 * 1024)
-        last_modified = response['LastModified']
-        
-        print(f"✅ Model found in S3:")
-        print(f"   Location: s3://{bucket_name}/{model_key}")
-        print(f"   Size: {size_mb:.2f} MB")
-        print(f"   Last Modified: {last_modified}")
-        return True
-        
+        manifest = registry.latest()
     except ClientError as e:
-        error_code = e.response['Error']['Code']
-        if error_code == '404':
-            print(f"❌ Model not found: s3://{bucket_name}/{model_key}")
-            print("   Make sure to train the model first!")
-        else:
-            print(f"❌ Error checking model: {e}")
+        print(f"❌ Error checking model: {e}")
+        return False
+    
+    if manifest is None:
+        print(f"❌ Model manifest not found: s3://{bucket_name}/{LATEST_MANIFEST_KEY}")
+        print("   Make sure to train the model first!")
         return False
+    
+    metrics = manifest.get('metrics', {})
+    print(f"✅ Model found in S3:")
+    print(f"   Location: {manifest['artifact']}")
+    print(f"   Hash: {manifest['hash']}")
+    print(f"   Size: {manifest['size_bytes'] / (1024 * 1024):.2f} MB")
+    print(f"   Features: {len(manifest.get('feature_schema', []))}")
+    if 'accuracy' in metrics:
+        print(f"   Accuracy: {metrics['accuracy']:.4f}")
+    print(f"   Created: {manifest['created_at']}")
+    return True
 
 if __name__ == "__main__":
     bucket_name = os.environ.get('S3_BUCKET_NAME')
@@ -0,0 +1,248 @@
+"""
+Batching endpoint client
+Splits a large DataFrame or array into request bodies under the endpoint
+payload limit, encodes them as CSV with the fastest lossless encoder, sends
+them with bounded concurrency and per-chunk retries, and reassembles the
+predictions in row order
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError, ConnectionClosedError, EndpointConnectionError, ReadTimeoutError
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+CONTENT_TYPE = 'text/csv'
+ACCEPT = 'application/json'
+
+# Serverless endpoints reject request bodies over 4 MB
+MAX_PAYLOAD_BYTES = 4 * 1024 * 1024
+# Aim below the limit so rows longer than the sampled ones still fit
+PAYLOAD_FILL = 0.9
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+RETRY_BASE_SECONDS = 0.1
+RETRY_MAX_SECONDS = 5.0
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException', 'ServiceUnavailable', 'InternalFailure',
+    'InternalDependencyException', 'ModelNotReadyException',
+}
+
+ENCODING_SAMPLE_ROWS = 500
+
+
+class InvocationError(RuntimeError):
+    """A chunk still failed after its retries"""
+
+    def __init__(self, chunk: int, rows: Tuple[int, int], error: Exception):
+        self.chunk = chunk
+        self.rows = rows
+        self.error = error
+        super().__init__(f"Chunk {chunk} (rows {rows[0]}-{rows[1]}) failed: {error}")
+
+
+class InvocationResult(NamedTuple):
+    predictions: np.ndarray
+    probabilities: np.ndarray
+    stats: Dict
+
+
+def _encode_pandas(values: np.ndarray, header: str) -> str:
+    return header + pd.DataFrame(values).to_csv(index=False, header=False)
+
+
+def _encode_savetxt(values: np.ndarray, header: str) -> str:
+    buffer = io.StringIO()
+    buffer.write(header)
+    np.savetxt(buffer, values, delimiter=',', fmt='%.9g' if values.dtype == np.float32 else '%.17g')
+    return buffer.getvalue()
+
+
+def _encode_repr(values: np.ndarray, header: str) -> str:
+    # repr gives the shortest string that parses back to the same float
+    if values.dtype == np.float32:
+        rows = values.astype(str).tolist()
+    else:
+        rows = ([repr(value) for value in row] for row in values.tolist())
+    return header + '\n'.join(','.join(row) for row in rows) + '\n'
+
+
+# All encoders are lossless for float32 and float64; they differ in speed and body size
+ENCODERS = {
+    'pandas': _encode_pandas,
+    'savetxt': _encode_savetxt,
+    'repr': _encode_repr,
+}
+
+
+def feature_values(values: np.ndarray) -> np.ndarray:
+    """float32 inputs stay float32, which encodes to shorter bodies; anything else becomes float64"""
+    return values.astype(np.float32 if values.dtype == np.float32 else np.float64, copy=False)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ConnectionClosedError, EndpointConnectionError, ReadTimeoutError)):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return error.response['Error'].get('Code') in RETRYABLE_ERROR_CODES or status >= 500
+    return False
+
+
+class EndpointClient:
+    """Invoke an endpoint with inputs of any size.
+
+    Args:
+        endpoint_name: Endpoint to invoke
+        runtime_client: sagemaker-runtime client; the shared one by default
+        max_payload_bytes: Largest request body sent
+        concurrency: Chunks in flight at once
+        max_retries: Retries per chunk for throttling and transient errors
+        encoding: Name in ENCODERS, or 'auto' to time them on the first input
+    """
+
+    def __init__(self, endpoint_name: str, runtime_client=None, max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                 encoding: str = 'auto'):
+        if encoding != 'auto' and encoding not in ENCODERS:
+            raise ValueError(f"encoding must be 'auto' or one of {list(ENCODERS)}, got {encoding!r}")
+        if runtime_client is None:
+            from src.aws_clients import get_client
+            runtime_client = get_client('sagemaker-runtime', max_pool_connections=concurrency)
+        self.endpoint_name = endpoint_name
+        self.runtime = runtime_client
+        self.max_payload_bytes = max_payload_bytes
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.encoding = encoding
+
+    def _choose_encoding(self, sample: np.ndarray, header: str) -> str:
+        """The encoder that turns the sample into bytes fastest"""
+        if self.encoding == 'auto':
+            timings = {}
+            for name, encoder in ENCODERS.items():
+                started = time.perf_counter()
+                encoder(sample, header)
+                timings[name] = time.perf_counter() - started
+            self.encoding = min(timings, key=timings.get)
+        return self.encoding
+
+    def plan_chunks(self, values: np.ndarray, header: str, encoding: str) -> List[Tuple[int, int]]:
+        """Row ranges whose encoded bodies should fit the payload limit, sized from a sample"""
+        n_rows = len(values)
+        sample = values[:ENCODING_SAMPLE_ROWS]
+        sample_bytes = len(ENCODERS[encoding](sample, '').encode()) if len(sample) else 1
+        bytes_per_row = max(sample_bytes / max(len(sample), 1), 1.0)
+        budget = (self.max_payload_bytes - len(header.encode())) * PAYLOAD_FILL
+        rows_per_chunk = max(1, int(budget / bytes_per_row))
+        return [(start, min(start + rows_per_chunk, n_rows)) for start in range(0, n_rows, rows_per_chunk)]
+
+    def _encode_chunk(self, values: np.ndarray, header: str, encoding: str) -> List[Tuple[int, bytes]]:
+        """Encode rows, halving the chunk until every body fits the payload limit"""
+        body = ENCODERS[encoding](values, header).encode()
+        if len(body) <= self.max_payload_bytes:
+            return [(len(values), body)]
+        if len(values) == 1:
+            raise ValueError(f"A single row encodes to {len(body)} bytes, over the {self.max_payload_bytes} byte limit")
+        middle = len(values) // 2
+        return (self._encode_chunk(values[:middle], header, encoding)
+                + self._encode_chunk(values[middle:], header, encoding))
+
+    def _invoke(self, body: bytes) -> Tuple[Dict, int]:
+        """Invoke with retries; returns the decoded response and the retries it took"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.runtime.invoke_endpoint(
+                    EndpointName=self.endpoint_name,
+                    ContentType=CONTENT_TYPE,
+                    Accept=ACCEPT,
+                    Body=body
+                )
+                return json.loads(response['Body'].read()), attempt
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter, so throttled chunks do not retry in lockstep
+                time.sleep(random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt)))
+
+    def _run_chunk(self, values: np.ndarray, header: str, encoding: str) -> Dict:
+        started = time.perf_counter()
+        predictions, probabilities = [], []
+        sent_bytes = retries = requests = 0
+        for n_rows, body in self._encode_chunk(values, header, encoding):
+            result, attempts = self._invoke(body)
+            if len(result['predictions']) != n_rows:
+                raise ValueError(f"Endpoint returned {len(result['predictions'])} predictions for {n_rows} rows")
+            predictions.extend(result['predictions'])
+            probabilities.extend(result['probabilities'])
+            sent_bytes += len(body)
+            retries += attempts
+            requests += 1
+        return {
+            'predictions': predictions,
+            'probabilities': probabilities,
+            'bytes': sent_bytes,
+            'retries': retries,
+            'requests': requests,
+            'seconds': time.perf_counter() - started,
+        }
+
+    def predict(self, data, feature_names: Optional[Sequence[str]] = None) -> InvocationResult:
+        """Predict every row of a DataFrame or 2-D array, in order"""
+        started = time.perf_counter()
+        if isinstance(data, pd.DataFrame):
+            feature_names = list(data.columns)
+            values = feature_values(data.to_numpy())
+        else:
+            values = feature_values(np.asarray(data))
+            if values.ndim != 2:
+                raise ValueError(f"Expected a 2-D array, got shape {values.shape}")
+            feature_names = list(feature_names or [f'feature_{i}' for i in range(values.shape[1])])
+        header = ','.join(feature_names) + '\n'
+
+        encoding = self._choose_encoding(values[:ENCODING_SAMPLE_ROWS], header)
+        chunks = self.plan_chunks(values, header, encoding)
+        results: List[Optional[Dict]] = [None] * len(chunks)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {
+                pool.submit(self._run_chunk, values[start:end], header, encoding): index
+                for index, (start, end) in enumerate(chunks)
+            }
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            for future in done:
+                index = futures[future]
+                if future.exception() is not None:
+                    raise InvocationError(index, chunks[index], future.exception()) from future.exception()
+                results[index] = future.result()
+
+        elapsed = time.perf_counter() - started
+        n_bytes = sum(result['bytes'] for result in results)
+        stats = {
+            'rows': len(values),
+            'chunks': len(chunks),
+            'requests': sum(result['requests'] for result in results),
+            'retries': sum(result['retries'] for result in results),
+            'encoding': encoding,
+            'bytes_sent': n_bytes,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': len(values) / elapsed if elapsed > 0 else 0.0,
+            'mb_per_second': n_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+            'slowest_chunk_seconds': max((result['seconds'] for result in results), default=0.0),
+        }
+        predictions = np.asarray([p for result in results for p in result['predictions']])
+        probabilities = np.asarray([p for result in results for p in result['probabilities']])
+        return InvocationResult(predictions, probabilities, stats)
@@ -1,41 +1,152 @@
 import os
-import boto3
+import sys
+import json
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from sagemaker import image_uris
 
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.aws_clients import get_client
+from src.inference.latency_gate import (
+    GATE_MODES, LatencyRegressionError, failure_summary, print_report, report_location, run_latency_gate,
+    validate_budgets
+)
+from src.inference.sizing import SIZING_REPORT_KEY, load_sizing_report, serverless_config
+from src.models.registry import ArtifactRegistry, hash_from_uri
+
+# Endpoints, configs and models deleted at once during cleanup
+CLEANUP_WORKERS = 8
+
+def is_missing_endpoint(error):
+    """SageMaker reports an unknown endpoint as a ValidationException saying it could not find it"""
+    return (error.response.get('Error', {}).get('Code') == 'ValidationException'
+            and 'Could not find endpoint' in error.response['Error'].get('Message', ''))
+
 class ModelDeployer:
-    def __init__(self, bucket_name, role_arn, region_name='us-east-1'):
+    def __init__(self, bucket_name, role_arn, region_name='us-east-1', sizing_report=None,
+                 latency_gate='enforce', latency_budgets=None):
+        if latency_gate not in GATE_MODES:
+            raise ValueError(f"latency_gate must be one of {GATE_MODES}, got {latency_gate!r}")
+        validate_budgets(latency_budgets)
         self.bucket_name = bucket_name
         self.role_arn = role_arn
         self.region_name = region_name
-        self.sagemaker_client = boto3.client('sagemaker', region_name=region_name)
+        # Endpoint and model cleanup both run CLEANUP_WORKERS calls at once
+        self.sagemaker_client = get_client('sagemaker', region_name, max_pool_connections=2 * CLEANUP_WORKERS)
+        self.s3_client = get_client('s3', region_name)
+        self.registry = ArtifactRegistry(self.s3_client, bucket_name)
+        # Sizing report dict or path; by default the one uploaded next to the model
+        self.sizing_report = sizing_report
+        # Replay candidate and deployed models before updating: enforce, warn or off
+        self.latency_gate = latency_gate
+        self.latency_budgets = latency_budgets
         
-    def deploy_serverless(self, model_s3_path=None):
-        """Deploy model using SageMaker Serverless Inference with boto3 client"""
+    def _serverless_config(self):
+        """Serverless settings from the sizing report, or the defaults if there is none"""
+        report = self.sizing_report
+        if report is None:
+            report = f's3://{self.bucket_name}/{SIZING_REPORT_KEY}'
+        if isinstance(report, str):
+            try:
+                report = load_sizing_report(report, self.s3_client)
+            except Exception as e:
+                print(f"No sizing report at {report} ({e}), using default serverless settings")
+                report = None
+        config = serverless_config(report)
+        print(f"Serverless config: {config}")
+        return config
+    
+    def deploy_serverless(self, model_s3_path=None, force=False):
+        """Deploy model using SageMaker Serverless Inference with boto3 client
+        
+        Deploys ``model_s3_path`` if given, otherwise the latest registered
+        artifact, and does nothing when the endpoint already serves an artifact
+        with the same content hash unless ``force`` is set.
+        """
         
         if not model_s3_path:
-            model_s3_path = f's3://{self.bucket_name}/models/model.tar.gz'
+            manifest = self.registry.latest()
+            if manifest is None:
+                raise RuntimeError(f"No model manifest in s3://{self.bucket_name}; train the model first "
+                                   f"or pass model_s3_path (MODEL_S3_PATH)")
+            model_s3_path = manifest['artifact']
+            print(f"Latest model: {manifest['hash'][:12]} ({model_s3_path})")
         
         endpoint_name = 'mlops-endpoint'
         
         # Check if endpoint exists
         try:
             self.sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
-            print(f"Endpoint {endpoint_name} exists, updating with new model...")
-            return self._update_endpoint(model_s3_path, endpoint_name)
         except self.sagemaker_client.exceptions.ClientError as e:
-            if 'does not exist' in str(e):
+            if is_missing_endpoint(e):
                 print(f"Creating new serverless endpoint {endpoint_name}...")
                 return self._create_endpoint(model_s3_path, endpoint_name)
             else:
                 raise e
+        
+        deployed_s3_path = self._deployed_model_data_url(endpoint_name)
+        candidate_hash = hash_from_uri(model_s3_path)
+        if not force and candidate_hash and candidate_hash == hash_from_uri(deployed_s3_path):
+            print(f"✅ Endpoint {endpoint_name} already serves model {candidate_hash[:12]}, nothing to deploy")
+            return endpoint_name
+        
+        print(f"Endpoint {endpoint_name} exists, updating with new model...")
+        self._check_latency(model_s3_path, deployed_s3_path)
+        return self._update_endpoint(model_s3_path, endpoint_name)
+    
+    def _deployed_model_data_url(self, endpoint_name):
+        """S3 URL of the model artifact currently served by an endpoint"""
+        config_name = self.sagemaker_client.describe_endpoint(EndpointName=endpoint_name)['EndpointConfigName']
+        config = self.sagemaker_client.describe_endpoint_config(EndpointConfigName=config_name)
+        model_name = config['ProductionVariants'][0]['ModelName']
+        model = self.sagemaker_client.describe_model(ModelName=model_name)
+        return model['PrimaryContainer']['ModelDataUrl']
+    
+    def _snapshot_artifact(self, model_s3_path, timestamp):
+        """Copy the artifact to a per-deployment key, so the served model survives retraining"""
+        if hash_from_uri(model_s3_path):
+            # Registry artifacts are never overwritten
+            return model_s3_path
+        source_bucket, source_key = model_s3_path[len('s3://'):].split('/', 1)
+        key = f'models/deployed/{timestamp}/model.tar.gz'
+        self.s3_client.copy({'Bucket': source_bucket, 'Key': source_key}, self.bucket_name, key)
+        print(f"Model artifact snapshot: s3://{self.bucket_name}/{key}")
+        return f's3://{self.bucket_name}/{key}'
+    
+    def _check_latency(self, candidate_s3_path, deployed_s3_path):
+        """Replay both artifacts locally and refuse (or flag) a slower candidate"""
+        if self.latency_gate == 'off':
+            return None
+        if candidate_s3_path == deployed_s3_path:
+            print(f"⚠️  Endpoint already serves {deployed_s3_path}; no separate deployed artifact "
+                  f"to compare against, skipping latency gate")
+            return None
+        
+        report = run_latency_gate(candidate_s3_path, deployed_s3_path, self.latency_budgets)
+        print_report(report)
+        
+        bucket, key = report_location(candidate_s3_path)[len('s3://'):].split('/', 1)
+        self.s3_client.put_object(
+            Bucket=bucket, Key=key,
+            Body=json.dumps(report, indent=2),
+            ContentType='application/json'
+        )
+        print(f"Latency gate report saved to s3://{bucket}/{key}")
+        
+        if not report['passed']:
+            if self.latency_gate == 'enforce':
+                raise LatencyRegressionError(report)
+            print(f"⚠️  {failure_summary(report)}, deploying anyway")
+        return report
     
     def _create_endpoint(self, model_s3_path, endpoint_name):
         """Create new serverless endpoint using boto3 client"""
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
         model_name = f'mlops-model-{timestamp}'
         config_name = f'mlops-endpoint-config-{timestamp}'
+        model_s3_path = self._snapshot_artifact(model_s3_path, timestamp)
         
         # 1. Create SageMaker Model
         print(f"Creating SageMaker model: {model_name}")
@@ -77,10 +188,7 @@ class ModelDeployer:
                 {
                     'VariantName': 'primary',
                     'ModelName': model_name,
-                    'ServerlessConfig': {
-                        'MemorySizeInMB': 2048,
-                        'MaxConcurrency': 1
-                    }
+                    'ServerlessConfig': self._serverless_config()
                 }
             ],
             Tags=[
@@ -109,6 +217,7 @@ class ModelDeployer:
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
         model_name = f'mlops-model-{timestamp}'
         config_name = f'mlops-endpoint-config-{timestamp}'
+        model_s3_path = self._snapshot_artifact(model_s3_path, timestamp)
         
         # Create new model
         print(f"Creating new model for update: {model_name}")
@@ -150,10 +259,7 @@ class ModelDeployer:
                 {
                     'VariantName': 'primary',
                     'ModelName': model_name,
-                    'ServerlessConfig': {
-                        'MemorySizeInMB': 2048,
-                        'MaxConcurrency': 1
-                    }
+                    'ServerlessConfig': self._serverless_config()
                 }
             ],
             Tags=[
@@ -173,99 +279,140 @@ class ModelDeployer:
         print(f"Endpoint update initiated. Endpoint: {endpoint_name}")
         return endpoint_name
     
-    def _cleanup_existing_endpoints(self, endpoint_prefix):
-        """Delete all endpoints and models matching the prefix"""
-        sagemaker_client = boto3.client('sagemaker')
+    def _list_names(self, operation, result_key, name_key, prefix):
+        """List resource names starting with ``prefix``, filtered server-side by NameContains"""
+        paginator = self.sagemaker_client.get_paginator(operation)
+        names = []
+        for page in paginator.paginate(NameContains=prefix):
+            names.extend(
+                item[name_key] for item in page[result_key]
+                if item[name_key].startswith(prefix)
+            )
+        return names
+    
+    def _timed(self, func, *args):
+        """Run ``func`` and return (result, error, seconds)"""
+        started = time.perf_counter()
+        try:
+            return func(*args), None, time.perf_counter() - started
+        except Exception as e:
+            return None, e, time.perf_counter() - started
+    
+    def _cleanup_existing_endpoints(self, endpoint_prefix, max_workers=CLEANUP_WORKERS):
+        """Delete all endpoints and models matching the prefix.
+        
+        Endpoints are torn down concurrently in a bounded pool, so the total time
+        is roughly that of the slowest endpoint; matching models left over are
+        deleted concurrently afterwards. Returns a summary of what was deleted.
+        """
+        started = time.perf_counter()
+        summary = {'endpoints': [], 'endpoint_configs': [], 'models': [], 'errors': [],
+                   'slowest_endpoint_seconds': 0.0}
         
         try:
-            # List all endpoints
-            response = sagemaker_client.list_endpoints()
-            
-            # Find endpoints with our prefix
-            matching_endpoints = [
-                ep['EndpointName'] for ep in response['Endpoints']
-                if ep['EndpointName'].startswith(endpoint_prefix)
-            ]
+            matching_endpoints = self._list_names('list_endpoints', 'Endpoints', 'EndpointName', endpoint_prefix)
+            waiter = self.sagemaker_client.get_waiter('endpoint_deleted')
             
-            # Delete each matching endpoint
-            for endpoint_name in matching_endpoints:
-                print(f"Deleting existing endpoint: {endpoint_name}")
-                self._delete_endpoint(endpoint_name)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {}
+                for endpoint_name in matching_endpoints:
+                    print(f"Deleting existing endpoint: {endpoint_name}")
+                    futures[pool.submit(self._timed, self._delete_endpoint, endpoint_name, waiter)] = endpoint_name
+                
+                for future in as_completed(futures):
+                    deleted, error, seconds = future.result()
+                    summary['slowest_endpoint_seconds'] = max(summary['slowest_endpoint_seconds'], seconds)
+                    if error:
+                        summary['errors'].append(f"{futures[future]}: {error}")
+                        print(f"Error deleting endpoint {futures[future]}: {error}")
+                        continue
+                    summary['endpoints'].append(deleted['endpoint'])
+                    summary['endpoint_configs'].append(deleted['endpoint_config'])
+                    summary['models'].extend(deleted['models'])
+                    summary['errors'].extend(deleted['errors'])
             
             # Also cleanup old models
-            self._cleanup_old_models(endpoint_prefix)
+            models = self._cleanup_old_models(endpoint_prefix, max_workers)
+            summary['models'].extend(models['models'])
+            summary['errors'].extend(models['errors'])
                 
         except Exception as e:
+            summary['errors'].append(str(e))
             print(f"Error during cleanup: {e}")
+        
+        summary['elapsed_seconds'] = time.perf_counter() - started
+        print(f"Cleanup finished in {summary['elapsed_seconds']:.1f}s "
+              f"(slowest endpoint {summary['slowest_endpoint_seconds']:.1f}s): "
+              f"{len(summary['endpoints'])} endpoints, {len(summary['endpoint_configs'])} configs, "
+              f"{len(summary['models'])} models deleted, {len(summary['errors'])} errors")
+        return summary
     
-    def _cleanup_old_models(self, model_prefix):
-        """Delete old SageMaker models"""
-        sagemaker_client = boto3.client('sagemaker')
+    def _cleanup_old_models(self, model_prefix, max_workers=CLEANUP_WORKERS):
+        """Delete old SageMaker models concurrently"""
+        result = {'models': [], 'errors': []}
         
         try:
-            # List all models
-            response = sagemaker_client.list_models()
-            
-            # Find models with our prefix
-            matching_models = [
-                model['ModelName'] for model in response['Models']
-                if model['ModelName'].startswith(model_prefix)
-            ]
+            matching_models = self._list_names('list_models', 'Models', 'ModelName', model_prefix)
             
-            # Delete each matching model
-            for model_name in matching_models:
-                try:
-                    sagemaker_client.delete_model(ModelName=model_name)
-                    print(f"Deleted model: {model_name}")
-                except Exception as e:
-                    print(f"Error deleting model {model_name}: {e}")
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(self._timed, self.sagemaker_client.delete_model, model_name): model_name
+                    for model_name in matching_models
+                }
+                for future in as_completed(futures):
+                    model_name = futures[future]
+                    _, error, _ = future.result()
+                    if error:
+                        result['errors'].append(f"{model_name}: {error}")
+                        print(f"Error deleting model {model_name}: {error}")
+                    else:
+                        result['models'].append(model_name)
+                        print(f"Deleted model: {model_name}")
                     
         except Exception as e:
+            result['errors'].append(str(e))
             print(f"Error during model cleanup: {e}")
+        
+        return result
     
-    def _delete_endpoint(self, endpoint_name):
-        """Delete existing endpoint and its configuration"""
-        sagemaker_client = boto3.client('sagemaker')
+    def _delete_endpoint(self, endpoint_name, waiter=None):
+        """Delete an endpoint, then its configuration and models; returns what was deleted"""
+        # Get endpoint config name and model names before deleting endpoint
+        endpoint_info = self.sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+        config_name = endpoint_info['EndpointConfigName']
         
-        try:
-            # Get endpoint config name and model names before deleting endpoint
-            endpoint_info = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
-            config_name = endpoint_info['EndpointConfigName']
-            
-            # Get model names from endpoint config
-            config_info = sagemaker_client.describe_endpoint_config(EndpointConfigName=config_name)
-            model_names = [variant['ModelName'] for variant in config_info['ProductionVariants']]
-            
-            # Delete endpoint
-            sagemaker_client.delete_endpoint(EndpointName=endpoint_name)
-            print(f"Deleted endpoint: {endpoint_name}")
-            
-            # Wait for endpoint deletion to complete
-            waiter = sagemaker_client.get_waiter('endpoint_deleted')
-            waiter.wait(EndpointName=endpoint_name)
-            
-            # Delete endpoint configuration
-            sagemaker_client.delete_endpoint_config(EndpointConfigName=config_name)
-            print(f"Deleted endpoint config: {config_name}")
-            
-            # Delete associated models
-            for model_name in model_names:
-                try:
-                    sagemaker_client.delete_model(ModelName=model_name)
-                    print(f"Deleted model: {model_name}")
-                except Exception as e:
-                    print(f"Error deleting model {model_name}: {e}")
-            
-            # Small wait to ensure cleanup is complete
-            import time
-            time.sleep(5)
-            
-        except Exception as e:
-            print(f"Error deleting endpoint: {e}")
+        # Get model names from endpoint config
+        config_info = self.sagemaker_client.describe_endpoint_config(EndpointConfigName=config_name)
+        model_names = [variant['ModelName'] for variant in config_info['ProductionVariants']]
+        
+        # Delete endpoint
+        self.sagemaker_client.delete_endpoint(EndpointName=endpoint_name)
+        print(f"Deleted endpoint: {endpoint_name}")
+        
+        # Wait for endpoint deletion to complete
+        waiter = waiter or self.sagemaker_client.get_waiter('endpoint_deleted')
+        waiter.wait(EndpointName=endpoint_name)
+        
+        # Delete endpoint configuration
+        self.sagemaker_client.delete_endpoint_config(EndpointConfigName=config_name)
+        print(f"Deleted endpoint config: {config_name}")
+        
+        # Delete associated models
+        deleted = {'endpoint': endpoint_name, 'endpoint_config': config_name, 'models': [], 'errors': []}
+        for model_name in model_names:
+            try:
+                self.sagemaker_client.delete_model(ModelName=model_name)
+                deleted['models'].append(model_name)
+                print(f"Deleted model: {model_name}")
+            except Exception as e:
+                deleted['errors'].append(f"{model_name}: {e}")
+                print(f"Error deleting model {model_name}: {e}")
+        
+        return deleted
     
     def test_endpoint(self, endpoint_name, test_data):
         """Test the deployed endpoint"""
-        runtime = boto3.client('sagemaker-runtime')
+        runtime = get_client('sagemaker-runtime', self.region_name)
         
         response = runtime.invoke_endpoint(
             EndpointName=endpoint_name,
@@ -280,6 +427,12 @@ if __name__ == "__main__":
     bucket_name = os.environ.get('S3_BUCKET_NAME')
     role_arn = os.environ.get('SAGEMAKER_ROLE_ARN')
     region_name = os.environ.get('AWS_REGION', 'us-east-1')
+    sizing_report = os.environ.get('SIZING_REPORT')
+    latency_gate = os.environ.get('LATENCY_GATE', 'enforce')
+    latency_budgets = json.loads(os.environ['LATENCY_BUDGETS']) if os.environ.get('LATENCY_BUDGETS') else None
+    force_deploy = os.environ.get('FORCE_DEPLOY', '').lower() in ('1', 'true', 'yes')
+    # Explicit artifact, e.g. a SageMaker job's model.tar.gz; the latest registered one otherwise
+    model_s3_path = os.environ.get('MODEL_S3_PATH')
     
     if not bucket_name or not role_arn:
         print("❌ Please set S3_BUCKET_NAME and SAGEMAKER_ROLE_ARN environment variables")
@@ -290,11 +443,12 @@ if __name__ == "__main__":
     print(f"   IAM Role: {role_arn}")
     print(f"   Region: {region_name}")
     
-    deployer = ModelDeployer(bucket_name, role_arn, region_name)
+    deployer = ModelDeployer(bucket_name, role_arn, region_name, sizing_report,
+                             latency_gate, latency_budgets)
     
     try:
         print("📦 Deploying model to serverless endpoint...")
-        endpoint_name = deployer.deploy_serverless()
+        endpoint_name = deployer.deploy_serverless(model_s3_path, force=force_deploy)
         print(f"✅ Deployment initiated successfully!")
         print(f"   Endpoint: {endpoint_name}")
         print(f"   Note: Endpoint will take a few minutes to become InService")
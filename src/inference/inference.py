@@ -1,26 +1,94 @@
 import os
-import joblib
-import pandas as pd
-from io import StringIO
+import warnings
+from typing import List, NamedTuple
+
+import numpy as np
+
+# joblib and pandas are imported on first use rather than with this module, so
+# they stay off the cold start path until a request actually needs them
+
+# Requests are parsed straight into float32 unless FEATURE_DTYPE says otherwise,
+# matching training (see src/models/features.py)
+FEATURE_DTYPE = os.environ.get('FEATURE_DTYPE', 'float32')
+
+# Plain numeric bodies up to this size are parsed with NumPy; pandas' C parser
+# wins on larger ones and handles quoting and missing values
+NUMPY_PARSE_MAX_BYTES = 256 * 1024
+
+class CSVRows(NamedTuple):
+    """Request rows parsed without pandas"""
+    columns: List[str]
+    values: np.ndarray
 
 def model_fn(model_dir):
     """Load model for inference"""
+    import joblib
     model = joblib.load(os.path.join(model_dir, "model.pkl"))
     return model
 
+def _parse_numeric_csv(request_body):
+    """Header plus plain numeric rows as CSVRows, or None if the body needs the full CSV parser"""
+    header, _, body = request_body.partition('\n')
+    body = body.strip()
+    if not body or '"' in request_body:
+        return None
+    columns = header.strip().split(',')
+    lines = body.split('\n')
+    if any(line.count(',') != len(columns) - 1 for line in lines):
+        return None
+    try:
+        values = np.fromstring(body.replace('\n', ','), dtype=FEATURE_DTYPE, sep=',')
+    except ValueError:
+        return None
+    if values.size != len(lines) * len(columns):
+        return None
+    return CSVRows(columns, values.reshape(len(lines), len(columns)))
+
 def input_fn(request_body, content_type):
     """Parse input data"""
     if content_type == 'text/csv':
-        df = pd.read_csv(StringIO(request_body))
+        if isinstance(request_body, bytes):
+            request_body = request_body.decode()
+        if len(request_body) <= NUMPY_PARSE_MAX_BYTES:
+            rows = _parse_numeric_csv(request_body)
+            if rows is not None:
+                return rows
+        import pandas as pd
+        from io import StringIO
+        df = pd.read_csv(StringIO(request_body), dtype=FEATURE_DTYPE)
         return df
     else:
         raise ValueError(f"Unsupported content type: {content_type}")
 
+def _model_input(model, input_data):
+    """Request features in the order the model was fitted on.
+
+    Columns that are the same set as ``feature_names_in_`` are reordered by
+    name on both parsing paths. Any other CSVRows go to the model as a
+    DataFrame, so sklearn's feature-name check treats them like a pandas request.
+    """
+    expected = getattr(model, 'feature_names_in_', None)
+    columns = list(input_data.columns)
+    if expected is None or columns == list(expected):
+        return input_data.values if isinstance(input_data, CSVRows) else input_data
+    if len(set(columns)) == len(columns) and set(columns) == set(expected):
+        if isinstance(input_data, CSVRows):
+            return input_data.values[:, [columns.index(name) for name in expected]]
+        return input_data[list(expected)]
+    if isinstance(input_data, CSVRows):
+        import pandas as pd
+        return pd.DataFrame(input_data.values, columns=columns)
+    return input_data
+
 def predict_fn(input_data, model):
     """Make predictions"""
-    predictions = model.predict(input_data)
-    probabilities = model.predict_proba(input_data)
-    
+    features = _model_input(model, input_data)
+    with warnings.catch_warnings():
+        # Arrays are already in the model's feature order
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        predictions = model.predict(features)
+        probabilities = model.predict_proba(features)
+
     return {
         'predictions': predictions.tolist(),
         'probabilities': probabilities.tolist()
@@ -29,4 +97,4 @@ def predict_fn(input_data, model):
 def output_fn(prediction, accept):
     """Format output"""
     import json
-    return json.dumps(prediction), 'application/json'
\ No newline at end of file
+    return json.dumps(prediction), 'application/json'
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Pre-deploy latency regression gate
+Replays the same workload through the candidate and the deployed model
+artifacts locally and checks cold start, p50/p99 latency and throughput of
+the candidate against regression budgets
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.inference.benchmark import benchmark_artifact, replay_payloads
+
+LATENCY_REPORT_NAME = 'latency_gate_report.json'
+
+# Allowed regression per metric: (relative, absolute). A metric regresses only
+# when it is worse by more than both, so tiny models are not failed on noise.
+DEFAULT_BUDGETS = {
+    'cold_start_seconds': (0.25, 0.5),
+    'p50_ms': (0.15, 2.0),
+    'p99_ms': (0.25, 5.0),
+    'throughput_rps': (0.15, 1.0),
+}
+
+# Metrics where a higher value is better
+HIGHER_IS_BETTER = {'throughput_rps'}
+
+GATE_MODES = ('enforce', 'warn', 'off')
+GATE_CONCURRENCY_LEVELS = [1, 4]
+GATE_ROUNDS = 2
+
+
+class LatencyRegressionError(RuntimeError):
+    """The candidate model regressed beyond the latency budgets"""
+
+    def __init__(self, report: Dict):
+        self.report = report
+        super().__init__(failure_summary(report))
+
+
+def failure_summary(report: Dict) -> str:
+    """One line naming the regressions and errors that failed a gate report"""
+    parts = report.get('errors', [])[:]
+    if report['regressions']:
+        parts.append(f"Latency regressions: {', '.join(report['regressions'])}")
+    return '; '.join(parts)
+
+
+def validate_budgets(budgets: Optional[Dict]) -> Dict:
+    """Merge budgets over the defaults, rejecting unknown metrics and malformed entries"""
+    budgets = budgets or {}
+    unknown = sorted(set(budgets) - set(DEFAULT_BUDGETS))
+    if unknown:
+        raise ValueError(f"Unknown latency budget metrics {unknown}, expected some of {sorted(DEFAULT_BUDGETS)}")
+    merged = dict(DEFAULT_BUDGETS)
+    for metric, budget in budgets.items():
+        try:
+            relative, absolute = (float(value) for value in budget)
+        except (TypeError, ValueError):
+            raise ValueError(f"Latency budget for {metric} must be [relative, absolute], got {budget!r}")
+        merged[metric] = (relative, absolute)
+    return merged
+
+
+def gate_metrics(benchmarks: Union[Dict, List[Dict]]) -> Dict[str, float]:
+    """The metrics the gate compares, taking the best of repeated benchmark_artifact runs.
+
+    Raises ValueError when a run has no successful concurrency-1 level.
+    """
+    if isinstance(benchmarks, dict):
+        benchmarks = [benchmarks]
+    runs = []
+    for benchmark in benchmarks:
+        single = next((level for level in benchmark['sweep'] if level['concurrency'] == 1), None)
+        if single is None:
+            raise ValueError("no concurrency-1 level in the benchmark sweep")
+        if single.get('p50_ms') is None:
+            raise ValueError(f"every request at concurrency 1 failed: {single.get('first_error')}")
+        runs.append({
+            'cold_start_seconds': benchmark['cold_start']['cold_start_seconds'],
+            'p50_ms': single['p50_ms'],
+            'p99_ms': single['p99_ms'],
+            'throughput_rps': max(level['throughput_rps'] for level in benchmark['sweep']),
+        })
+    # Noise on a shared machine only ever makes a run slower
+    return {
+        metric: (max if metric in HIGHER_IS_BETTER else min)(run[metric] for run in runs)
+        for metric in runs[0]
+    }
+
+
+def compare_benchmarks(deployed: Union[Dict, List[Dict]], candidate: Union[Dict, List[Dict]],
+                       budgets: Optional[Dict] = None) -> Dict:
+    """Compare candidate against deployed metrics and list the budgets it breaks.
+
+    A side whose benchmarks cannot be compared fails the gate with an error.
+    """
+    budgets = validate_budgets(budgets)
+    errors = []
+    side_metrics = {}
+    for side, benchmarks in (('deployed', deployed), ('candidate', candidate)):
+        try:
+            side_metrics[side] = gate_metrics(benchmarks)
+        except ValueError as e:
+            errors.append(f"{side} model: {e}")
+    if errors:
+        return {'metrics': {}, 'regressions': [], 'errors': errors, 'passed': False}
+    deployed_metrics = side_metrics['deployed']
+    candidate_metrics = side_metrics['candidate']
+
+    comparison = {}
+    regressions = []
+    for metric, (relative, absolute) in budgets.items():
+        before = deployed_metrics[metric]
+        after = candidate_metrics[metric]
+        worse_by = before - after if metric in HIGHER_IS_BETTER else after - before
+        regressed = worse_by > absolute and worse_by > relative * abs(before)
+        comparison[metric] = {
+            'deployed': before,
+            'candidate': after,
+            'change': (after - before) / before if before else None,
+            'budget_relative': relative,
+            'budget_absolute': absolute,
+            'regressed': regressed,
+        }
+        if regressed:
+            regressions.append(metric)
+
+    return {'metrics': comparison, 'regressions': regressions, 'errors': [], 'passed': not regressions}
+
+
+def run_latency_gate(candidate_uri: str, deployed_uri: str, budgets: Optional[Dict] = None,
+                     n_requests: int = 200, concurrency_levels: Optional[List[int]] = None,
+                     rounds: int = GATE_ROUNDS) -> Dict:
+    """Benchmark both artifacts on the same replay workload and compare them.
+
+    Runs alternate deployed, candidate, candidate, deployed, ... so that
+    warm-up and drift of the machine affect both sides alike.
+    """
+    payloads = replay_payloads(n_requests)
+    # Latency percentiles come from the single-request level, so it is always measured
+    levels = sorted(set(concurrency_levels or GATE_CONCURRENCY_LEVELS) | {1})
+    deployed, candidate = [], []
+    for round_index in range(rounds):
+        order = [(deployed, deployed_uri), (candidate, candidate_uri)]
+        for runs, uri in (order if round_index % 2 == 0 else order[::-1]):
+            runs.append(benchmark_artifact(uri, payloads, levels))
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'candidate': candidate_uri,
+        'deployed': deployed_uri,
+        **compare_benchmarks(deployed, candidate, budgets),
+        'benchmarks': {'deployed': deployed, 'candidate': candidate},
+    }
+
+
+def report_location(artifact_uri: str) -> str:
+    """Where the gate report for an artifact is stored: next to it"""
+    return posixpath.join(posixpath.dirname(artifact_uri), LATENCY_REPORT_NAME)
+
+
+def print_report(report: Dict):
+    print(f"⏱️  Latency gate: candidate {report['candidate']} vs deployed {report['deployed']}")
+    for metric, values in report['metrics'].items():
+        change = f"{values['change']:+.1%}" if values['change'] is not None else 'n/a'
+        marker = '❌' if values['regressed'] else '✅'
+        print(f"   {marker} {metric}: {values['deployed']:.2f} -> {values['candidate']:.2f} ({change})")
+    for error in report.get('errors', []):
+        print(f"   ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the latency of two model artifacts')
+    parser.add_argument('candidate', help='Candidate model.tar.gz, directory or s3:// URI')
+    parser.add_argument('deployed', help='Deployed model.tar.gz, directory or s3:// URI')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--output', help='Write the report to this path')
+    args = parser.parse_args()
+
+    report = run_latency_gate(args.candidate, args.deployed, n_requests=args.requests)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not report['passed']:
+        print(f"❌ {failure_summary(report)}")
+        exit(1)
+    print("✅ No latency regressions")
+
+
+if __name__ == "__main__":
+    main()
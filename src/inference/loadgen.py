@@ -0,0 +1,317 @@
+"""
+Endpoint load generator
+Drives an endpoint with asyncio either open-loop (requests sent on a fixed
+schedule, whatever the response times) or closed-loop (N clients each
+waiting for their previous response) and records latencies in an
+HDR-style log-bucketed histogram
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.inference.benchmark import extract_artifact, replay_payloads
+
+# Request body formats the inference handlers accept: name -> CSV float format
+PAYLOAD_FORMATS = {
+    'csv': None,
+    'csv-compact': '%.6g',
+}
+
+LOAD_MODES = ('closed', 'open')
+
+# Requests slower than this are counted as cold starts, not in the histogram
+DEFAULT_COLD_START_MS = 2000.0
+
+PERCENTILES = [50, 90, 99, 99.9]
+PERCENTILE_TICKS = [0, 25, 50, 75, 90, 95, 99, 99.5, 99.9, 99.95, 99.99, 100]
+
+
+class LatencyHistogram:
+    """Latencies in log-spaced buckets, each ``10 ** -significant_digits`` wide relative to its value.
+
+    Memory does not grow with the number of requests, percentiles are
+    accurate to the bucket width, and histograms from several clients merge.
+    """
+
+    MIN_MS = 0.001
+
+    def __init__(self, significant_digits: int = 2):
+        self.significant_digits = significant_digits
+        self._log_ratio = math.log1p(10 ** -significant_digits)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = math.inf
+        self.max_ms = 0.0
+
+    def _index(self, value_ms: float) -> int:
+        return int(math.log(max(value_ms, self.MIN_MS) / self.MIN_MS) / self._log_ratio)
+
+    def _upper(self, index: int) -> float:
+        return self.MIN_MS * math.exp((index + 1) * self._log_ratio)
+
+    def record(self, value_ms: float):
+        index = self._index(value_ms)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.min_ms = min(self.min_ms, value_ms)
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.min_ms = min(self.min_ms, other.min_ms)
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Highest value equivalent to the q-th percentile latency"""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self._upper(index), self.min_ms), self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict:
+        summary = {
+            'count': self.count,
+            'min_ms': self.min_ms if self.count else None,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'max_ms': self.max_ms if self.count else None,
+        }
+        for q in PERCENTILES:
+            summary[f"p{q:g}_ms"] = self.percentile(q)
+        return summary
+
+    def distribution(self) -> List[Dict]:
+        """Percentile distribution table, as HdrHistogram prints it"""
+        return [{'percentile': q, 'value_ms': self.percentile(q)} for q in PERCENTILE_TICKS]
+
+    def buckets(self) -> List[List[float]]:
+        """Non-empty buckets as [upper bound ms, count]"""
+        return [[self._upper(index), self.counts[index]] for index in sorted(self.counts)]
+
+
+class EndpointTarget:
+    """A SageMaker endpoint reached through a sagemaker-runtime client"""
+
+    def __init__(self, endpoint_name: str, runtime_client, content_type: str = 'text/csv',
+                 accept: str = 'application/json'):
+        self.endpoint_name = endpoint_name
+        self.runtime = runtime_client
+        self.content_type = content_type
+        self.accept = accept
+
+    def invoke(self, body: str) -> bytes:
+        response = self.runtime.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType=self.content_type,
+            Accept=self.accept,
+            Body=body
+        )
+        return response['Body'].read()
+
+
+def endpoint_target(endpoint_name: str, pool_size: int = 10) -> EndpointTarget:
+    """Target a deployed endpoint through the shared client factory"""
+    from src.aws_clients import get_client
+    return EndpointTarget(endpoint_name, get_client('sagemaker-runtime', max_pool_connections=pool_size))
+
+
+def local_target(artifact: str, workdir: str, endpoint_name: str = 'local-load-test') -> EndpointTarget:
+    """Serve a model artifact with the local handler stand-in and target it"""
+    from src.local_backend import LocalSageMakerRuntime, deploy_local_endpoint
+    model_dir = extract_artifact(artifact, workdir)
+    deploy_local_endpoint(endpoint_name, model_dir, root=workdir)
+    return EndpointTarget(endpoint_name, LocalSageMakerRuntime(workdir))
+
+
+def error_code(error: Exception) -> str:
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict) and 'Error' in response:
+        return response['Error'].get('Code', type(error).__name__)
+    return type(error).__name__
+
+
+class LoadRecorder:
+    """Collects results of the measured phase"""
+
+    def __init__(self, cold_start_ms: float):
+        self.cold_start_ms = cold_start_ms
+        self.histogram = LatencyHistogram()
+        self.cold_starts: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+
+    def record(self, latency_ms: float, error: Optional[Exception] = None):
+        self.requests += 1
+        if error is not None:
+            code = error_code(error)
+            self.errors[code] = self.errors.get(code, 0) + 1
+        elif latency_ms >= self.cold_start_ms:
+            self.cold_starts.append(latency_ms)
+        else:
+            self.histogram.record(latency_ms)
+
+
+async def _call(loop, executor, target, body: str, started: float, recorder: LoadRecorder):
+    try:
+        await loop.run_in_executor(executor, target.invoke, body)
+        error = None
+    except Exception as e:
+        error = e
+    recorder.record((time.perf_counter() - started) * 1000, error)
+
+
+async def closed_loop(target, payloads: List[str], concurrency: int, duration_seconds: float,
+                      max_requests: Optional[int], recorder: LoadRecorder):
+    """``concurrency`` clients, each sending its next request when the previous one returns"""
+    loop = asyncio.get_running_loop()
+    bodies = itertools.cycle(payloads)
+    deadline = time.perf_counter() + duration_seconds
+    sent = 0
+
+    async def client(executor):
+        nonlocal sent
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            sent += 1
+            await _call(loop, executor, target, next(bodies), time.perf_counter(), recorder)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(*(client(executor) for _ in range(concurrency)))
+
+
+async def open_loop(target, payloads: List[str], rps: float, duration_seconds: float,
+                    max_requests: Optional[int], max_in_flight: int, recorder: LoadRecorder):
+    """Send requests at a fixed rate regardless of how fast responses come back.
+
+    Latency is measured from when a request was due, not when a worker
+    became free to send it, so a saturated endpoint shows up in the tail
+    instead of silently lowering the request rate.
+    """
+    loop = asyncio.get_running_loop()
+    n_requests = int(rps * duration_seconds)
+    if max_requests is not None:
+        n_requests = min(n_requests, max_requests)
+    bodies = itertools.cycle(payloads)
+    started = time.perf_counter()
+    tasks = []
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i in range(n_requests):
+            due = started + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(_call(loop, executor, target, next(bodies), due, recorder)))
+        await asyncio.gather(*tasks)
+
+
+def warm_up(target, payloads: List[str], n_requests: int) -> Dict:
+    """Sequential requests before measuring; the first one absorbs an endpoint cold start"""
+    latencies, errors = [], 0
+    for body in itertools.islice(itertools.cycle(payloads), n_requests):
+        started = time.perf_counter()
+        try:
+            target.invoke(body)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except Exception:
+            errors += 1
+    return {
+        'requests': n_requests,
+        'errors': errors,
+        'first_request_ms': latencies[0] if latencies else None,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+    }
+
+
+def run_load_test(target, payloads: List[str], mode: str = 'closed', concurrency: int = 4,
+                  rps: float = 10.0, duration_seconds: float = 30.0, max_requests: Optional[int] = None,
+                  warmup_requests: int = 5, cold_start_ms: float = DEFAULT_COLD_START_MS) -> Dict:
+    """Warm up, then drive the target open- or closed-loop and summarise the results"""
+    if mode not in LOAD_MODES:
+        raise ValueError(f"mode must be one of {LOAD_MODES}, got {mode!r}")
+
+    warmup = warm_up(target, payloads, warmup_requests)
+    recorder = LoadRecorder(cold_start_ms)
+    started = time.perf_counter()
+    if mode == 'closed':
+        asyncio.run(closed_loop(target, payloads, concurrency, duration_seconds, max_requests, recorder))
+    else:
+        asyncio.run(open_loop(target, payloads, rps, duration_seconds, max_requests, concurrency, recorder))
+    elapsed = time.perf_counter() - started
+
+    n_errors = sum(recorder.errors.values())
+    successful = recorder.requests - n_errors
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'mode': mode,
+        'concurrency': concurrency,
+        'target_rps': rps if mode == 'open' else None,
+        'elapsed_seconds': elapsed,
+        'requests': recorder.requests,
+        'throughput_rps': successful / elapsed if elapsed > 0 else 0.0,
+        'error_rate': n_errors / recorder.requests if recorder.requests else 0.0,
+        'errors': recorder.errors,
+        'warmup': warmup,
+        'cold_starts': {
+            'threshold_ms': cold_start_ms,
+            'count': len(recorder.cold_starts),
+            'latencies_ms': sorted(recorder.cold_starts),
+        },
+        'latency': recorder.histogram.summary(),
+        'distribution': recorder.histogram.distribution(),
+        'histogram': recorder.histogram.buckets(),
+    }
+
+
+def load_test_payloads(n_payloads: int = 200, rows_per_request: int = 1, payload_format: str = 'csv',
+                       seed: int = 42) -> List[str]:
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ValueError(f"payload_format must be one of {list(PAYLOAD_FORMATS)}, got {payload_format!r}")
+    return replay_payloads(n_payloads, rows_per_request, seed, float_format=PAYLOAD_FORMATS[payload_format])
+
+
+def print_load_report(report: Dict):
+    latency = report['latency']
+    print(f"📈 Load test ({report['mode']}-loop, concurrency {report['concurrency']}"
+          + (f", {report['target_rps']:g} req/s" if report['target_rps'] else '') + ")")
+    print(f"   Requests: {report['requests']} in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s), error rate {report['error_rate']:.2%}")
+    if latency['count']:
+        print("   Latency: " + ", ".join(
+            f"p{q:g} {latency[f'p{q:g}_ms']:.1f} ms" for q in PERCENTILES))
+    if report['warmup']['first_request_ms'] is not None:
+        print(f"   First request (warm-up): {report['warmup']['first_request_ms']:.1f} ms")
+    if report['cold_starts']['count']:
+        print(f"   Cold starts: {report['cold_starts']['count']} over "
+              f"{report['cold_starts']['threshold_ms']:.0f} ms")
+    for code, count in report['errors'].items():
+        print(f"   ❌ {code}: {count}")
+
+
+def load_test_endpoint(endpoint_name: Optional[str] = None, local_artifact: Optional[str] = None,
+                       rows_per_request: int = 1, payload_format: str = 'csv', **options) -> Dict:
+    """Load test a deployed endpoint, or a model artifact served by the local stand-in"""
+    payloads = load_test_payloads(rows_per_request=rows_per_request, payload_format=payload_format)
+    if local_artifact:
+        with tempfile.TemporaryDirectory() as workdir:
+            return run_load_test(local_target(local_artifact, workdir), payloads, **options)
+    target = endpoint_target(endpoint_name, pool_size=options.get('concurrency', 4))
+    return run_load_test(target, payloads, **options)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Inference startup profiler
+Starts a cold interpreter with -X importtime, imports the handler module,
+loads a model and serves one request, then reports time to first prediction
+and which module imports it was spent on, per phase and per package
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+PHASES = ('import_handler', 'model_fn', 'first_request')
+PHASE_MARKER = 'startup-phase: '
+# Packages whose import cost is reported even when small
+WATCHED_PACKAGES = ('numpy', 'pandas', 'sklearn', 'scipy', 'joblib')
+
+
+def _probe(model_dir: str, payload_path: str):
+    """Runs in the cold interpreter; only the standard library is imported before the handler"""
+    with open(payload_path) as f:
+        payload = f.read()
+
+    timings = {}
+    started = time.perf_counter()
+    sys.stderr.write(f"{PHASE_MARKER}import_handler\n")
+    from src.inference import inference
+    timings['import_handler'] = time.perf_counter() - started
+
+    sys.stderr.write(f"{PHASE_MARKER}model_fn\n")
+    phase_started = time.perf_counter()
+    model = inference.model_fn(model_dir)
+    timings['model_fn'] = time.perf_counter() - phase_started
+
+    sys.stderr.write(f"{PHASE_MARKER}first_request\n")
+    phase_started = time.perf_counter()
+    prediction = inference.predict_fn(inference.input_fn(payload, 'text/csv'), model)
+    inference.output_fn(prediction, 'application/json')
+    timings['first_request'] = time.perf_counter() - phase_started
+
+    print(json.dumps({'phases': timings, 'first_prediction_at': time.time()}))
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Entries of ``-X importtime`` output, tagged with the probe phase they happened in"""
+    entries = []
+    phase = 'interpreter'
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARKER):
+            phase = line[len(PHASE_MARKER):].strip()
+            continue
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_seconds': int(self_us) / 1e6,
+            'cumulative_seconds': int(cumulative_us) / 1e6,
+            'phase': phase,
+        })
+    return entries
+
+
+def import_breakdown(entries: List[Dict], top: int = 15) -> Dict:
+    """Import time per phase and top-level package, and the slowest top-level imports"""
+    by_phase: Dict[str, float] = {}
+    packages: Dict[str, Dict] = {}
+    for entry in entries:
+        by_phase[entry['phase']] = by_phase.get(entry['phase'], 0.0) + entry['self_seconds']
+        package = packages.setdefault(entry['module'].split('.')[0], {
+            'seconds': 0.0, 'modules': 0, 'first_phase': entry['phase']})
+        package['seconds'] += entry['self_seconds']
+        package['modules'] += 1
+
+    ranked = sorted(packages.items(), key=lambda item: item[1]['seconds'], reverse=True)
+    slowest = sorted((entry for entry in entries if entry['depth'] == 0),
+                     key=lambda entry: entry['cumulative_seconds'], reverse=True)
+    return {
+        'total_seconds': sum(by_phase.values()),
+        'modules': len(entries),
+        'by_phase': by_phase,
+        'by_package': [{'package': name, **stats} for name, stats in ranked[:top]],
+        'slowest': [{key: entry[key] for key in ('module', 'cumulative_seconds', 'phase')}
+                    for entry in slowest[:top]],
+        'watched': {name: packages[name]['first_phase'] if name in packages else None
+                    for name in WATCHED_PACKAGES},
+    }
+
+
+def profile_once(model_dir: str, payload_path: str, top: int = 15) -> Dict:
+    """One cold start in a fresh interpreter"""
+    spawned_at = time.time()
+    try:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--probe', model_dir, payload_path],
+            capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Startup probe failed: {e.stderr.strip()[-2000:]}") from e
+
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    time_to_first_prediction = probe['first_prediction_at'] - spawned_at
+    return {
+        'time_to_first_prediction_seconds': time_to_first_prediction,
+        'interpreter_seconds': time_to_first_prediction - sum(probe['phases'].values()),
+        'phases': probe['phases'],
+        'imports': import_breakdown(parse_importtime(result.stderr), top),
+    }
+
+
+def profile_startup(artifact: str, rows: int = 1, repeats: int = 3, top: int = 15) -> Dict:
+    """Profile ``repeats`` cold starts of an artifact and keep the median one"""
+    from src.inference.benchmark import extract_artifact, replay_payloads
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = extract_artifact(artifact, workdir)
+        payload_path = os.path.join(workdir, 'payload.csv')
+        with open(payload_path, 'w') as f:
+            f.write(replay_payloads(1, rows)[0])
+        runs = [profile_once(model_dir, payload_path, top) for _ in range(repeats)]
+
+    times = [run['time_to_first_prediction_seconds'] for run in runs]
+    median = sorted(runs, key=lambda run: run['time_to_first_prediction_seconds'])[len(runs) // 2]
+    return {
+        'artifact': artifact,
+        'rows': rows,
+        'repeats': repeats,
+        'time_to_first_prediction_range': [min(times), max(times)],
+        'time_to_first_prediction_median': statistics.median(times),
+        **median,
+    }
+
+
+def print_startup_report(report: Dict):
+    print(f"🚀 Time to first prediction: {report['time_to_first_prediction_seconds'] * 1000:.0f} ms "
+          f"(range {report['time_to_first_prediction_range'][0] * 1000:.0f}-"
+          f"{report['time_to_first_prediction_range'][1] * 1000:.0f} ms over {report['repeats']} runs)")
+    print(f"   Interpreter startup: {report['interpreter_seconds'] * 1000:.0f} ms")
+    imports = report['imports']
+    for phase in PHASES:
+        print(f"   {phase}: {report['phases'][phase] * 1000:.0f} ms, "
+              f"of which imports {imports['by_phase'].get(phase, 0.0) * 1000:.0f} ms")
+    print(f"📦 {imports['modules']} modules imported in {imports['total_seconds'] * 1000:.0f} ms:")
+    for package in imports['by_package']:
+        print(f"   {package['package']}: {package['seconds'] * 1000:.1f} ms, "
+              f"{package['modules']} modules, first imported in {package['first_phase']}")
+    print("🐢 Slowest top-level imports:")
+    for entry in imports['slowest']:
+        print(f"   {entry['module']}: {entry['cumulative_seconds'] * 1000:.1f} ms ({entry['phase']})")
+    skipped = [name for name, phase in imports['watched'].items() if phase is None]
+    if skipped:
+        print(f"✅ Never imported: {', '.join(skipped)}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Profile inference cold start and import time')
+    parser.add_argument('artifact', nargs='?',
+                        help='model.tar.gz, model directory or s3:// URI (default: the latest registered model)')
+    parser.add_argument('--rows', type=int, default=1, help='Rows in the first request')
+    parser.add_argument('--repeat', type=int, default=3, help='Cold starts to run; the median one is reported')
+    parser.add_argument('--top', type=int, default=15, help='Packages and imports to list')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    artifact = args.artifact
+    bucket_name = os.environ.get('S3_BUCKET_NAME')
+    if not artifact and bucket_name:
+        from src.aws_clients import get_client
+        from src.models.registry import ArtifactRegistry
+        manifest = ArtifactRegistry(get_client('s3'), bucket_name).latest()
+        artifact = manifest and manifest['artifact']
+    if not artifact:
+        print("❌ Pass a model artifact or set S3_BUCKET_NAME")
+        exit(1)
+
+    print(f"⏱️  Profiling cold start of {artifact}...")
+    report = profile_startup(artifact, args.rows, args.repeat, args.top)
+    print_startup_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"   Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--probe':
+        _probe(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Serverless endpoint sizing
+Benchmarks a model artifact locally and recommends serverless memory,
+MaxConcurrency and provisioned concurrency for a target throughput and p99
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.inference.benchmark import benchmark_artifact, replay_payloads
+
+SIZING_REPORT_KEY = 'models/sizing_report.json'
+
+# Memory sizes a serverless endpoint accepts
+SERVERLESS_MEMORY_SIZES_MB = [1024, 2048, 3072, 4096, 5120, 6144]
+MAX_SERVERLESS_CONCURRENCY = 200
+
+# Used when no sizing report is available
+DEFAULT_MEMORY_MB = 2048
+DEFAULT_MAX_CONCURRENCY = 1
+
+# The serving stack in the sklearn container (nginx, gunicorn workers) on top of the model
+SERVING_OVERHEAD_MB = 512
+MEMORY_HEADROOM = 1.5
+CONCURRENCY_HEADROOM = 1.5
+
+DEFAULT_CONCURRENCY_LEVELS = [1, 2, 4, 8]
+
+
+def recommend(benchmark: Dict, target_rps: float, target_p99_ms: float, provision: bool = False) -> Dict:
+    """Turn benchmark results into serverless settings.
+
+    Each serverless concurrency slot serves one request at a time, so the
+    single-request latency sets the service time: by Little's law the endpoint
+    needs ``target_rps * mean latency`` slots busy on average, plus headroom.
+    When a cold start would break the p99 target, provisioned concurrency
+    covering that steady load is recommended if ``provision`` is set, and
+    only warned about otherwise, since it is billed around the clock.
+    """
+    warnings = []
+    cold_start = benchmark['cold_start']
+    single = next((level for level in benchmark['sweep'] if level['concurrency'] == 1), None)
+    if single is None:
+        raise ValueError("Sizing needs a benchmark at concurrency 1")
+    if single.get('mean_ms') is None:
+        raise ValueError(f"Every request at concurrency 1 failed: {single.get('first_error')}")
+
+    required_mb = cold_start['peak_rss_mb'] * MEMORY_HEADROOM + SERVING_OVERHEAD_MB
+    fitting = [size for size in SERVERLESS_MEMORY_SIZES_MB if size >= required_mb]
+    if not fitting:
+        warnings.append(f"Model needs ~{required_mb:.0f} MB, more than the largest serverless size")
+    memory_mb = fitting[0] if fitting else SERVERLESS_MEMORY_SIZES_MB[-1]
+
+    service_seconds = single['mean_ms'] / 1000
+    busy_slots = target_rps * service_seconds
+    max_concurrency = max(1, math.ceil(busy_slots * CONCURRENCY_HEADROOM))
+    if max_concurrency > MAX_SERVERLESS_CONCURRENCY:
+        warnings.append(f"Target throughput needs {max_concurrency} concurrent slots, "
+                        f"capped at {MAX_SERVERLESS_CONCURRENCY}")
+        max_concurrency = MAX_SERVERLESS_CONCURRENCY
+
+    if single['p99_ms'] > target_p99_ms:
+        warnings.append(f"Warm p99 of {single['p99_ms']:.1f} ms already exceeds the "
+                        f"{target_p99_ms:.0f} ms target")
+
+    cold_p99_ms = cold_start['cold_start_seconds'] * 1000
+    provisioned = 0
+    if target_rps > 0 and cold_p99_ms > target_p99_ms:
+        needed = min(max_concurrency, max(1, math.ceil(busy_slots)))
+        if provision:
+            provisioned = needed
+        else:
+            warnings.append(f"Cold start of {cold_p99_ms:.0f} ms exceeds the {target_p99_ms:.0f} ms target; "
+                            f"--provision would keep {needed} instance(s) warm")
+
+    return {
+        'MemorySizeInMB': memory_mb,
+        'MaxConcurrency': max_concurrency,
+        'ProvisionedConcurrency': provisioned,
+        'required_memory_mb': required_mb,
+        'service_time_ms': single['mean_ms'],
+        'cold_start_ms': cold_p99_ms,
+        'warnings': warnings,
+    }
+
+
+def size_artifact(artifact: str, target_rps: float, target_p99_ms: float, n_requests: int = 200,
+                  concurrency_levels: Optional[List[int]] = None, provision: bool = False) -> Dict:
+    """Benchmark an artifact and build a sizing report"""
+    # The service time comes from the single-request level, so it is always measured
+    levels = sorted(set(concurrency_levels or DEFAULT_CONCURRENCY_LEVELS) | {1})
+    benchmark = benchmark_artifact(artifact, replay_payloads(n_requests), levels)
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'targets': {'throughput_rps': target_rps, 'p99_ms': target_p99_ms, 'provision': provision},
+        'benchmark': benchmark,
+        'recommendation': recommend(benchmark, target_rps, target_p99_ms, provision),
+    }
+
+
+def serverless_config(report: Optional[Dict] = None) -> Dict:
+    """ServerlessConfig for an endpoint variant, from a sizing report when one is given"""
+    if not report:
+        return {'MemorySizeInMB': DEFAULT_MEMORY_MB, 'MaxConcurrency': DEFAULT_MAX_CONCURRENCY}
+    recommendation = report['recommendation']
+    config = {
+        'MemorySizeInMB': recommendation['MemorySizeInMB'],
+        'MaxConcurrency': recommendation['MaxConcurrency'],
+    }
+    if recommendation.get('ProvisionedConcurrency'):
+        config['ProvisionedConcurrency'] = recommendation['ProvisionedConcurrency']
+    return config
+
+
+def load_sizing_report(source: str, s3_client=None) -> Dict:
+    """Load a sizing report from a local path or s3://bucket/key"""
+    if source.startswith('s3://'):
+        bucket, key = source[len('s3://'):].split('/', 1)
+        if s3_client is None:
+            from src.aws_clients import get_client
+            s3_client = get_client('s3')
+        return json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+    with open(source) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recommend serverless endpoint settings for a model')
+    parser.add_argument('artifact', nargs='?',
+                        help='model.tar.gz, model directory or s3:// URI (default: the latest registered model)')
+    parser.add_argument('--target-rps', type=float, default=5.0, help='Target requests per second')
+    parser.add_argument('--target-p99-ms', type=float, default=500.0, help='Target p99 latency in ms')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY_LEVELS,
+                        help='Concurrency levels to sweep (1 is always included)')
+    parser.add_argument('--provision', action='store_true',
+                        help='Recommend provisioned concurrency when cold starts break the p99 target '
+                             '(billed while idle)')
+    parser.add_argument('--output', default='sizing_report.json', help='Local report path')
+    parser.add_argument('--upload', action='store_true',
+                        help=f'Upload the report to s3://$S3_BUCKET_NAME/{SIZING_REPORT_KEY}')
+    args = parser.parse_args()
+
+    bucket_name = os.environ.get('S3_BUCKET_NAME')
+    artifact = args.artifact
+    if not artifact and bucket_name:
+        from src.aws_clients import get_client
+        from src.models.registry import ArtifactRegistry
+        manifest = ArtifactRegistry(get_client('s3'), bucket_name).latest()
+        artifact = manifest and manifest['artifact']
+    if not artifact:
+        print("❌ Pass a model artifact or set S3_BUCKET_NAME")
+        exit(1)
+
+    print(f"📏 Sizing {artifact} for {args.target_rps:g} req/s at p99 <= {args.target_p99_ms:g} ms...")
+    try:
+        report = size_artifact(artifact, args.target_rps, args.target_p99_ms, args.requests, args.concurrency,
+                               args.provision)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+
+    cold_start = report['benchmark']['cold_start']
+    print(f"   Cold start: {cold_start['cold_start_seconds']:.2f}s "
+          f"(model load {cold_start['model_load_seconds']:.2f}s), peak RSS {cold_start['peak_rss_mb']:.0f} MB")
+    for level in report['benchmark']['sweep']:
+        print(f"   Concurrency {level['concurrency']}: {level['throughput_rps']:.1f} req/s, "
+              f"p50 {level['p50_ms']:.1f} ms, p99 {level['p99_ms']:.1f} ms")
+    recommendation = report['recommendation']
+    print(f"✅ Recommended: {recommendation['MemorySizeInMB']} MB, "
+          f"MaxConcurrency {recommendation['MaxConcurrency']}, "
+          f"ProvisionedConcurrency {recommendation['ProvisionedConcurrency']}")
+    for warning in recommendation['warnings']:
+        print(f"⚠️  {warning}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"   Report saved to {args.output}")
+
+    if args.upload:
+        if not bucket_name:
+            print("❌ Set S3_BUCKET_NAME to upload the report")
+            exit(1)
+        from src.aws_clients import get_client
+        get_client('s3').upload_file(args.output, bucket_name, SIZING_REPORT_KEY)
+        print(f"   Report uploaded to s3://{bucket_name}/{SIZING_REPORT_KEY}")
+
+
+if __name__ == "__main__":
+    main()
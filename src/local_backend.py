@@ -0,0 +1,498 @@
+"""
+Offline AWS backend
+Filesystem-backed S3, a SageMaker control plane whose endpoints are served by
+calling the inference handlers in-process, a CloudWatch without datapoints and
+an SNS that records published messages, so every I/O path can be run and
+benchmarked without an AWS account
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError, OperationNotPageableError, WaiterError
+from botocore.response import StreamingBody
+
+LOCAL_ROOT_ENV = 'MLOPS_LOCAL_ROOT'
+LOCAL_MODEL_DIR_ENV = 'MLOPS_LOCAL_MODEL_DIR'
+DEFAULT_LOCAL_ROOT = '.mlops-local'
+# Prefix of in-flight put_object files, which listings must not return
+TMP_PREFIX = '.mlops-tmp-'
+
+
+def local_root() -> str:
+    return os.path.abspath(os.environ.get(LOCAL_ROOT_ENV, DEFAULT_LOCAL_ROOT))
+
+
+def _error(code: str, message: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message},
+         'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation
+    )
+
+
+def _body(data: bytes) -> StreamingBody:
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+def _etag(data: bytes) -> str:
+    # S3 uses the quoted MD5 of the content for objects uploaded in one part
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+class LocalPaginator:
+    def __init__(self, method, input_token='ContinuationToken', output_token='NextContinuationToken'):
+        self.method = method
+        self.input_token = input_token
+        self.output_token = output_token
+
+    def paginate(self, **kwargs):
+        kwargs.pop('PaginationConfig', None)
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            if not page.get(self.output_token):
+                return
+            kwargs[self.input_token] = page[self.output_token]
+
+
+class LocalS3:
+    """S3 subset used by this project, storing objects as files under ``root/<bucket>/<key>``"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise _error('InvalidKey', f'Invalid key {key}', 'PutObject')
+        return path
+
+    def _read(self, bucket: str, key: str, operation: str, missing_code: str = 'NoSuchKey') -> bytes:
+        path = self._path(bucket, key)
+        if not os.path.isfile(path):
+            raise _error(missing_code, f'The specified key does not exist: {key}', operation, 404)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode()
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial object
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(Body)
+        os.replace(tmp_path, path)
+        return {'ETag': _etag(Body)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data = self._read(Bucket, Key, 'GetObject')
+        return {'Body': _body(data), 'ContentLength': len(data),
+                'LastModified': self._modified(Bucket, Key)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _error('404', 'Not Found', 'HeadObject', 404)
+        with open(path, 'rb') as f:
+            etag = _etag(f.read())
+        return {'ContentLength': os.path.getsize(path), 'LastModified': self._modified(Bucket, Key), 'ETag': etag}
+
+    def _modified(self, bucket: str, key: str) -> datetime:
+        return datetime.fromtimestamp(os.path.getmtime(self._path(bucket, key)), timezone.utc)
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if os.path.isfile(path):
+            os.remove(path)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete['Objects']:
+            self.delete_object(Bucket, obj['Key'])
+        return {'Deleted': [{'Key': obj['Key']} for obj in Delete['Objects']]}
+
+    def _keys(self, bucket: str, prefix: str):
+        bucket_dir = os.path.join(self.root, bucket)
+        # Only walk the directory the prefix points into
+        start = os.path.join(bucket_dir, os.path.dirname(prefix))
+        keys = []
+        for directory, _, files in os.walk(start):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), bucket_dir).replace(os.sep, '/')
+                if key.startswith(prefix) and not name.startswith(TMP_PREFIX):
+                    keys.append(key)
+        return sorted(keys)
+
+    def list_objects_v2(self, Bucket, Prefix='', StartAfter='', Delimiter=None,
+                        ContinuationToken=None, MaxKeys=1000, **kwargs):
+        after = ContinuationToken or StartAfter or ''
+        keys = [key for key in self._keys(Bucket, Prefix) if key > after]
+
+        contents, prefixes = [], []
+        for key in keys:
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = Prefix + rest.split(Delimiter, 1)[0] + Delimiter
+                if common not in prefixes:
+                    prefixes.append(common)
+            else:
+                contents.append(key)
+
+        page_keys = sorted(contents + prefixes)[:MaxKeys]
+        truncated = len(contents) + len(prefixes) > MaxKeys
+        response = {
+            'KeyCount': len(page_keys),
+            'IsTruncated': truncated,
+            'Contents': [
+                {'Key': key, 'Size': os.path.getsize(self._path(Bucket, key)),
+                 'LastModified': self._modified(Bucket, key)}
+                for key in page_keys if key in contents
+            ],
+            'CommonPrefixes': [{'Prefix': p} for p in page_keys if p in prefixes],
+        }
+        if truncated:
+            last = page_keys[-1]
+            # Skip everything under the last common prefix on the next page
+            response['NextContinuationToken'] = last + '￿' if last in prefixes else last
+        return response
+
+    def get_paginator(self, operation):
+        if operation != 'list_objects_v2':
+            raise OperationNotPageableError(operation_name=operation)
+        return LocalPaginator(self.list_objects_v2)
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        data = self._read(Bucket, Key, 'HeadObject', missing_code='404')
+        with open(Filename, 'wb') as f:
+            f.write(data)
+
+    def copy_object(self, CopySource, Bucket, Key, **kwargs):
+        data = self._read(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+        self.put_object(Bucket=Bucket, Key=Key, Body=data)
+        return {'CopyObjectResult': {}}
+
+    def copy(self, CopySource, Bucket, Key, **kwargs):
+        self.copy_object(CopySource, Bucket, Key)
+
+
+def endpoint_model_dir(endpoint_name: str, root: Optional[str] = None) -> str:
+    """Model directory a local endpoint serves; MLOPS_LOCAL_MODEL_DIR overrides it for all endpoints"""
+    if os.environ.get(LOCAL_MODEL_DIR_ENV):
+        return os.environ[LOCAL_MODEL_DIR_ENV]
+    return os.path.join(root or local_root(), 'sagemaker', 'endpoints', endpoint_name)
+
+
+def deploy_local_endpoint(endpoint_name: str, artifact: str, root: Optional[str] = None) -> str:
+    """Serve a model.tar.gz or model directory as a local endpoint"""
+    model_dir = os.path.join(root or local_root(), 'sagemaker', 'endpoints', endpoint_name)
+    if os.path.isdir(model_dir):
+        shutil.rmtree(model_dir)
+    if os.path.isdir(artifact):
+        shutil.copytree(artifact, model_dir)
+    else:
+        os.makedirs(model_dir)
+        with tarfile.open(artifact, 'r:gz') as tar:
+            tar.extractall(model_dir)
+    return model_dir
+
+
+def _s3_uri_to_file(uri: str, root: str, directory: str) -> str:
+    """Resolve a ModelDataUrl to a local file, reading s3:// URIs from the local S3"""
+    if not uri.startswith('s3://'):
+        return uri
+    bucket, key = uri[len('s3://'):].split('/', 1)
+    path = os.path.join(directory, os.path.basename(key))
+    LocalS3(os.path.join(root, 's3')).download_file(bucket, key, path)
+    return path
+
+
+class LocalWaiter:
+    """Waiter for control plane changes, which are synchronous locally"""
+
+    def __init__(self, check):
+        self.check = check
+
+    def wait(self, **kwargs):
+        kwargs.pop('WaiterConfig', None)
+        if not self.check(**kwargs):
+            raise WaiterError(name=self.check.__name__, reason='Resource is not in the expected state',
+                              last_response={})
+
+
+class LocalSageMaker:
+    """Control plane subset, storing models, endpoint configs and endpoints as JSON
+    under ``root/sagemaker/records``.
+
+    Creating or updating an endpoint deploys the ModelDataUrl of its first
+    variant's model with ``deploy_local_endpoint``, so it is InService as soon
+    as the call returns. Endpoints deployed directly with ``deploy_local_endpoint``
+    are described without a record.
+    """
+
+    RESOURCES = {
+        'model': ('models', 'ModelName', 'ModelArn'),
+        'endpoint-config': ('endpoint-configs', 'EndpointConfigName', 'EndpointConfigArn'),
+        'endpoint': ('endpoints', 'EndpointName', 'EndpointArn'),
+    }
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self, root: str, region: Optional[str] = None):
+        self.root = root
+        self.region = region or 'us-east-1'
+        self._lock = threading.Lock()
+
+    def _record_path(self, resource: str, name: str) -> str:
+        return os.path.join(self.root, 'sagemaker', 'records', self.RESOURCES[resource][0], f'{name}.json')
+
+    def _load(self, resource: str, name: str, operation: str) -> dict:
+        path = self._record_path(resource, name)
+        if not os.path.isfile(path):
+            raise _error('ValidationException', f'Could not find {resource} "{name}".', operation)
+        with open(path) as f:
+            return json.load(f)
+
+    def _save(self, resource: str, record: dict) -> dict:
+        _, name_key, arn_key = self.RESOURCES[resource]
+        path = self._record_path(resource, record[name_key])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record.setdefault(arn_key, f'arn:aws:sagemaker:{self.region}:000000000000:'
+                                   f'{resource}/{record[name_key].lower()}')
+        with open(path, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        return {arn_key: record[arn_key]}
+
+    def _create(self, resource: str, record: dict, operation: str) -> dict:
+        name = record[self.RESOURCES[resource][1]]
+        if os.path.isfile(self._record_path(resource, name)):
+            raise _error('ValidationException', f'Cannot create already existing {resource} "{name}".', operation)
+        record['CreationTime'] = datetime.now(timezone.utc).isoformat()
+        return self._save(resource, record)
+
+    def _delete(self, resource: str, name: str, operation: str) -> dict:
+        self._load(resource, name, operation)
+        os.remove(self._record_path(resource, name))
+        return {}
+
+    def _list(self, resource: str, result_key: str, NameContains=None, NextToken=None, MaxResults=100, **kwargs):
+        directory, name_key, arn_key = self.RESOURCES[resource]
+        record_dir = os.path.join(self.root, 'sagemaker', 'records', directory)
+        names = sorted(name[:-len('.json')] for name in os.listdir(record_dir)) if os.path.isdir(record_dir) else []
+        names = [name for name in names if (not NameContains or NameContains in name)
+                 and (not NextToken or name > NextToken)]
+        page = names[:MaxResults]
+        items = []
+        for name in page:
+            record = self._load(resource, name, f'List{directory.title()}')
+            item = {name_key: name, arn_key: record[arn_key], 'CreationTime': record['CreationTime']}
+            if resource == 'endpoint':
+                item['EndpointStatus'] = record['EndpointStatus']
+            items.append(item)
+        response = {result_key: items}
+        if len(names) > MaxResults:
+            response['NextToken'] = page[-1]
+        return response
+
+    def _deploy(self, endpoint_name: str, config_name: str, operation: str):
+        config = self._load('endpoint-config', config_name, operation)
+        model = self._load('model', config['ProductionVariants'][0]['ModelName'], operation)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            artifact = _s3_uri_to_file(model['PrimaryContainer']['ModelDataUrl'], self.root, tmp_dir)
+            deploy_local_endpoint(endpoint_name, artifact, self.root)
+
+    def create_model(self, ModelName, PrimaryContainer, ExecutionRoleArn=None, Tags=None, **kwargs):
+        return self._create('model', {'ModelName': ModelName, 'PrimaryContainer': PrimaryContainer,
+                                      'ExecutionRoleArn': ExecutionRoleArn}, 'CreateModel')
+
+    def describe_model(self, ModelName):
+        return self._load('model', ModelName, 'DescribeModel')
+
+    def delete_model(self, ModelName):
+        return self._delete('model', ModelName, 'DeleteModel')
+
+    def list_models(self, **kwargs):
+        return self._list('model', 'Models', **kwargs)
+
+    def create_endpoint_config(self, EndpointConfigName, ProductionVariants, Tags=None, **kwargs):
+        return self._create('endpoint-config', {'EndpointConfigName': EndpointConfigName,
+                                                'ProductionVariants': ProductionVariants},
+                            'CreateEndpointConfig')
+
+    def describe_endpoint_config(self, EndpointConfigName):
+        return self._load('endpoint-config', EndpointConfigName, 'DescribeEndpointConfig')
+
+    def delete_endpoint_config(self, EndpointConfigName):
+        return self._delete('endpoint-config', EndpointConfigName, 'DeleteEndpointConfig')
+
+    def list_endpoint_configs(self, **kwargs):
+        return self._list('endpoint-config', 'EndpointConfigs', **kwargs)
+
+    def create_endpoint(self, EndpointName, EndpointConfigName, Tags=None, **kwargs):
+        with self._lock:
+            if os.path.isfile(self._record_path('endpoint', EndpointName)):
+                raise _error('ValidationException', f'Cannot create already existing endpoint "{EndpointName}".',
+                             'CreateEndpoint')
+            self._deploy(EndpointName, EndpointConfigName, 'CreateEndpoint')
+            return self._create('endpoint', {'EndpointName': EndpointName, 'EndpointConfigName': EndpointConfigName,
+                                             'EndpointStatus': 'InService'}, 'CreateEndpoint')
+
+    def update_endpoint(self, EndpointName, EndpointConfigName, **kwargs):
+        with self._lock:
+            record = self._load('endpoint', EndpointName, 'UpdateEndpoint')
+            self._deploy(EndpointName, EndpointConfigName, 'UpdateEndpoint')
+            record['EndpointConfigName'] = EndpointConfigName
+            return self._save('endpoint', record)
+
+    def describe_endpoint(self, EndpointName):
+        model_dir = endpoint_model_dir(EndpointName, self.root)
+        if not os.path.isdir(model_dir):
+            raise _error('ValidationException', f'Could not find endpoint "{EndpointName}".',
+                         'DescribeEndpoint')
+        modified = datetime.fromtimestamp(os.path.getmtime(model_dir), timezone.utc)
+        if not os.path.isfile(self._record_path('endpoint', EndpointName)):
+            return {
+                'EndpointName': EndpointName,
+                'EndpointConfigName': f'{EndpointName}-local',
+                'EndpointStatus': 'InService',
+                'CreationTime': modified,
+                'LastModifiedTime': modified,
+            }
+        record = self._load('endpoint', EndpointName, 'DescribeEndpoint')
+        return dict(record, CreationTime=datetime.fromisoformat(record['CreationTime']), LastModifiedTime=modified)
+
+    def delete_endpoint(self, EndpointName):
+        with self._lock:
+            self._delete('endpoint', EndpointName, 'DeleteEndpoint')
+            shutil.rmtree(os.path.join(self.root, 'sagemaker', 'endpoints', EndpointName), ignore_errors=True)
+        return {}
+
+    def list_endpoints(self, **kwargs):
+        return self._list('endpoint', 'Endpoints', **kwargs)
+
+    def get_paginator(self, operation):
+        if operation not in ('list_models', 'list_endpoint_configs', 'list_endpoints'):
+            raise OperationNotPageableError(operation_name=operation)
+        return LocalPaginator(getattr(self, operation), 'NextToken', 'NextToken')
+
+    def get_waiter(self, waiter_name):
+        def endpoint_deleted(EndpointName):
+            return not os.path.isfile(self._record_path('endpoint', EndpointName))
+
+        def endpoint_in_service(EndpointName):
+            return self.describe_endpoint(EndpointName)['EndpointStatus'] == 'InService'
+
+        waiters = {'endpoint_deleted': endpoint_deleted, 'endpoint_in_service': endpoint_in_service}
+        if waiter_name not in waiters:
+            raise ValueError(f'Waiter does not exist: {waiter_name}')
+        return LocalWaiter(waiters[waiter_name])
+
+
+class LocalSageMakerRuntime:
+    """Serves invoke_endpoint by running the inference handlers in-process"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _model(self, endpoint_name: str):
+        with self._lock:
+            model_dir = endpoint_model_dir(endpoint_name, self.root)
+            if not os.path.isdir(model_dir):
+                self._models.pop(endpoint_name, None)
+                raise _error('ValidationException', f'Endpoint {endpoint_name} not found.',
+                             'InvokeEndpoint')
+            # Redeploying replaces the directory, so a new mtime means a new model
+            stat = os.stat(model_dir)
+            version = (stat.st_ino, stat.st_mtime_ns)
+            cached = self._models.get(endpoint_name)
+            if cached is None or cached[0] != version:
+                from src.inference import inference
+                self._models[endpoint_name] = (version, inference.model_fn(model_dir))
+            return self._models[endpoint_name][1]
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType='text/csv', Accept='application/json', **kwargs):
+        from src.inference import inference
+
+        model = self._model(EndpointName)
+        if isinstance(Body, bytes):
+            Body = Body.decode('utf-8')
+        try:
+            data = inference.input_fn(Body, ContentType)
+            prediction = inference.predict_fn(data, model)
+            output, content_type = inference.output_fn(prediction, Accept)
+        except Exception as e:
+            raise _error('ModelError', f'Received client error (400) from primary: {e}', 'InvokeEndpoint')
+        if isinstance(output, str):
+            output = output.encode()
+        return {'Body': _body(output), 'ContentType': content_type, 'InvokedProductionVariant': 'primary'}
+
+
+class LocalCloudWatch:
+    """Metric queries over an endpoint that publishes no metrics: every series is empty"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, **kwargs):
+        return {
+            'MetricDataResults': [
+                {'Id': query['Id'], 'Label': query.get('Label', query['Id']),
+                 'Timestamps': [], 'Values': [], 'StatusCode': 'Complete'}
+                for query in MetricDataQueries
+            ],
+            'Messages': [],
+        }
+
+
+class LocalSNS:
+    """Appends published messages to ``root/sns/<topic name>.jsonl``"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def publish(self, TopicArn, Message, Subject=None, **kwargs):
+        message_id = str(uuid.uuid4())
+        path = os.path.join(self.root, 'sns', f"{TopicArn.rsplit(':', 1)[-1]}.jsonl")
+        record = {'MessageId': message_id, 'TopicArn': TopicArn, 'Subject': Subject, 'Message': Message,
+                  'Timestamp': datetime.now(timezone.utc).isoformat()}
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return {'MessageId': message_id}
+
+
+LOCAL_CLIENTS = {
+    's3': lambda root, region: LocalS3(os.path.join(root, 's3')),
+    'sagemaker': LocalSageMaker,
+    'sagemaker-runtime': lambda root, region: LocalSageMakerRuntime(root),
+    'cloudwatch': lambda root, region: LocalCloudWatch(root),
+    'sns': lambda root, region: LocalSNS(root),
+}
+
+
+def create_local_client(service: str, region: Optional[str] = None):
+    if service not in LOCAL_CLIENTS:
+        raise ValueError(f"The local backend does not support {service}; "
+                         f"supported services are {sorted(LOCAL_CLIENTS)}")
+    return LOCAL_CLIENTS[service](local_root(), region)
@@ -0,0 +1,116 @@
+"""
+Training-time feature baseline
+Per-feature histogram bins and quantiles of the training data, plus the
+test-set prediction distribution, saved next to the model so the monitor can
+measure drift of captured traffic against them
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+BASELINE_FILENAME = 'baseline.json'
+BASELINE_VERSION = 2
+
+N_BINS = 10
+QUANTILE_LEVELS = np.linspace(0, 1, 101)
+
+# Equal-width bins over [0, 1] for prediction confidence and normalized entropy
+PREDICTION_BINS = 10
+
+
+def bin_indices(values: np.ndarray, inner_edges: np.ndarray) -> np.ndarray:
+    """Map values of one feature to histogram bins.
+
+    Bin ``i`` holds ``inner_edges[i - 1] <= x < inner_edges[i]``; the first and
+    last bins are open-ended. Training and monitoring must share this rule.
+    """
+    return np.searchsorted(inner_edges, values, side='right')
+
+
+def build_feature_baseline(X, feature_names, n_bins: int = N_BINS,
+                           quantile_levels: np.ndarray = QUANTILE_LEVELS) -> dict:
+    """Summarize training features as decile bins and a quantile grid"""
+    X = np.asarray(X, dtype=np.float64)
+    n_rows, n_features = X.shape
+
+    # Interior cut points of equal-frequency bins, shape (features, n_bins - 1)
+    inner_edges = np.quantile(X, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+    bin_counts = np.stack([
+        np.bincount(bin_indices(X[:, f], inner_edges[f]), minlength=n_bins)
+        for f in range(n_features)
+    ])
+
+    # Quantile grid with the exact training CDF at each point, used for KS
+    quantile_values = np.quantile(X, quantile_levels, axis=0).T
+    sorted_X = np.sort(X, axis=0)
+    quantile_cdf = np.stack([
+        np.searchsorted(sorted_X[:, f], quantile_values[f], side='right')
+        for f in range(n_features)
+    ]) / n_rows
+
+    return {
+        'version': BASELINE_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'n_rows': n_rows,
+        'features': list(feature_names),
+        'bin_edges': inner_edges.tolist(),
+        'bin_fractions': (bin_counts / n_rows).tolist(),
+        'quantile_levels': np.asarray(quantile_levels).tolist(),
+        'quantile_values': quantile_values.tolist(),
+        'quantile_cdf': quantile_cdf.tolist(),
+        'mean': X.mean(axis=0).tolist(),
+        'std': X.std(axis=0).tolist()
+    }
+
+
+def unit_bin_indices(values: np.ndarray, n_bins: int = PREDICTION_BINS) -> np.ndarray:
+    """Map values in [0, 1] to equal-width bins; 1.0 falls in the last bin"""
+    return np.clip((np.asarray(values) * n_bins).astype(np.int64), 0, n_bins - 1)
+
+
+def prediction_confidence_entropy(probabilities: np.ndarray):
+    """Top-class probability and entropy normalized to [0, 1] per prediction"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    confidence = probabilities.max(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(probabilities > 0, probabilities * np.log(probabilities), 0.0)
+    n_classes = probabilities.shape[1]
+    entropy = -terms.sum(axis=1) / np.log(n_classes) if n_classes > 1 else np.zeros(len(probabilities))
+    return confidence, np.clip(entropy, 0.0, 1.0)
+
+
+def build_prediction_baseline(classes, probabilities: np.ndarray,
+                              n_bins: int = PREDICTION_BINS) -> dict:
+    """Summarize the model's predictions on the test set.
+
+    ``probabilities`` are ``predict_proba`` outputs whose columns follow
+    ``classes``; predictions are taken as the most probable class.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    n_rows = len(probabilities)
+    predicted = probabilities.argmax(axis=1)
+    confidence, entropy = prediction_confidence_entropy(probabilities)
+
+    return {
+        'n_rows': n_rows,
+        'classes': [c.item() if hasattr(c, 'item') else c for c in classes],
+        'class_fractions': (np.bincount(predicted, minlength=len(classes)) / n_rows).tolist(),
+        'confidence_fractions': (np.bincount(unit_bin_indices(confidence, n_bins), minlength=n_bins)
+                                 / n_rows).tolist(),
+        'entropy_fractions': (np.bincount(unit_bin_indices(entropy, n_bins), minlength=n_bins)
+                              / n_rows).tolist(),
+        'mean_confidence': float(confidence.mean()),
+        'mean_entropy': float(entropy.mean())
+    }
+
+
+def save_baseline(baseline: dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(baseline, f)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
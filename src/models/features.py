@@ -0,0 +1,36 @@
+"""
+Feature dtype handling
+Features are generated, stored, parsed and trained on as float32 by default.
+The tree models cast their input to float32 before fitting or predicting, so
+float64 features only double the memory and bytes moved. Set FEATURE_DTYPE to
+float64 to restore full precision everywhere.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+FEATURE_DTYPE_ENV = 'FEATURE_DTYPE'
+FEATURE_DTYPES = ('float32', 'float64')
+DEFAULT_FEATURE_DTYPE = 'float32'
+TARGET_COLUMN = 'target'
+
+
+def feature_dtype(name: Optional[str] = None) -> np.dtype:
+    """The requested feature dtype, else FEATURE_DTYPE, else float32"""
+    name = name or os.environ.get(FEATURE_DTYPE_ENV) or DEFAULT_FEATURE_DTYPE
+    if name not in FEATURE_DTYPES:
+        raise ValueError(f"Unsupported feature dtype '{name}', expected one of {FEATURE_DTYPES}")
+    return np.dtype(name)
+
+
+def read_training_csv(path: str, dtype: Optional[str] = None) -> pd.DataFrame:
+    """Read a training CSV with the features parsed straight into the feature dtype.
+
+    The target column keeps its inferred (integer) dtype.
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    dtype = feature_dtype(dtype)
+    return pd.read_csv(path, dtype={name: dtype for name in columns if name != TARGET_COLUMN})
@@ -0,0 +1,154 @@
+"""
+Content-addressed model artifact registry
+Stores each model.tar.gz under the SHA-256 of the files the endpoint serves,
+next to a small manifest with its size, feature schema and training metrics.
+Identical retrains map to the same key, so they are neither uploaded nor
+deployed twice.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tarfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+ARTIFACT_PREFIX = 'models/artifacts'
+LATEST_MANIFEST_KEY = 'models/manifest.json'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# The endpoint only loads model.pkl. The baseline packed alongside it carries
+# a creation timestamp, so it does not count towards the artifact's identity.
+SERVED_FILES = ('model.pkl',)
+
+_ARTIFACT_KEY = re.compile(rf'^{ARTIFACT_PREFIX}/([0-9a-f]{{64}})/model\.tar\.gz$')
+
+
+def content_hash(files: Dict[str, bytes]) -> str:
+    """SHA-256 over the served files' names and contents, independent of tar and gzip metadata"""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        if name in SERVED_FILES:
+            data = files[name]
+            digest.update(f"{name}\0{len(data)}\0".encode())
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def artifact_hash(tar_path: str) -> str:
+    """Content hash of a model.tar.gz"""
+    files = {}
+    with tarfile.open(tar_path, 'r:gz') as tar:
+        for member in tar.getmembers():
+            name = os.path.normpath(member.name)
+            if member.isfile() and name in SERVED_FILES:
+                files[name] = tar.extractfile(member).read()
+    if not files:
+        raise ValueError(f"{tar_path} contains none of {SERVED_FILES}")
+    return content_hash(files)
+
+
+def build_artifact(files: Dict[str, str], output_path: str) -> str:
+    """Pack ``{arcname: path}`` into a reproducible model.tar.gz and return its content hash.
+
+    Member order, timestamps and ownership are fixed, so the same files always
+    give the same bytes.
+    """
+    with open(output_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+        with tarfile.open(fileobj=compressed, mode='w') as tar:
+            for arcname in sorted(files):
+                info = tar.gettarinfo(files[arcname], arcname=arcname)
+                info.mtime = 0
+                info.uid = info.gid = 0
+                info.uname = info.gname = ''
+                with open(files[arcname], 'rb') as f:
+                    tar.addfile(info, f)
+    return artifact_hash(output_path)
+
+
+def feature_schema(X) -> List[Dict]:
+    """Column names and dtypes of a training DataFrame"""
+    return [{'name': str(name), 'dtype': str(dtype)} for name, dtype in X.dtypes.items()]
+
+
+def hash_from_uri(uri: Optional[str]) -> Optional[str]:
+    """The content hash in a registry artifact URI, or None for any other location"""
+    if not uri or not uri.startswith('s3://'):
+        return None
+    match = _ARTIFACT_KEY.match(uri[len('s3://'):].split('/', 1)[-1])
+    return match.group(1) if match else None
+
+
+class ArtifactRegistry:
+    """Artifacts at ``models/artifacts/<hash>/`` and the latest manifest at ``models/manifest.json``"""
+
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def artifact_key(self, digest: str) -> str:
+        return f'{ARTIFACT_PREFIX}/{digest}/model.tar.gz'
+
+    def artifact_uri(self, digest: str) -> str:
+        return f's3://{self.bucket}/{self.artifact_key(digest)}'
+
+    def _load(self, key: str) -> Optional[Dict]:
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(body)
+
+    def manifest(self, digest: str) -> Optional[Dict]:
+        return self._load(f'{ARTIFACT_PREFIX}/{digest}/{MANIFEST_NAME}')
+
+    def latest(self) -> Optional[Dict]:
+        """Manifest of the most recently registered artifact"""
+        return self._load(LATEST_MANIFEST_KEY)
+
+    def promote(self, digest: str) -> Optional[Dict]:
+        """Point the latest manifest at an artifact that is already stored; None if it is not"""
+        manifest = self.manifest(digest)
+        if manifest is None:
+            return None
+        manifest['registered_at'] = datetime.utcnow().isoformat()
+        self.s3.put_object(Bucket=self.bucket, Key=LATEST_MANIFEST_KEY, Body=json.dumps(manifest, indent=2),
+                           ContentType='application/json')
+        return manifest
+
+    def register(self, tar_path: str, feature_schema: Optional[List[Dict]] = None,
+                 metrics: Optional[Dict] = None, hyperparameters: Optional[Dict] = None) -> Dict:
+        """Upload an artifact unless one with the same content is already stored.
+
+        Always points the latest manifest at it. The returned manifest says
+        whether the upload was skipped.
+        """
+        digest = artifact_hash(tar_path)
+        existing = self.manifest(digest)
+        if existing is None:
+            self.s3.upload_file(tar_path, self.bucket, self.artifact_key(digest))
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'hash': digest,
+            'artifact': self.artifact_uri(digest),
+            'size_bytes': existing['size_bytes'] if existing else os.path.getsize(tar_path),
+            'created_at': existing['created_at'] if existing else datetime.utcnow().isoformat(),
+            'registered_at': datetime.utcnow().isoformat(),
+            'feature_schema': feature_schema or [],
+            'metrics': metrics or {},
+            'hyperparameters': hyperparameters or {},
+        }
+        body = json.dumps(manifest, indent=2)
+        if existing is None:
+            self.s3.put_object(Bucket=self.bucket, Key=f'{ARTIFACT_PREFIX}/{digest}/{MANIFEST_NAME}',
+                               Body=body, ContentType='application/json')
+        self.s3.put_object(Bucket=self.bucket, Key=LATEST_MANIFEST_KEY, Body=body, ContentType='application/json')
+        return {**manifest, 'uploaded': existing is None}
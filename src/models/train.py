@@ -1,29 +1,63 @@
 import os
-import boto3
-import pandas as pd
+import sys
+import tarfile
+import time
 import joblib
-from sklearn.ensemble import RandomForestClassifier
+import numpy as np
+import sklearn
 from sklearn.metrics import accuracy_score, classification_report
 import sagemaker
 from sagemaker.sklearn.estimator import SKLearn
 
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.aws_clients import get_client
+from baseline import BASELINE_FILENAME, build_feature_baseline, build_prediction_baseline, save_baseline
+from binning import fit_model, training_bins, training_mode, training_settings
+from features import feature_dtype, read_training_csv
+from registry import ArtifactRegistry, build_artifact, feature_schema
+from training_cache import TRAINING_DATA_KEYS, TrainingCache, data_fingerprint, source_hash, training_fingerprint
+
+SKLEARN_FRAMEWORK_VERSION = '1.2-1'
+
 class ModelTrainer:
     def __init__(self, bucket_name, role_arn):
         self.bucket_name = bucket_name
         self.role_arn = role_arn
         self.sagemaker_session = sagemaker.Session()
         
-    def train_local(self):
-        """Train model locally for testing"""
-        s3 = boto3.client('s3')
+    def _training_fingerprint(self, s3, settings, environment):
+        """Fingerprint of the input data, settings, training code and library versions"""
+        return training_fingerprint(
+            data_fingerprint(s3, self.bucket_name, TRAINING_DATA_KEYS), settings, source_hash(), environment
+        )
+    
+    def train_local(self, force=False):
+        """Train model locally for testing, or reuse the result of an identical earlier run"""
+        s3 = get_client('s3')
+        hyperparameters = {'n_estimators': 100, 'random_state': 42}
+        mode, n_bins = training_mode(), training_bins()
+        settings = {**hyperparameters, **training_settings(mode, n_bins), 'feature_dtype': feature_dtype().name}
+        
+        # Skip the fit when data, settings, code and library versions all match an earlier run
+        cache = TrainingCache(s3, self.bucket_name)
+        fingerprint = self._training_fingerprint(
+            s3, settings, {'sklearn': sklearn.__version__, 'numpy': np.__version__}
+        )
+        cached = None if force else cache.lookup(fingerprint)
+        if cached is not None and ArtifactRegistry(s3, self.bucket_name).promote(cached['hash']) is not None:
+            cache.restore(fingerprint, BASELINE_FILENAME, f'models/{BASELINE_FILENAME}')
+            print(f"Training inputs unchanged since {cached['created_at']}, reusing {cached['artifact']}")
+            print(f"Model Accuracy: {cached['metrics']['accuracy']:.4f}")
+            return cached['metrics']['accuracy']
         
         # Download training data
         s3.download_file(self.bucket_name, 'data/train.csv', '/tmp/train.csv')
         s3.download_file(self.bucket_name, 'data/test.csv', '/tmp/test.csv')
         
         # Load data
-        train_df = pd.read_csv('/tmp/train.csv')
-        test_df = pd.read_csv('/tmp/test.csv')
+        train_df = read_training_csv('/tmp/train.csv')
+        test_df = read_training_csv('/tmp/test.csv')
         
         # Prepare features and target
         X_train = train_df.drop('target', axis=1)
@@ -31,9 +65,11 @@ class ModelTrainer:
         X_test = test_df.drop('target', axis=1)
         y_test = test_df['target']
         
-        # Train model
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
+        # Train model, on quantile bin codes when TRAINING_MODE=binned
+        started = time.perf_counter()
+        model = fit_model(X_train, y_train, mode, n_bins, **hyperparameters)
+        fit_seconds = time.perf_counter() - started
+        print(f"Trained {mode} model in {fit_seconds:.1f}s")
         
         # Evaluate
         y_pred = model.predict(X_test)
@@ -47,31 +83,75 @@ class ModelTrainer:
         joblib.dump(model, '/tmp/model.pkl', protocol=4)
         print("Model saved successfully")
         
-        # Create model archive for SageMaker
-        import tarfile
-        with tarfile.open('/tmp/model.tar.gz', 'w:gz') as tar:
-            tar.add('/tmp/model.pkl', arcname='model.pkl')
+        # Save the feature and test-set prediction baseline used for drift monitoring
+        baseline = build_feature_baseline(X_train, X_train.columns)
+        baseline['predictions'] = build_prediction_baseline(model.classes_, model.predict_proba(X_test))
+        save_baseline(baseline, f'/tmp/{BASELINE_FILENAME}')
+        
+        # Create a reproducible model archive for SageMaker
+        build_artifact({
+            'model.pkl': '/tmp/model.pkl',
+            BASELINE_FILENAME: f'/tmp/{BASELINE_FILENAME}',
+        }, '/tmp/model.tar.gz')
+        
+        # Register the archive under its content hash; identical models are not uploaded again
+        metrics = {'accuracy': accuracy, 'n_train': len(X_train), 'n_test': len(X_test), 'fit_seconds': fit_seconds}
+        manifest = ArtifactRegistry(s3, self.bucket_name).register(
+            '/tmp/model.tar.gz',
+            feature_schema=feature_schema(X_train),
+            metrics=metrics,
+            hyperparameters=settings
+        )
+        if manifest['uploaded']:
+            print(f"Model uploaded to {manifest['artifact']}")
+        else:
+            print(f"Model unchanged, already stored at {manifest['artifact']}")
+        
+        # Keep an unpacked copy of the baseline where the monitor reads it
+        s3.upload_file(f'/tmp/{BASELINE_FILENAME}', self.bucket_name, f'models/{BASELINE_FILENAME}')
+        print(f"Feature baseline uploaded to s3://{self.bucket_name}/models/{BASELINE_FILENAME}")
         
-        # Upload model archive to S3
-        s3.upload_file('/tmp/model.tar.gz', self.bucket_name, 'models/model.tar.gz')
-        print(f"Model uploaded to s3://{self.bucket_name}/models/model.tar.gz")
+        # Remember what these inputs produced
+        cache.store(fingerprint, {'hash': manifest['hash'], 'artifact': manifest['artifact'], 'metrics': metrics},
+                    {BASELINE_FILENAME: f'/tmp/{BASELINE_FILENAME}'})
         
         return accuracy
     
-    def train_sagemaker(self):
-        """Train model using SageMaker Training Job"""
+    def train_sagemaker(self, force=False):
+        """Train model using SageMaker Training Job, or attach to the job of an identical earlier run"""
+        s3 = get_client('s3')
+        hyperparameters = {
+            'n_estimators': 100,
+            'random_state': 42,
+            'feature_dtype': feature_dtype().name,
+            **training_settings(training_mode(), training_bins())
+        }
+        
+        cache = TrainingCache(s3, self.bucket_name)
+        fingerprint = self._training_fingerprint(
+            s3, hyperparameters, {'framework_version': SKLEARN_FRAMEWORK_VERSION}
+        )
+        cached = None if force else cache.lookup(fingerprint)
+        if cached is not None:
+            print(f"Training inputs unchanged since {cached['created_at']}, reusing job {cached['training_job']}")
+            sklearn_estimator = SKLearn.attach(cached['training_job'], sagemaker_session=self.sagemaker_session)
+            registry = ArtifactRegistry(s3, self.bucket_name)
+            if (cached.get('hash') and BASELINE_FILENAME in cached.get('files', [])
+                    and registry.promote(cached['hash']) is not None):
+                cache.restore(fingerprint, BASELINE_FILENAME, f'models/{BASELINE_FILENAME}')
+            else:
+                self._register_model_data(s3, sklearn_estimator.model_data, hyperparameters)
+            return sklearn_estimator
+        
         sklearn_estimator = SKLearn(
             entry_point='train_script.py',
             source_dir='src/models',
             role=self.role_arn,
             instance_type='ml.m5.large',
-            framework_version='1.2-1',
+            framework_version=SKLEARN_FRAMEWORK_VERSION,
             py_version='py3',
             script_mode=True,
-            hyperparameters={
-                'n_estimators': 100,
-                'random_state': 42
-            }
+            hyperparameters=hyperparameters
         )
         
         # Set up data channels
@@ -91,7 +171,42 @@ class ModelTrainer:
             'test': test_input
         })
         
+        # Register the job's output, so deploy_serverless picks it up like a local model
+        manifest = self._register_model_data(s3, sklearn_estimator.model_data, hyperparameters)
+        
+        cache.store(fingerprint, {
+            'training_job': sklearn_estimator.latest_training_job.name,
+            'model_data': sklearn_estimator.model_data,
+            'hash': manifest['hash'],
+            'artifact': manifest['artifact'],
+        }, {BASELINE_FILENAME: f'/tmp/sagemaker-{BASELINE_FILENAME}'} if manifest['baseline_uploaded'] else None)
+        
         return sklearn_estimator
+    
+    def _register_model_data(self, s3, model_data, hyperparameters):
+        """Register a training job's model.tar.gz under its content hash and upload the baseline packed in it"""
+        bucket, key = model_data[len('s3://'):].split('/', 1)
+        s3.download_file(bucket, key, '/tmp/sagemaker-model.tar.gz')
+        manifest = ArtifactRegistry(s3, self.bucket_name).register(
+            '/tmp/sagemaker-model.tar.gz',
+            hyperparameters=hyperparameters
+        )
+        print(f"Registered {model_data} as {manifest['artifact']}")
+        
+        # The monitor compares drift against the baseline of the deployed model
+        baseline_path = f'/tmp/sagemaker-{BASELINE_FILENAME}'
+        with tarfile.open('/tmp/sagemaker-model.tar.gz', 'r:gz') as tar:
+            member = next((m for m in tar.getmembers()
+                           if m.isfile() and os.path.normpath(m.name) == BASELINE_FILENAME), None)
+            if member is not None:
+                with open(baseline_path, 'wb') as f:
+                    f.write(tar.extractfile(member).read())
+        if member is None:
+            print(f"⚠️  {model_data} has no {BASELINE_FILENAME}; the monitor baseline was not updated")
+        else:
+            s3.upload_file(baseline_path, self.bucket_name, f'models/{BASELINE_FILENAME}')
+            print(f"Feature baseline uploaded to s3://{self.bucket_name}/models/{BASELINE_FILENAME}")
+        return {**manifest, 'baseline_uploaded': member is not None}
 
 if __name__ == "__main__":
     bucket_name = os.environ.get('S3_BUCKET_NAME')
@@ -102,9 +217,10 @@ if __name__ == "__main__":
         exit(1)
     
     trainer = ModelTrainer(bucket_name, role_arn)
+    force_train = os.environ.get('FORCE_TRAIN', '').lower() in ('1', 'true', 'yes')
     
     # Train locally first
     print("Training model locally...")
-    accuracy = trainer.train_local()
+    accuracy = trainer.train_local(force=force_train)
     
     print(f"\nLocal training completed with accuracy: {accuracy:.4f}")
\ No newline at end of file
@@ -1,9 +1,11 @@
 import argparse
 import os
-import pandas as pd
+import time
 import joblib
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
+from baseline import BASELINE_FILENAME, build_feature_baseline, build_prediction_baseline, save_baseline
+from binning import DEFAULT_BINS, DEFAULT_TRAINING_MODE, TRAINING_MODES, fit_model
+from features import FEATURE_DTYPES, read_training_csv
 
 def model_fn(model_dir):
     """Load model for SageMaker inference"""
@@ -16,6 +18,9 @@ if __name__ == "__main__":
     # Hyperparameters
     parser.add_argument("--n_estimators", type=int, default=100)
     parser.add_argument("--random_state", type=int, default=42)
+    parser.add_argument("--feature_dtype", type=str, choices=FEATURE_DTYPES, default=None)
+    parser.add_argument("--training_mode", type=str, choices=TRAINING_MODES, default=DEFAULT_TRAINING_MODE)
+    parser.add_argument("--n_bins", type=int, default=DEFAULT_BINS)
     
     # SageMaker specific arguments
     parser.add_argument("--model-dir", type=str, default=os.environ.get("SM_MODEL_DIR"))
@@ -25,8 +30,8 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     # Load training data
-    train_df = pd.read_csv(os.path.join(args.train, "train.csv"))
-    test_df = pd.read_csv(os.path.join(args.test, "test.csv"))
+    train_df = read_training_csv(os.path.join(args.train, "train.csv"), args.feature_dtype)
+    test_df = read_training_csv(os.path.join(args.test, "test.csv"), args.feature_dtype)
     
     # Prepare features and target
     X_train = train_df.drop("target", axis=1)
@@ -35,11 +40,13 @@ if __name__ == "__main__":
     y_test = test_df["target"]
     
     # Train model
-    model = RandomForestClassifier(
+    started = time.perf_counter()
+    model = fit_model(
+        X_train, y_train, args.training_mode, args.n_bins,
         n_estimators=args.n_estimators,
         random_state=args.random_state
     )
-    model.fit(X_train, y_train)
+    print(f"Trained {args.training_mode} model in {time.perf_counter() - started:.1f}s")
     
     # Evaluate
     y_pred = model.predict(X_test)
@@ -51,4 +58,10 @@ if __name__ == "__main__":
     
     # Save model
     joblib.dump(model, os.path.join(args.model_dir, "model.pkl"))
-    print("Model saved successfully")
\ No newline at end of file
+    print("Model saved successfully")
+    
+    # Save the feature and test-set prediction baseline next to the model for drift monitoring
+    baseline = build_feature_baseline(X_train, X_train.columns)
+    baseline['predictions'] = build_prediction_baseline(model.classes_, model.predict_proba(X_test))
+    save_baseline(baseline, os.path.join(args.model_dir, BASELINE_FILENAME))
+    print("Feature baseline saved successfully")
\ No newline at end of file
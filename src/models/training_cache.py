@@ -0,0 +1,93 @@
+"""
+Training run cache
+Fingerprints everything a training run depends on: the input data ETags, the
+hyperparameters, the training code and the library versions. Each fingerprint
+maps to the artifact and metrics it produced, so an unchanged run reuses them
+instead of refitting.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from botocore.exceptions import ClientError
+
+CACHE_PREFIX = 'models/training-runs'
+RUN_RECORD_NAME = 'run.json'
+CACHE_VERSION = 1
+TRAINING_DATA_KEYS = ('data/train.csv', 'data/test.csv')
+
+# The training code is every module next to this one, as shipped in the SageMaker source_dir
+TRAINING_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def source_hash(directory: str = TRAINING_SOURCE_DIR) -> str:
+    """SHA-256 over the names and contents of the Python files in the training code directory"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                data = f.read()
+            digest.update(f"{name}\0{len(data)}\0".encode())
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def data_fingerprint(s3, bucket: str, keys: Iterable[str] = TRAINING_DATA_KEYS) -> Dict[str, str]:
+    """ETag of each input object, which changes whenever its content does"""
+    return {key: s3.head_object(Bucket=bucket, Key=key)['ETag'].strip('"') for key in keys}
+
+
+def training_fingerprint(data: Dict[str, str], hyperparameters: Dict, code: str,
+                         environment: Optional[Dict] = None) -> str:
+    """SHA-256 of the canonical JSON of every training input"""
+    inputs = {
+        'version': CACHE_VERSION,
+        'data': data,
+        'hyperparameters': hyperparameters,
+        'code': code,
+        'environment': environment or {},
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class TrainingCache:
+    """Run records at ``models/training-runs/<fingerprint>/run.json``, with any files they keep beside them"""
+
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def run_key(self, fingerprint: str, name: str = RUN_RECORD_NAME) -> str:
+        return f'{CACHE_PREFIX}/{fingerprint}/{name}'
+
+    def lookup(self, fingerprint: str) -> Optional[Dict]:
+        """The record of an earlier run with this fingerprint, if any"""
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=self.run_key(fingerprint))['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(body)
+
+    def store(self, fingerprint: str, record: Dict, files: Optional[Dict[str, str]] = None) -> Dict:
+        """Save a run record, uploading ``{name: path}`` files next to it"""
+        for name, path in (files or {}).items():
+            self.s3.upload_file(path, self.bucket, self.run_key(fingerprint, name))
+        record = {
+            **record,
+            'fingerprint': fingerprint,
+            'files': sorted(files or {}),
+            'created_at': datetime.utcnow().isoformat(),
+        }
+        self.s3.put_object(Bucket=self.bucket, Key=self.run_key(fingerprint), Body=json.dumps(record, indent=2),
+                           ContentType='application/json')
+        return record
+
+    def restore(self, fingerprint: str, name: str, key: str):
+        """Copy a file kept with a run record to ``key``"""
+        self.s3.copy_object(CopySource={'Bucket': self.bucket, 'Key': self.run_key(fingerprint, name)},
+                            Bucket=self.bucket, Key=key)
@@ -0,0 +1,368 @@
+"""
+Monitoring checkpoint state
+Mergeable running feature statistics, drift histograms and the processed
+capture keys, persisted between monitoring runs in S3 or a local file
+"""
+
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from src.monitoring.drift import DriftHistogram
+from src.monitoring.predictions import PredictionHistogram
+
+CHECKPOINT_VERSION = 1
+HOUR_FORMAT = '%Y-%m-%dT%H'
+
+# Rows per block when accumulating float32 rows in float64
+STATS_BLOCK_ROWS = 65536
+
+# Runs that retry a capture file that failed to download or decode before giving up on it
+MAX_CAPTURE_ATTEMPTS = 3
+
+# Data Capture can write a file hours after the hour it is filed under, so this
+# many hours before the newest processed key are listed again on every run
+LATE_CAPTURE_HOURS = 6
+
+_CAPTURE_HOUR_PATTERN = re.compile(r'/(\d{4})/(\d{2})/(\d{2})/(\d{2})/[^/]+$')
+
+
+def capture_key_hour(key: str) -> Optional[str]:
+    """Return the capture hour (YYYY-MM-DDTHH) encoded in a data capture key"""
+    match = _CAPTURE_HOUR_PATTERN.search(key)
+    if not match:
+        return None
+    year, month, day, hour = match.groups()
+    return f"{year}-{month}-{day}T{hour}"
+
+
+def capture_key_prefix(key: str) -> str:
+    """The hourly partition prefix a capture key lives under"""
+    return key.rsplit('/', 1)[0] + '/'
+
+
+def late_capture_cutoff(key: str, late_hours: int = LATE_CAPTURE_HOURS) -> Optional[datetime]:
+    """Start of the earliest hour that can still receive files late, relative to a capture key"""
+    hour = capture_key_hour(key)
+    if hour is None:
+        return None
+    return datetime.strptime(hour, HOUR_FORMAT) - timedelta(hours=late_hours)
+
+
+class RunningStats:
+    """Per-feature count, mean, M2, min and max that can be updated and merged.
+
+    Batches are combined with the parallel variance formula of Chan et al.,
+    so statistics from different files, hours or processes merge exactly.
+    """
+
+    def __init__(self, n_features: int = 0):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros(self.n_features)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def update(self, data: np.ndarray):
+        """Fold a 2D array of rows into the statistics.
+
+        float32 rows are accumulated in float64 block by block, without
+        widening the whole batch.
+        """
+        data = np.asarray(data)
+        if data.dtype != np.float32:
+            data = data.astype(np.float64, copy=False)
+        if data.ndim != 2 or len(data) == 0:
+            return
+
+        batch = RunningStats(data.shape[1])
+        batch.count = len(data)
+        batch.mean = data.mean(axis=0, dtype=np.float64)
+        for start in range(0, len(data), STATS_BLOCK_ROWS):
+            batch.m2 += ((data[start:start + STATS_BLOCK_ROWS] - batch.mean) ** 2).sum(axis=0)
+        batch.min = data.min(axis=0).astype(np.float64)
+        batch.max = data.max(axis=0).astype(np.float64)
+        self.merge(batch)
+
+    def merge(self, other: 'RunningStats'):
+        """Merge another set of statistics into this one"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.m2 = other.m2.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            return
+        if other.n_features != self.n_features:
+            raise ValueError(
+                f"Cannot merge statistics over {other.n_features} features into {self.n_features}"
+            )
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = total
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_values': self.mean.tolist(),
+            'std_values': self.std.tolist(),
+            'min_values': self.min.tolist(),
+            'max_values': self.max.tolist(),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'min': self.min.tolist(),
+            'max': self.max.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningStats':
+        stats = cls()
+        stats.count = data['count']
+        stats.mean = np.array(data['mean'], dtype=np.float64)
+        stats.m2 = np.array(data['m2'], dtype=np.float64)
+        stats.min = np.array(data['min'], dtype=np.float64)
+        stats.max = np.array(data['max'], dtype=np.float64)
+        return stats
+
+
+def _window_cutoff(hours_back: int, now: Optional[datetime]) -> str:
+    now = now or datetime.utcnow()
+    return (now - timedelta(hours=hours_back)).strftime(HOUR_FORMAT)
+
+
+class MonitorCheckpoint:
+    """Incremental monitoring state: processed capture keys plus hourly statistics.
+
+    Every capture key up to ``last_key`` has been processed, except those in
+    ``failed_keys`` (key to failed attempts), which are retried. Files can
+    land after later keys, even in earlier hours, so the ``LATE_CAPTURE_HOURS``
+    up to the hour holding ``last_key`` are listed again and ``seen_keys``
+    holds what was already processed in them.
+
+    ``pending_sketches`` names a run whose staged hourly sketches may not be
+    merged yet; it is finished before the next run starts.
+
+    ``drift_hours`` holds counts over the bins of one training baseline, so it
+    is only meaningful while ``baseline_id`` matches the deployed baseline.
+    ``prediction_hours`` uses fixed bins and survives baseline changes.
+    """
+
+    def __init__(self, last_key: Optional[str] = None, hours: Optional[Dict[str, RunningStats]] = None,
+                 updated_at: Optional[str] = None, baseline_id: Optional[str] = None,
+                 drift_hours: Optional[Dict[str, DriftHistogram]] = None,
+                 prediction_hours: Optional[Dict[str, PredictionHistogram]] = None,
+                 seen_keys: Optional[List[str]] = None, failed_keys: Optional[Dict[str, int]] = None,
+                 pending_sketches: Optional[str] = None):
+        self.last_key = last_key
+        self.seen_keys = set(seen_keys or [])
+        self.failed_keys = dict(failed_keys or {})
+        self.pending_sketches = pending_sketches
+        self.hours = hours or {}
+        self.updated_at = updated_at
+        self.baseline_id = baseline_id
+        self.drift_hours = drift_hours or {}
+        self.prediction_hours = prediction_hours or {}
+
+    def hour_stats(self, hour: str) -> RunningStats:
+        if hour not in self.hours:
+            self.hours[hour] = RunningStats()
+        return self.hours[hour]
+
+    def hour_drift(self, hour: str, baseline: Dict) -> DriftHistogram:
+        if hour not in self.drift_hours:
+            self.drift_hours[hour] = DriftHistogram.empty(baseline)
+        return self.drift_hours[hour]
+
+    def hour_predictions(self, hour: str) -> PredictionHistogram:
+        if hour not in self.prediction_hours:
+            self.prediction_hours[hour] = PredictionHistogram()
+        return self.prediction_hours[hour]
+
+    def advance(self, processed: Iterable[str], failed: Iterable[str],
+                max_attempts: int = MAX_CAPTURE_ATTEMPTS, late_hours: int = LATE_CAPTURE_HOURS) -> List[str]:
+        """Record the outcome of one run over capture files.
+
+        Moves ``last_key`` to the newest processed key and keeps failed keys for
+        retry. Returns the keys given up on after ``max_attempts`` failures.
+        """
+        done = set(processed)
+        failed_keys = {}
+        for key in failed:
+            attempts = self.failed_keys.get(key, 0) + 1
+            if attempts < max_attempts:
+                failed_keys[key] = attempts
+            else:
+                done.add(key)
+        given_up = sorted(done - set(processed))
+        self.failed_keys = failed_keys
+
+        if done:
+            newest = max(done)
+            if self.last_key is None or newest > self.last_key:
+                self.last_key = newest
+        if self.last_key is not None:
+            self.seen_keys = {key for key in self.seen_keys | done if self._may_arrive_late(key, late_hours)}
+        return given_up
+
+    def _may_arrive_late(self, key: str, late_hours: int) -> bool:
+        """Whether ``key`` is in an hour the next run lists again"""
+        cutoff = late_capture_cutoff(self.last_key, late_hours)
+        hour = capture_key_hour(key)
+        if cutoff is None or hour is None:
+            return capture_key_prefix(key) == capture_key_prefix(self.last_key)
+        return datetime.strptime(hour, HOUR_FORMAT) >= cutoff
+
+    def use_baseline(self, baseline_id: str):
+        """Reset drift counts when the training baseline changes"""
+        if self.baseline_id != baseline_id:
+            self.baseline_id = baseline_id
+            self.drift_hours = {}
+
+    def window_stats(self, hours_back: int, now: Optional[datetime] = None) -> RunningStats:
+        """Merge the hourly statistics of the last ``hours_back`` hours"""
+        cutoff = _window_cutoff(hours_back, now)
+        merged = RunningStats()
+        for hour in sorted(self.hours):
+            if hour > cutoff:
+                merged.merge(self.hours[hour])
+        return merged
+
+    def window_drift(self, hours_back: int, baseline: Dict, now: Optional[datetime] = None) -> DriftHistogram:
+        """Merge the hourly drift histograms of the last ``hours_back`` hours"""
+        cutoff = _window_cutoff(hours_back, now)
+        merged = DriftHistogram.empty(baseline)
+        for hour, histogram in self.drift_hours.items():
+            if hour > cutoff:
+                merged.merge(histogram)
+        return merged
+
+    def window_predictions(self, hours_back: int, now: Optional[datetime] = None) -> PredictionHistogram:
+        """Merge the hourly prediction histograms of the last ``hours_back`` hours"""
+        cutoff = _window_cutoff(hours_back, now)
+        merged = PredictionHistogram()
+        for hour, histogram in self.prediction_hours.items():
+            if hour > cutoff:
+                merged.merge(histogram)
+        return merged
+
+    def prune(self, retention_hours: int, now: Optional[datetime] = None):
+        """Drop hourly state older than the retention period"""
+        cutoff = _window_cutoff(retention_hours, now)
+        self.hours = {hour: stats for hour, stats in self.hours.items() if hour > cutoff}
+        self.drift_hours = {hour: hist for hour, hist in self.drift_hours.items() if hour > cutoff}
+        self.prediction_hours = {hour: hist for hour, hist in self.prediction_hours.items() if hour > cutoff}
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': CHECKPOINT_VERSION,
+            'last_key': self.last_key,
+            'seen_keys': sorted(self.seen_keys),
+            'failed_keys': dict(sorted(self.failed_keys.items())),
+            'pending_sketches': self.pending_sketches,
+            'updated_at': self.updated_at,
+            'hours': {hour: stats.to_dict() for hour, stats in sorted(self.hours.items())},
+            'baseline_id': self.baseline_id,
+            'drift_hours': {hour: hist.to_dict() for hour, hist in sorted(self.drift_hours.items())},
+            'prediction_hours': {hour: hist.to_dict() for hour, hist in sorted(self.prediction_hours.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MonitorCheckpoint':
+        return cls(
+            last_key=data.get('last_key'),
+            seen_keys=data.get('seen_keys'),
+            failed_keys=data.get('failed_keys'),
+            pending_sketches=data.get('pending_sketches'),
+            hours={hour: RunningStats.from_dict(stats) for hour, stats in data.get('hours', {}).items()},
+            updated_at=data.get('updated_at'),
+            baseline_id=data.get('baseline_id'),
+            drift_hours={hour: DriftHistogram.from_dict(hist)
+                         for hour, hist in data.get('drift_hours', {}).items()},
+            prediction_hours={hour: PredictionHistogram.from_dict(hist)
+                              for hour, hist in data.get('prediction_hours', {}).items()},
+        )
+
+
+class CheckpointStore:
+    """Load and save a MonitorCheckpoint in S3, or in a local file when a path is given"""
+
+    def __init__(self, s3_client=None, bucket_name: Optional[str] = None, key: Optional[str] = None,
+                 local_path: Optional[str] = None):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.local_path = local_path
+
+    @property
+    def location(self) -> str:
+        if self.local_path:
+            return self.local_path
+        return f"s3://{self.bucket_name}/{self.key}"
+
+    def load(self) -> MonitorCheckpoint:
+        """Load the stored checkpoint, or return an empty one if none exists yet"""
+        if self.local_path:
+            if not os.path.exists(self.local_path):
+                return MonitorCheckpoint()
+            with open(self.local_path) as f:
+                return MonitorCheckpoint.from_dict(json.load(f))
+
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=self.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return MonitorCheckpoint()
+            raise
+        return MonitorCheckpoint.from_dict(json.loads(response['Body'].read()))
+
+    def save(self, checkpoint: MonitorCheckpoint):
+        checkpoint.updated_at = datetime.utcnow().isoformat()
+        body = json.dumps(checkpoint.to_dict())
+
+        if self.local_path:
+            directory = os.path.dirname(self.local_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.local_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(body)
+            os.replace(tmp_path, self.local_path)
+            return
+
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            Body=body,
+            ContentType='application/json'
+        )
@@ -0,0 +1,258 @@
+"""
+Long-running monitoring daemon
+Schedules each MLOpsMonitor check on its own interval, runs them concurrently
+with timeouts, and serves the latest report over a local HTTP endpoint
+"""
+
+import asyncio
+import json
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default schedule: (interval seconds, timeout seconds) per check
+DEFAULT_SCHEDULE = {
+    'endpoint_health': (60, 30),
+    'metrics': (60, 60),
+    'data_capture_analysis': (300, 240),
+    'save_report': (3600, 60),
+    'compact_reports': (86400, 600),
+}
+
+# Checks whose results are sections of the health report
+REPORT_CHECKS = ('endpoint_health', 'metrics', 'data_capture_analysis')
+
+
+class CheckState:
+    """Schedule and timing bookkeeping for one periodic check"""
+
+    def __init__(self, name: str, func: Callable, interval: float, timeout: float,
+                 run_at_start: bool = True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+        self.run_at_start = run_at_start
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.last_started = None
+        self.last_error = None
+
+    def timings(self) -> Dict:
+        return {
+            'interval_seconds': self.interval,
+            'timeout_seconds': self.timeout,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+            'last_started': self.last_started,
+            'last_duration_seconds': self.last_duration,
+            'mean_duration_seconds': self.total_duration / self.runs if self.runs else None,
+            'last_error': self.last_error,
+        }
+
+
+class MonitorDaemon:
+    """Keep an MLOpsMonitor warm and run its checks on independent schedules.
+
+    Checks run in a thread pool because the AWS clients are blocking. A check
+    that is still running when its next tick comes due is skipped rather than
+    queued, so a slow dependency cannot pile up work; a check that exceeds its
+    timeout is reported as timed out and holds its slot until the thread ends.
+    """
+
+    def __init__(self, monitor, port: int = 8080, host: str = '127.0.0.1',
+                 schedule: Optional[Dict] = None, sns_topic_arn: Optional[str] = None):
+        self.monitor = monitor
+        self.port = port
+        self.host = host
+        self.sns_topic_arn = sns_topic_arn
+        self.started_at = None
+        self.results = {}
+        self.report = None
+        self._lock = threading.Lock()
+        self._stopping = None
+        self._server = None
+
+        schedule = {**DEFAULT_SCHEDULE, **(schedule or {})}
+        functions = {
+            'endpoint_health': monitor.check_endpoint_health,
+            'metrics': monitor.get_endpoint_metrics,
+            'data_capture_analysis': monitor.analyze_data_capture,
+            'save_report': self._save_report,
+            'compact_reports': monitor.compact_reports,
+        }
+        self.checks = {
+            name: CheckState(name, functions[name], *schedule[name],
+                             run_at_start=name in REPORT_CHECKS)
+            for name in functions
+        }
+        self.executor = ThreadPoolExecutor(max_workers=len(self.checks))
+
+    def latest_report(self) -> Optional[Dict]:
+        with self._lock:
+            return self.report
+
+    def timings(self) -> Dict:
+        return {
+            'started_at': self.started_at,
+            'checks': {name: check.timings() for name, check in self.checks.items()},
+        }
+
+    def _update_report(self, name: str, result):
+        with self._lock:
+            self.results[name] = result
+            report = {
+                'timestamp': datetime.utcnow().isoformat(),
+                'endpoint_health': self.results.get('endpoint_health', {}),
+                'metrics': self.results.get('metrics', {}),
+                'data_capture_analysis': self.results.get('data_capture_analysis', {}),
+            }
+            report['overall_health'] = self.monitor.assess_health(report)
+            self.report = report
+
+    def _save_report(self):
+        report = self.latest_report()
+        if report is None:
+            return None
+        report = {**report, 'daemon': self.timings()}
+        self.monitor.save_report(report)
+        if report['overall_health']['status'] == 'unhealthy' and self.sns_topic_arn:
+            self.monitor.send_health_alert(report, self.sns_topic_arn)
+        return report['timestamp']
+
+    async def _run_check(self, check: CheckState):
+        if check.running:
+            check.skipped += 1
+            logger.warning(f"Skipping {check.name}: previous run still in progress")
+            return
+
+        loop = asyncio.get_running_loop()
+        check.running = True
+        check.last_started = datetime.utcnow().isoformat()
+        started = time.perf_counter()
+
+        def finished(_):
+            check.running = False
+
+        future = loop.run_in_executor(self.executor, check.func)
+        future.add_done_callback(finished)
+        done, _ = await asyncio.wait({future}, timeout=check.timeout)
+
+        check.last_duration = time.perf_counter() - started
+        check.total_duration += check.last_duration
+        check.runs += 1
+
+        if not done:
+            check.timeouts += 1
+            check.last_error = f"Timed out after {check.timeout}s"
+            logger.error(f"Check {check.name} timed out after {check.timeout}s")
+            return
+
+        try:
+            result = future.result()
+        except Exception as e:
+            check.failures += 1
+            check.last_error = str(e)
+            logger.error(f"Check {check.name} failed: {e}")
+            return
+
+        check.last_error = None
+        if check.name in REPORT_CHECKS:
+            self._update_report(check.name, result)
+
+    async def _wait(self, delay: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _schedule(self, check: CheckState):
+        loop = asyncio.get_running_loop()
+        if not check.run_at_start:
+            await self._wait(check.interval)
+        while not self._stopping.is_set():
+            started = loop.time()
+            await self._run_check(check)
+            await self._wait(max(0.0, check.interval - (loop.time() - started)))
+
+    def _start_http_server(self):
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path in ('/', '/report'):
+                    body = daemon.latest_report()
+                    status = 200 if body is not None else 503
+                    body = body or {'message': 'No report yet'}
+                elif self.path == '/health':
+                    report = daemon.latest_report()
+                    health = report['overall_health'] if report else {'status': 'unknown'}
+                    status = 200 if health['status'] == 'healthy' else 503
+                    body = health
+                elif self.path == '/timings':
+                    status, body = 200, daemon.timings()
+                else:
+                    status, body = 404, {'error': f'Unknown path {self.path}'}
+
+                payload = json.dumps(body, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), StatusHandler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Status endpoint listening on http://{self.host}:{self.port}")
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run_async(self, duration: Optional[float] = None):
+        """Run all checks until stopped, or for ``duration`` seconds"""
+        self._stopping = asyncio.Event()
+        self.started_at = datetime.utcnow().isoformat()
+        self._start_http_server()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+
+        if duration is not None:
+            loop.call_later(duration, self.stop)
+
+        try:
+            await asyncio.gather(*(self._schedule(check) for check in self.checks.values()))
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            self.executor.shutdown(wait=False)
+            self.monitor.close()
+
+    def run(self, duration: Optional[float] = None):
+        print(f"Starting monitoring daemon for {self.monitor.endpoint_name} on port {self.port}...")
+        asyncio.run(self.run_async(duration))
+        print("Monitoring daemon stopped")
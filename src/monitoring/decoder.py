@@ -0,0 +1,202 @@
+"""
+Captured payload decoder
+Decodes batches of captured CSV request payloads into a single float32
+feature matrix in one pass of the pandas C parser, and captured JSON
+responses into prediction and probability arrays in one JSON parse
+"""
+
+import base64
+import binascii
+import itertools
+import json
+from io import StringIO
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class DecodedPayloads(NamedTuple):
+    data: np.ndarray
+    rows_decoded: int
+    rows_rejected: int
+
+
+def _payload_text(payload: str, encoding: Optional[str]) -> Optional[str]:
+    """Return the CSV text of a captured payload, decoding BASE64 captures"""
+    if encoding and encoding.upper() == 'BASE64':
+        try:
+            return base64.b64decode(payload).decode('utf-8')
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+    return payload
+
+
+def _is_number(field: str) -> bool:
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+def _split_header(text: str, feature_names: Optional[List[str]] = None):
+    """Split a payload into (header names or None, body).
+
+    The first line is a header when it names an expected feature or none of
+    its fields is a number, so a malformed first data row stays in the body.
+    """
+    first_line, _, rest = text.partition('\n')
+    names = tuple(name.strip().strip('"') for name in first_line.split(','))
+    if feature_names and any(name in feature_names for name in names):
+        return names, rest
+    if all(names) and not any(_is_number(name) for name in names):
+        return names, rest
+    return None, text
+
+
+def _parse_block(body: str, width: int):
+    """Parse a block of CSV rows, returning (float32 matrix, rows rejected)"""
+    total_rows = sum(1 for line in body.split('\n') if line.strip())
+    try:
+        frame = pd.read_csv(StringIO(body), header=None, dtype=np.float32)
+        if frame.shape[1] != width:
+            raise ValueError(f"expected {width} columns, got {frame.shape[1]}")
+        data = frame.to_numpy()
+    except (ValueError, pd.errors.ParserError):
+        # Slow path: coerce column by column and drop malformed rows
+        frame = pd.read_csv(StringIO(body), header=None, names=range(width),
+                            on_bad_lines='skip', dtype=str)
+        data = frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+
+    valid = ~np.isnan(data).any(axis=1)
+    data = data[valid]
+    return data, total_rows - len(data)
+
+
+def decode_csv_payloads(payloads: Sequence[str], encodings: Optional[Sequence[str]] = None,
+                        feature_names: Optional[List[str]] = None) -> DecodedPayloads:
+    """Decode captured CSV payloads into one float32 matrix.
+
+    Every row of every payload is kept. Payloads are grouped by their header
+    line and each group is parsed in a single batched call. Header columns are
+    reordered to ``feature_names`` when given; payloads without a header are
+    assumed to already be in feature order. Rows that are malformed, have the
+    wrong number of fields or miss a feature are counted as rejected.
+    """
+    encodings = encodings or [None] * len(payloads)
+    groups = {}
+    rows_rejected = 0
+
+    for payload, encoding in zip(payloads, encodings):
+        text = _payload_text(payload, encoding)
+        if text is None:
+            rows_rejected += 1
+            continue
+        text = text.strip()
+        if not text:
+            continue
+        header, body = _split_header(text, feature_names)
+        if body.strip():
+            groups.setdefault(header, []).append(body.strip())
+
+    n_features = len(feature_names) if feature_names else None
+    blocks = []
+
+    for header, bodies in groups.items():
+        body = '\n'.join(bodies)
+        width = len(header) if header else (n_features or len(bodies[0].split('\n', 1)[0].split(',')))
+        data, rejected = _parse_block(body, width)
+        rows_rejected += rejected
+
+        if header and feature_names:
+            missing = [name for name in feature_names if name not in header]
+            if missing:
+                rows_rejected += len(data)
+                continue
+            data = data[:, [header.index(name) for name in feature_names]]
+
+        if n_features is None:
+            n_features = data.shape[1]
+        if data.shape[1] != n_features:
+            rows_rejected += len(data)
+            continue
+        blocks.append(data)
+
+    if not blocks:
+        return DecodedPayloads(np.empty((0, n_features or 0), dtype=np.float32), 0, rows_rejected)
+
+    data = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+    return DecodedPayloads(data, len(data), rows_rejected)
+
+
+
+class DecodedOutputs(NamedTuple):
+    predictions: np.ndarray
+    probabilities: np.ndarray
+    rows_decoded: int
+    rows_rejected: int
+
+
+def _parse_json_outputs(texts: List[str]) -> list:
+    """Parse JSON outputs in one call, falling back to one call per output"""
+    try:
+        return json.loads('[' + ','.join(texts) + ']')
+    except ValueError:
+        parsed = []
+        for text in texts:
+            try:
+                parsed.append(json.loads(text))
+            except ValueError:
+                parsed.append(None)
+        return parsed
+
+
+def decode_json_outputs(payloads: Sequence[str], encodings: Optional[Sequence[str]] = None) -> DecodedOutputs:
+    """Decode captured ``output_fn`` responses into prediction and probability arrays.
+
+    All outputs are parsed as one JSON document and the probability rows are
+    converted to a single float32 matrix. Outputs that are malformed, or whose
+    predictions and probabilities disagree in length, are rejected; so are
+    probability rows with a different class count than the first.
+    """
+    encodings = encodings or [None] * len(payloads)
+    texts = []
+    rows_rejected = 0
+    for payload, encoding in zip(payloads, encodings):
+        text = _payload_text(payload, encoding)
+        if text is None or not text.strip():
+            rows_rejected += 1
+            continue
+        texts.append(text)
+
+    predictions = []
+    probabilities = []
+    for output in _parse_json_outputs(texts):
+        batch = output.get('predictions') if isinstance(output, dict) else None
+        if not isinstance(batch, list):
+            rows_rejected += 1
+            continue
+        rows = output.get('probabilities')
+        if not isinstance(rows, list) or len(rows) != len(batch):
+            rows_rejected += len(batch) or 1
+            continue
+        predictions.append(batch)
+        probabilities.append(rows)
+
+    predictions = list(itertools.chain.from_iterable(predictions))
+    rows = list(itertools.chain.from_iterable(probabilities))
+    if not rows:
+        return DecodedOutputs(np.empty(0), np.empty((0, 0), dtype=np.float32), 0, rows_rejected)
+    try:
+        probabilities = np.array(rows, dtype=np.float32).reshape(len(rows), -1)
+    except (ValueError, TypeError):
+        # Slow path: keep the rows with the class count of the first row
+        width = len(rows[0]) if isinstance(rows[0], list) else None
+        keep = [isinstance(row, list) and len(row) == width for row in rows]
+        rows_rejected += keep.count(False)
+        predictions = [p for p, k in zip(predictions, keep) if k]
+        probabilities = np.array([row for row, k in zip(rows, keep) if k],
+                                 dtype=np.float32).reshape(-1, width or 1)
+
+    return DecodedOutputs(np.array(predictions), probabilities, len(predictions), rows_rejected)
@@ -0,0 +1,204 @@
+"""
+Feature drift detection
+Vectorized PSI, Kolmogorov-Smirnov and Jensen-Shannon scores of captured
+traffic against the training-time baseline saved by the trainers
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.models.baseline import bin_indices
+
+# (moderate, high) thresholds per score
+DRIFT_THRESHOLDS = {
+    'psi': (0.1, 0.2),
+    'ks': (0.1, 0.2),
+    'js': (0.05, 0.1),
+}
+SEVERITIES = ['low', 'moderate', 'high']
+
+# Fewer rows than this make the scores too noisy to act on
+MIN_DRIFT_ROWS = 100
+
+_EPSILON = 1e-6
+
+BASELINE_ARRAY_FIELDS = ('bin_edges', 'bin_fractions', 'quantile_levels', 'quantile_values', 'quantile_cdf')
+
+
+def float32_edges(edges: np.ndarray, side: str) -> np.ndarray:
+    """float32 edges that place every float32 value exactly where the float64 edges do.
+
+    ``searchsorted(side='right')`` counts edges ``<= x``; for float32 ``x`` that
+    holds exactly against the smallest float32 at or above each edge.
+    ``side='left'`` counts edges ``< x``, which holds against the largest
+    float32 at or below it.
+    """
+    rounded = edges.astype(np.float32)
+    if side == 'right':
+        return np.where(rounded < edges, np.nextafter(rounded, np.float32(np.inf)), rounded)
+    return np.where(rounded > edges, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+def prepare_baseline(baseline: Dict) -> Dict:
+    """Convert the list fields of a loaded baseline to arrays once, up front.
+
+    Also adds float32 copies of the bin edges and quantile grid, so float32
+    rows are counted without widening them to float64.
+    """
+    prepared = dict(baseline)
+    for field in BASELINE_ARRAY_FIELDS:
+        prepared[field] = np.asarray(baseline[field], dtype=np.float64)
+    prepared['bin_edges_float32'] = float32_edges(prepared['bin_edges'], 'right')
+    prepared['quantile_values_float32'] = float32_edges(prepared['quantile_values'], 'left')
+    return prepared
+
+
+class DriftHistogram:
+    """Mergeable per-feature counts of captured rows over the baseline bins.
+
+    ``bin_counts`` counts rows in the baseline's decile bins (PSI, JS) and
+    ``quantile_counts`` counts rows between consecutive points of the
+    baseline quantile grid (KS). Counts from files or hours simply add up.
+    """
+
+    def __init__(self, bin_counts: np.ndarray, quantile_counts: np.ndarray):
+        self.bin_counts = bin_counts
+        self.quantile_counts = quantile_counts
+
+    @classmethod
+    def empty(cls, baseline: Dict) -> 'DriftHistogram':
+        n_features = len(baseline['features'])
+        return cls(
+            np.zeros((n_features, len(baseline['bin_fractions'][0])), dtype=np.int64),
+            np.zeros((n_features, len(baseline['quantile_levels']) + 1), dtype=np.int64)
+        )
+
+    @property
+    def count(self) -> int:
+        return int(self.bin_counts[0].sum()) if len(self.bin_counts) else 0
+
+    def update(self, data: np.ndarray, baseline: Dict):
+        """Count a 2D array of rows in baseline feature order (see prepare_baseline)"""
+        data = np.asarray(data)
+        if data.ndim != 2 or len(data) == 0:
+            return
+        if data.shape[1] != len(self.bin_counts):
+            raise ValueError(
+                f"Rows have {data.shape[1]} features but the baseline has {len(self.bin_counts)}"
+            )
+
+        if data.dtype == np.float32 and 'bin_edges_float32' in baseline:
+            bin_edges, quantile_values = baseline['bin_edges_float32'], baseline['quantile_values_float32']
+        else:
+            bin_edges, quantile_values = baseline['bin_edges'], baseline['quantile_values']
+
+        n_bins = self.bin_counts.shape[1]
+        n_intervals = self.quantile_counts.shape[1]
+        for f in range(data.shape[1]):
+            column = data[:, f]
+            self.bin_counts[f] += np.bincount(
+                bin_indices(column, bin_edges[f]), minlength=n_bins
+            )
+            self.quantile_counts[f] += np.bincount(
+                np.searchsorted(quantile_values[f], column, side='left'), minlength=n_intervals
+            )
+
+    def merge(self, other: 'DriftHistogram'):
+        self.bin_counts = self.bin_counts + other.bin_counts
+        self.quantile_counts = self.quantile_counts + other.quantile_counts
+
+    def to_dict(self) -> Dict:
+        return {
+            'bin_counts': self.bin_counts.tolist(),
+            'quantile_counts': self.quantile_counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DriftHistogram':
+        return cls(
+            np.array(data['bin_counts'], dtype=np.int64),
+            np.array(data['quantile_counts'], dtype=np.int64)
+        )
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Population stability index per row of two (features, bins) fraction arrays"""
+    expected = np.clip(expected, _EPSILON, None)
+    actual = np.clip(actual, _EPSILON, None)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def js_divergence(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Jensen-Shannon divergence (base 2, in [0, 1]) per row of two fraction arrays"""
+    mixture = (expected + actual) / 2
+
+    def kl(p, q):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(p > 0, p * np.log2(p / q), 0.0)
+        return terms.sum(axis=1)
+
+    return (kl(expected, mixture) + kl(actual, mixture)) / 2
+
+
+def ks_statistic(baseline_cdf: np.ndarray, quantile_counts: np.ndarray) -> np.ndarray:
+    """Kolmogorov-Smirnov distance evaluated on the baseline quantile grid.
+
+    ``quantile_counts[:, j]`` holds rows in ``(q[j-1], q[j]]``, so the running
+    sum over the grid gives the captured CDF at every quantile point.
+    """
+    totals = quantile_counts.sum(axis=1, keepdims=True)
+    captured_cdf = np.cumsum(quantile_counts, axis=1)[:, :-1] / np.maximum(totals, 1)
+    return np.abs(captured_cdf - baseline_cdf).max(axis=1)
+
+
+def _severity(scores: np.ndarray, thresholds) -> np.ndarray:
+    moderate, high = thresholds
+    return (scores >= moderate).astype(int) + (scores >= high).astype(int)
+
+
+def compute_drift(histogram: DriftHistogram, baseline: Dict,
+                  thresholds: Optional[Dict] = None, min_rows: int = MIN_DRIFT_ROWS) -> Dict:
+    """Score every feature of a histogram against the baseline"""
+    thresholds = thresholds or DRIFT_THRESHOLDS
+    rows = histogram.count
+
+    if rows < min_rows:
+        return {
+            'samples_analyzed': rows,
+            'drift_score': 'insufficient_data',
+            'drift_detected': False,
+            'message': f'Need at least {min_rows} rows for drift analysis'
+        }
+
+    expected = baseline['bin_fractions']
+    actual = histogram.bin_counts / histogram.bin_counts.sum(axis=1, keepdims=True)
+
+    scores = {
+        'psi': psi(expected, actual),
+        'ks': ks_statistic(baseline['quantile_cdf'], histogram.quantile_counts),
+        'js': js_divergence(expected, actual),
+    }
+    severity = np.max([_severity(scores[name], thresholds[name]) for name in scores], axis=0)
+
+    features = {
+        name: {
+            'psi': float(scores['psi'][f]),
+            'ks': float(scores['ks'][f]),
+            'js': float(scores['js'][f]),
+            'severity': SEVERITIES[severity[f]]
+        }
+        for f, name in enumerate(baseline['features'])
+    }
+
+    return {
+        'samples_analyzed': rows,
+        'feature_count': len(features),
+        'drift_score': SEVERITIES[int(severity.max())],
+        'drift_detected': bool(severity.max() == len(SEVERITIES) - 1),
+        'drifted_features': [name for name, score in features.items() if score['severity'] == 'high'],
+        'max_psi': float(scores['psi'].max()),
+        'max_ks': float(scores['ks'].max()),
+        'max_js': float(scores['js'].max()),
+        'features': features
+    }
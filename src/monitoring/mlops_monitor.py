@@ -4,72 +4,246 @@ MLOps Monitoring Script
 Monitors model performance, data drift, and system health using Terraform-deployed infrastructure
 """
 
-import boto3
-import pandas as pd
-import numpy as np
 import json
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
 import logging
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.aws_clients import get_client
+from src.monitoring.checkpoint import (
+    CheckpointStore, RunningStats, capture_key_hour, capture_key_prefix, late_capture_cutoff
+)
+from src.monitoring.decoder import decode_csv_payloads, decode_json_outputs
+from src.monitoring.drift import DriftHistogram, compute_drift, prepare_baseline
+from src.monitoring.predictions import PredictionHistogram, compute_prediction_drift
+from src.monitoring.report_store import REPORTS_PREFIX, ReportStore, columnar_prefix
+from src.monitoring.sketch import CaptureSketch, SketchStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SageMaker writes captured traffic to
+# <destination>/<endpoint>/<variant>/YYYY/MM/DD/HH/<file>.jsonl
+CAPTURE_PREFIX = 'data-capture'
+CAPTURE_VARIANT = 'primary'
+
+# CloudWatch metrics fetched in one GetMetricData request: (label, metric, statistic).
+# ModelSetupTime is only emitted by serverless endpoints, once per cold start.
+METRIC_QUERIES = [
+    ('Invocations', 'Invocations', 'Sum'),
+    ('ModelInvocation4XXErrors', 'ModelInvocation4XXErrors', 'Sum'),
+    ('ModelInvocation5XXErrors', 'ModelInvocation5XXErrors', 'Sum'),
+    ('ModelLatency_p50', 'ModelLatency', 'p50'),
+    ('ModelLatency_p90', 'ModelLatency', 'p90'),
+    ('ModelLatency_p99', 'ModelLatency', 'p99'),
+    ('OverheadLatency_p50', 'OverheadLatency', 'p50'),
+    ('OverheadLatency_p90', 'OverheadLatency', 'p90'),
+    ('OverheadLatency_p99', 'OverheadLatency', 'p99'),
+    ('ModelSetupTime_p50', 'ModelSetupTime', 'p50'),
+    ('ModelSetupTime_p99', 'ModelSetupTime', 'p99'),
+    ('ColdStarts', 'ModelSetupTime', 'SampleCount'),
+]
+METRIC_UNITS = {
+    'ModelLatency': 'microseconds',
+    'OverheadLatency': 'microseconds',
+    'ModelSetupTime': 'microseconds',
+}
+
+# Health thresholds, applied to the last HEALTH_WINDOW_MINUTES of metrics
+HEALTH_WINDOW_MINUTES = 60
+MAX_4XX_ERRORS = 5
+MAX_5XX_ERRORS = 0
+LATENCY_P99_THRESHOLD_MS = 5000
+
+# Rolling windows reported from the checkpointed hourly statistics
+ROLLING_WINDOWS = {'last_1h': 1, 'last_24h': 24, 'last_7d': 168}
+
+def capture_hour_prefixes(endpoint_name: str, start_time: datetime, end_time: datetime,
+                          base_prefix: str = CAPTURE_PREFIX,
+                          variant: str = CAPTURE_VARIANT) -> List[str]:
+    """List the hourly data capture prefixes covering a time window"""
+    hour = start_time.replace(minute=0, second=0, microsecond=0)
+    prefixes = []
+    while hour <= end_time:
+        prefixes.append(f"{base_prefix}/{endpoint_name}/{variant}/{hour:%Y/%m/%d/%H}/")
+        hour += timedelta(hours=1)
+    return prefixes
+
+class CaptureFile(NamedTuple):
+    key: str
+    input_data: List[str]
+    input_encodings: List[str]
+    output_data: List[str]
+    output_encodings: Optional[List[str]] = None
+
+class FileSummary(NamedTuple):
+    key: str
+    hour: Optional[str]
+    input_samples: int
+    output_samples: int
+    rows_rejected: int
+    stats: RunningStats
+    drift: Optional[DriftHistogram]
+    predictions: PredictionHistogram
+    sketch: CaptureSketch
+
+def summarize_capture_file(capture_file: CaptureFile, feature_names: Optional[List[str]] = None,
+                           baseline: Optional[Dict] = None) -> FileSummary:
+    """Reduce one capture file to mergeable statistics, drift counts and sketches.
+    
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    decoded = decode_csv_payloads(capture_file.input_data, capture_file.input_encodings, feature_names)
+    rows = decoded.data
+    stats = RunningStats()
+    stats.update(rows)
+    drift = None
+    if baseline is not None:
+        drift = DriftHistogram.empty(baseline)
+        drift.update(rows, baseline)
+    outputs = decode_json_outputs(capture_file.output_data, capture_file.output_encodings)
+    predictions = PredictionHistogram()
+    predictions.update(outputs.predictions, outputs.probabilities)
+    sketch = CaptureSketch()
+    sketch.update_features(rows)
+    sketch.update_probabilities(outputs.probabilities)
+    return FileSummary(
+        capture_file.key, capture_key_hour(capture_file.key),
+        len(capture_file.input_data), len(capture_file.output_data),
+        decoded.rows_rejected, stats, drift, predictions, sketch
+    )
+
 class MLOpsMonitor:
-    def __init__(self, endpoint_name: str, bucket_name: str, region: str = 'us-east-1'):
+    def __init__(self, endpoint_name: str, bucket_name: str, region: str = 'us-east-1',
+                 max_workers: int = 16, checkpoint_path: Optional[str] = None,
+                 retention_hours: int = 168, baseline_key: str = 'models/baseline.json',
+                 summary_workers: Optional[int] = None):
         self.endpoint_name = endpoint_name
         self.bucket_name = bucket_name
         self.region = region
+        self.max_workers = max_workers
+        # Worker processes that decode and summarize capture files; 0 runs inline
+        self.summary_workers = (os.cpu_count() or 1) if summary_workers is None else summary_workers
+        self._process_pool = None
+        self.retention_hours = retention_hours
+        self.baseline_key = baseline_key
+        self._baseline = None
+        self._checkpoint = None
         
         # Initialize AWS clients
-        self.cloudwatch = boto3.client('cloudwatch', region_name=region)
-        self.sagemaker = boto3.client('sagemaker', region_name=region)
-        self.s3 = boto3.client('s3', region_name=region)
-        self.sns = boto3.client('sns', region_name=region)
+        self.cloudwatch = get_client('cloudwatch', region)
+        self.sagemaker = get_client('sagemaker', region)
+        # Size the S3 connection pool for concurrent capture downloads
+        self.s3 = get_client('s3', region, max_pool_connections=max_workers)
+        self.sns = get_client('sns', region)
+        
+        # Incremental state lives in S3 unless a local checkpoint file is given
+        self.checkpoint_store = CheckpointStore(
+            self.s3, bucket_name,
+            key=f"monitoring-state/{endpoint_name}/checkpoint.json",
+            local_path=checkpoint_path
+        )
+        self.report_store = ReportStore(self.s3, bucket_name, columnar_prefix(endpoint_name))
+        self.sketch_store = SketchStore(self.s3, bucket_name, f"monitoring-state/{endpoint_name}/sketches")
+        
+    def close(self):
+        """Shut down the summary worker processes"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
         
-    def get_endpoint_metrics(self, hours_back: int = 24) -> Dict:
-        """Get CloudWatch metrics for the SageMaker endpoint"""
+    def get_endpoint_metrics(self, hours_back: int = 24, period: int = 60,
+                             health_window_minutes: int = HEALTH_WINDOW_MINUTES) -> Dict:
+        """Get CloudWatch metrics for the SageMaker endpoint in one batched request.
+        
+        Every metric and percentile is fetched at ``period``-second resolution
+        through paginated GetMetricData calls. Each entry reports the value at
+        the latest timestamp, an aggregate over the recent health window (sum
+        for counts, max for percentiles) and an aggregate over the whole window.
+        """
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours_back)
         
-        metrics = {}
-        
-        # Define metrics to collect
-        metric_queries = [
-            ('Invocations', 'Sum'),
-            ('ModelLatency', 'Average'),
-            ('ModelInvocation4XXErrors', 'Sum'),
-            ('ModelInvocation5XXErrors', 'Sum'),
+        dimensions = [
+            {'Name': 'EndpointName', 'Value': self.endpoint_name},
+            {'Name': 'VariantName', 'Value': CAPTURE_VARIANT}
+        ]
+        queries = [
+            {
+                'Id': f'm{i}',
+                'Label': label,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/SageMaker',
+                        'MetricName': metric_name,
+                        'Dimensions': dimensions
+                    },
+                    'Period': period,
+                    'Stat': statistic
+                },
+                'ReturnData': True
+            }
+            for i, (label, metric_name, statistic) in enumerate(METRIC_QUERIES)
         ]
         
-        for metric_name, statistic in metric_queries:
-            try:
-                response = self.cloudwatch.get_metric_statistics(
-                    Namespace='AWS/SageMaker',
-                    MetricName=metric_name,
-                    Dimensions=[
-                        {'Name': 'EndpointName', 'Value': self.endpoint_name},
-                        {'Name': 'VariantName', 'Value': 'primary'}
-                    ],
-                    StartTime=start_time,
-                    EndTime=end_time,
-                    Period=3600,  # 1 hour periods
-                    Statistics=[statistic]
-                )
-                
-                datapoints = response['Datapoints']
-                if datapoints:
-                    metrics[metric_name] = {
-                        'latest_value': datapoints[-1][statistic],
-                        'datapoints': len(datapoints),
-                        'time_range': f"{start_time} to {end_time}"
-                    }
-                else:
-                    metrics[metric_name] = {'latest_value': 0, 'datapoints': 0}
-                    
-            except Exception as e:
-                logger.error(f"Error getting metric {metric_name}: {e}")
-                metrics[metric_name] = {'error': str(e)}
+        series = {query['Id']: {} for query in queries}
+        try:
+            request = {
+                'MetricDataQueries': queries,
+                'StartTime': start_time,
+                'EndTime': end_time,
+                'ScanBy': 'TimestampDescending'
+            }
+            while True:
+                response = self.cloudwatch.get_metric_data(**request)
+                for result in response['MetricDataResults']:
+                    series[result['Id']].update(zip(result['Timestamps'], result['Values']))
+                if not response.get('NextToken'):
+                    break
+                request['NextToken'] = response['NextToken']
+        except Exception as e:
+            logger.error(f"Error getting endpoint metrics: {e}")
+            return {label: {'error': str(e)} for label, _, _ in METRIC_QUERIES}
+        
+        health_cutoff = end_time - timedelta(minutes=health_window_minutes)
+        metrics = {}
+        
+        for query, (label, metric_name, statistic) in zip(queries, METRIC_QUERIES):
+            # CloudWatch does not guarantee datapoint order, so sort explicitly
+            points = sorted(series[query['Id']].items())
+            aggregate = max if statistic.startswith('p') else sum
+            
+            entry = {
+                'metric': metric_name,
+                'statistic': statistic,
+                # SampleCount counts datapoints whatever the metric measures
+                'unit': 'count' if statistic == 'SampleCount' else METRIC_UNITS.get(metric_name, 'count'),
+                'datapoints': len(points),
+                'time_range': f"{start_time} to {end_time}"
+            }
+            if points:
+                recent = [value for timestamp, value in points
+                          if timestamp.replace(tzinfo=None) >= health_cutoff]
+                entry['latest_value'] = points[-1][1]
+                entry['latest_timestamp'] = points[-1][0].isoformat()
+                entry['recent_value'] = aggregate(recent) if recent else 0
+                entry['window_value'] = aggregate(value for _, value in points)
+            else:
+                entry.update({'latest_value': 0, 'recent_value': 0, 'window_value': 0})
+            metrics[label] = entry
         
         return metrics
     
@@ -95,68 +269,281 @@ class MLOpsMonitor:
             logger.error(f"Error checking endpoint health: {e}")
             return {'endpoint_name': self.endpoint_name, 'healthy': False, 'error': str(e)}
     
+    def list_capture_files(self, start_time: datetime, end_time: datetime,
+                           start_after: Optional[str] = None,
+                           seen: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+        """List data capture objects in the hourly partitions of a time window.
+        
+        Capture keys sort by time, so hours well before the one holding
+        ``start_after`` were covered by previous runs and are skipped. Files can
+        finish uploading hours late, so the ``LATE_CAPTURE_HOURS`` up to that
+        hour are listed in full and the keys in ``seen`` are dropped.
+        """
+        paginator = self.s3.get_paginator('list_objects_v2')
+        seen = set(seen or [])
+        cutoff = late_capture_cutoff(start_after) if start_after else None
+        newest_prefix = capture_key_prefix(start_after) if start_after and cutoff is None else None
+        for prefix in capture_hour_prefixes(self.endpoint_name, max(start_time, cutoff or start_time), end_time):
+            if newest_prefix is not None and prefix < newest_prefix:
+                continue
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    if obj['Key'] not in seen:
+                        yield obj
+    
+    def _read_capture_file(self, key: str) -> CaptureFile:
+        """Stream one JSONL capture file and extract endpoint inputs and outputs"""
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body']
+        input_data = []
+        input_encodings = []
+        output_data = []
+        output_encodings = []
+        
+        for line in body.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            capture_data = record.get('captureData', {})
+            if capture_data.get('endpointInput'):
+                input_data.append(capture_data['endpointInput']['data'])
+                input_encodings.append(capture_data['endpointInput'].get('encoding', 'CSV'))
+            if capture_data.get('endpointOutput'):
+                output_data.append(capture_data['endpointOutput']['data'])
+                output_encodings.append(capture_data['endpointOutput'].get('encoding', 'JSON'))
+        
+        return CaptureFile(key, input_data, input_encodings, output_data, output_encodings)
+    
+    def fetch_capture_files(self, keys: Iterable[str]) -> Iterator[CaptureFile]:
+        """Download and parse capture files concurrently, yielding each as it completes.
+        
+        At most ``2 * max_workers`` files are in flight at once, so memory does not
+        grow with the number of files listed.
+        """
+        max_in_flight = self.max_workers * 2
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+            keys = iter(keys)
+            exhausted = False
+            
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    key = next(keys, None)
+                    if key is None:
+                        exhausted = True
+                        break
+                    pending[pool.submit(self._read_capture_file, key)] = key
+                
+                if not pending:
+                    break
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        logger.warning(f"Error processing file {key}: {e}")
+    
+    def summarize_capture_files(self, capture_files: Iterable[CaptureFile],
+                                feature_names: Optional[List[str]] = None,
+                                baseline: Optional[Dict] = None) -> Iterator[FileSummary]:
+        """Summarize capture files in worker processes, yielding each as it completes.
+        
+        Decoding and sketching are CPU-bound, so they run in a process pool kept
+        until ``close()`` while downloads stay on threads. At most
+        ``2 * summary_workers`` files wait in the pool at once.
+        """
+        if self.summary_workers < 1:
+            for capture_file in capture_files:
+                yield summarize_capture_file(capture_file, feature_names, baseline)
+            return
+        
+        if self._process_pool is None:
+            # Forked children could inherit locks held by download threads and
+            # boto3 connection pools, so workers start from a fresh interpreter
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.summary_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        pending = {}
+        
+        def completed(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.warning(f"Error summarizing file {key}: {e}")
+        
+        for capture_file in capture_files:
+            future = self._process_pool.submit(summarize_capture_file, capture_file, feature_names, baseline)
+            pending[future] = capture_file.key
+            if len(pending) >= 2 * self.summary_workers:
+                yield from completed(FIRST_COMPLETED)
+        while pending:
+            yield from completed(FIRST_COMPLETED)
+    
+    def load_baseline(self) -> Optional[Dict]:
+        """Load the training-time feature baseline saved next to the model"""
+        if self._baseline is None:
+            try:
+                response = self.s3.get_object(Bucket=self.bucket_name, Key=self.baseline_key)
+                self._baseline = prepare_baseline(json.loads(response['Body'].read()))
+            except Exception as e:
+                logger.warning(f"No training baseline at s3://{self.bucket_name}/{self.baseline_key}: {e}")
+                return None
+        return self._baseline
+    
     def analyze_data_capture(self, hours_back: int = 24) -> Dict:
-        """Analyze captured inference data for drift detection"""
+        """Analyze captured inference data incrementally from the last checkpoint.
+        
+        Only capture files the checkpoint has not seen are downloaded, plus
+        earlier failures, which are retried until they succeed. Each
+        file is summarized in a worker process; the summaries are merged into
+        hourly running statistics, drift histograms and quantile sketches, and
+        rolling windows, drift scores and feature quantiles are reported from
+        the merged hourly state.
+        """
         try:
-            # List objects in data capture prefix
-            prefix = 'data-capture/'
-            response = self.s3.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix,
-                MaxKeys=100
-            )
+            end_time = datetime.utcnow()
+            start_time = end_time - timedelta(hours=hours_back)
             
-            if 'Contents' not in response:
-                return {'message': 'No data capture files found', 'files_analyzed': 0}
+            # Long-running monitors keep the checkpoint in memory between runs
+            checkpoint = self._checkpoint or self.checkpoint_store.load()
+            if checkpoint.pending_sketches:
+                # An earlier run saved its checkpoint but did not finish merging its sketches
+                self.sketch_store.apply_staged(checkpoint.pending_sketches)
+                checkpoint.pending_sketches = None
+            # Runs staged without a saved checkpoint have their files read again
+            self.sketch_store.discard_staged()
+            baseline = self.load_baseline()
+            if baseline is not None:
+                checkpoint.use_baseline(baseline['created_at'])
+            listed = {'files': 0, 'late': 0}
+            requested = []
             
-            # Filter files from the last N hours
-            cutoff_time = datetime.utcnow() - timedelta(hours=hours_back)
-            recent_files = [
-                obj for obj in response['Contents']
-                if obj['LastModified'].replace(tzinfo=None) > cutoff_time
-            ]
+            def capture_keys():
+                # Files that failed on an earlier run are retried first
+                for key in checkpoint.failed_keys:
+                    requested.append(key)
+                    yield key
+                for obj in self.list_capture_files(start_time, end_time, start_after=checkpoint.last_key,
+                                                   seen=checkpoint.seen_keys):
+                    if obj['Key'] in checkpoint.failed_keys:
+                        continue
+                    if checkpoint.last_key and obj['Key'] < checkpoint.last_key:
+                        listed['late'] += 1
+                    listed['files'] += 1
+                    requested.append(obj['Key'])
+                    yield obj['Key']
+            
+            feature_names = baseline['features'] if baseline is not None else None
+            files_analyzed = 0
+            input_samples = 0
+            output_samples = 0
+            rows_processed = 0
+            rows_rejected = 0
+            processed = set()
+            
+            hour_sketches = {}
+            summaries = self.summarize_capture_files(
+                self.fetch_capture_files(capture_keys()), feature_names, baseline
+            )
+            for summary in summaries:
+                files_analyzed += 1
+                input_samples += summary.input_samples
+                output_samples += summary.output_samples
+                rows_rejected += summary.rows_rejected
+                processed.add(summary.key)
+                
+                hour = summary.hour
+                if hour:
+                    checkpoint.hour_predictions(hour).merge(summary.predictions)
+                if hour and summary.stats.count:
+                    try:
+                        checkpoint.hour_stats(hour).merge(summary.stats)
+                        rows_processed += summary.stats.count
+                        if summary.drift is not None:
+                            checkpoint.hour_drift(hour, baseline).merge(summary.drift)
+                        hour_sketches.setdefault(hour, CaptureSketch()).merge(summary.sketch)
+                    except ValueError as e:
+                        logger.warning(f"Skipping rows from {summary.key}: {e}")
             
-            if not recent_files:
-                return {'message': f'No data capture files from last {hours_back} hours', 'files_analyzed': 0}
+            if listed['late']:
+                logger.info(f"Picked up {listed['late']} capture files that landed after newer ones")
             
-            # Analyze a sample of recent files
-            sample_size = min(10, len(recent_files))
-            sample_files = recent_files[:sample_size]
+            # Stage the new sketches, commit them with the checkpoint, then merge them.
+            # A failed merge is finished by the next run without counting rows twice.
+            run_id = uuid.uuid4().hex
+            if hour_sketches:
+                self.sketch_store.stage(run_id, hour_sketches)
+                checkpoint.pending_sketches = run_id
             
-            input_data = []
-            output_data = []
+            # Files that failed to download or decode stay in the checkpoint and are retried
+            failed = [key for key in requested if key not in processed]
+            for key in checkpoint.advance(processed, failed):
+                logger.error(f"Giving up on capture file {key} after repeated failures")
+            checkpoint.prune(self.retention_hours, now=end_time)
+            self.checkpoint_store.save(checkpoint)
+            self._checkpoint = checkpoint
             
-            for file_obj in sample_files:
+            if hour_sketches:
                 try:
-                    # Download and parse the JSONL file
-                    obj = self.s3.get_object(Bucket=self.bucket_name, Key=file_obj['Key'])
-                    content = obj['Body'].read().decode('utf-8')
-                    
-                    for line in content.strip().split('\n'):
-                        if line:
-                            record = json.loads(line)
-                            if 'captureData' in record:
-                                capture_data = record['captureData']
-                                if capture_data.get('endpointInput'):
-                                    input_data.append(capture_data['endpointInput']['data'])
-                                if capture_data.get('endpointOutput'):
-                                    output_data.append(capture_data['endpointOutput']['data'])
-                                    
+                    self.sketch_store.apply_staged(run_id)
+                    checkpoint.pending_sketches = None
                 except Exception as e:
-                    logger.warning(f"Error processing file {file_obj['Key']}: {e}")
-                    continue
+                    logger.warning(f"Merging hourly sketches failed, retrying on the next run: {e}")
+            self.sketch_store.prune(self.retention_hours, now=end_time)
             
             analysis = {
-                'files_analyzed': len(sample_files),
-                'total_recent_files': len(recent_files),
-                'input_samples': len(input_data),
-                'output_samples': len(output_data),
-                'time_range': f"Last {hours_back} hours"
+                'files_analyzed': files_analyzed,
+                'total_recent_files': listed['files'],
+                'input_samples': input_samples,
+                'output_samples': output_samples,
+                'rows_processed': rows_processed,
+                'rows_rejected': rows_rejected,
+                'time_range': f"Last {hours_back} hours",
+                'checkpoint': {
+                    'location': self.checkpoint_store.location,
+                    'last_key': checkpoint.last_key,
+                    'failed_keys': len(checkpoint.failed_keys),
+                    'late_files': listed['late'],
+                    'hours_tracked': len(checkpoint.hours)
+                },
+                'rolling_windows': {
+                    name: checkpoint.window_stats(hours, now=end_time).summary()
+                    for name, hours in ROLLING_WINDOWS.items()
+                },
+                'distribution': self.sketch_window(start_time, end_time).summary(feature_names),
+                'prediction_distribution': {
+                    name: checkpoint.window_predictions(hours, now=end_time).summary()
+                    for name, hours in ROLLING_WINDOWS.items()
+                }
             }
             
-            # Basic drift detection (simplified)
-            if input_data:
-                analysis['drift_indicators'] = self._detect_basic_drift(input_data)
+            if listed['files'] == 0:
+                analysis['message'] = f'No new data capture files from last {hours_back} hours'
+            
+            if baseline is None:
+                analysis['drift_indicators'] = {
+                    'message': 'No training baseline found for drift analysis',
+                    'drift_score': 'unknown',
+                    'drift_detected': False
+                }
+            else:
+                window = checkpoint.window_drift(hours_back, baseline, now=end_time)
+                analysis['drift_indicators'] = compute_drift(window, baseline)
+            
+            if baseline is None or 'predictions' not in baseline:
+                analysis['prediction_drift'] = {
+                    'message': 'No test-set prediction baseline found',
+                    'drift_score': 'unknown',
+                    'drift_detected': False
+                }
+            else:
+                window = checkpoint.window_predictions(hours_back, now=end_time)
+                analysis['prediction_drift'] = compute_prediction_drift(window, baseline)
             
             return analysis
             
@@ -164,40 +551,9 @@ class MLOpsMonitor:
             logger.error(f"Error analyzing data capture: {e}")
             return {'error': str(e), 'files_analyzed': 0}
     
-    def _detect_basic_drift(self, input_data: List[str]) -> Dict:
-        """Basic drift detection on input data"""
-        try:
-            # Parse CSV input data
-            parsed_data = []
-            for data_str in input_data[:50]:  # Limit to 50 samples for performance
-                try:
-                    # Assuming CSV format
-                    lines = data_str.strip().split('\n')
-                    if len(lines) > 1:  # Skip header
-                        values = [float(x) for x in lines[1].split(',')]
-                        parsed_data.append(values)
-                except:
-                    continue
-            
-            if not parsed_data:
-                return {'message': 'Could not parse input data for drift analysis'}
-            
-            # Convert to numpy array
-            data_array = np.array(parsed_data)
-            
-            # Basic statistical analysis
-            drift_indicators = {
-                'samples_analyzed': len(parsed_data),
-                'feature_count': data_array.shape[1] if len(data_array.shape) > 1 else 1,
-                'mean_values': data_array.mean(axis=0).tolist() if len(data_array.shape) > 1 else [data_array.mean()],
-                'std_values': data_array.std(axis=0).tolist() if len(data_array.shape) > 1 else [data_array.std()],
-                'drift_score': 'low'  # Placeholder - would implement proper drift detection
-            }
-            
-            return drift_indicators
-            
-        except Exception as e:
-            return {'error': f'Drift analysis failed: {e}'}
+    def sketch_window(self, start_time: datetime, end_time: datetime) -> CaptureSketch:
+        """Merge the stored hourly sketches of a time window without rereading capture files"""
+        return self.sketch_store.window(start_time, end_time)
     
     def send_alert(self, topic_arn: str, subject: str, message: str):
         """Send alert via SNS"""
@@ -212,138 +568,205 @@ class MLOpsMonitor:
             logger.error(f"Failed to send alert: {e}")
     
     def generate_health_report(self) -> Dict:
-        """Generate comprehensive health report"""
-        report = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'endpoint_health': self.check_endpoint_health(),
-            'metrics': self.get_endpoint_metrics(),
-            'data_capture_analysis': self.analyze_data_capture()
-        }
+        """Generate comprehensive health report, running the checks concurrently"""
+        timestamp = datetime.utcnow().isoformat()
+        
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            endpoint_health = pool.submit(self.check_endpoint_health)
+            metrics = pool.submit(self.get_endpoint_metrics)
+            data_capture_analysis = pool.submit(self.analyze_data_capture)
+            
+            report = {
+                'timestamp': timestamp,
+                'endpoint_health': endpoint_health.result(),
+                'metrics': metrics.result(),
+                'data_capture_analysis': data_capture_analysis.result()
+            }
         
-        # Determine overall health
-        endpoint_healthy = report['endpoint_health'].get('healthy', False)
+        report['overall_health'] = self.assess_health(report)
+        return report
+    
+    def assess_health(self, report: Dict) -> Dict:
+        """Determine overall health from the sections of a report"""
+        endpoint_healthy = report.get('endpoint_health', {}).get('healthy', False)
         metrics_healthy = True
+        metrics = report.get('metrics', {})
+        data_capture_analysis = report.get('data_capture_analysis', {})
+        drift_indicators = data_capture_analysis.get('drift_indicators', {})
+        drift_healthy = not drift_indicators.get('drift_detected', False)
+        prediction_drift = data_capture_analysis.get('prediction_drift', {})
+        predictions_healthy = not prediction_drift.get('drift_detected', False)
         
         # Check for high error rates
-        if 'ModelInvocation4XXErrors' in report['metrics']:
-            error_4xx = report['metrics']['ModelInvocation4XXErrors'].get('latest_value', 0)
-            if error_4xx > 5:  # More than 5 4XX errors
+        if 'ModelInvocation4XXErrors' in metrics:
+            error_4xx = metrics['ModelInvocation4XXErrors'].get('recent_value', 0)
+            if error_4xx > MAX_4XX_ERRORS:
                 metrics_healthy = False
         
-        if 'ModelInvocation5XXErrors' in report['metrics']:
-            error_5xx = report['metrics']['ModelInvocation5XXErrors'].get('latest_value', 0)
-            if error_5xx > 0:  # Any 5XX errors
+        if 'ModelInvocation5XXErrors' in metrics:
+            error_5xx = metrics['ModelInvocation5XXErrors'].get('recent_value', 0)
+            if error_5xx > MAX_5XX_ERRORS:
                 metrics_healthy = False
         
-        # Check latency
-        if 'ModelLatency' in report['metrics']:
-            latency = report['metrics']['ModelLatency'].get('latest_value', 0)
-            if latency > 5000:  # More than 5 seconds
+        # Check tail latency (ModelLatency is reported in microseconds)
+        if 'ModelLatency_p99' in metrics:
+            latency_p99_ms = metrics['ModelLatency_p99'].get('recent_value', 0) / 1000
+            if latency_p99_ms > LATENCY_P99_THRESHOLD_MS:
                 metrics_healthy = False
         
-        report['overall_health'] = {
-            'status': 'healthy' if endpoint_healthy and metrics_healthy else 'unhealthy',
+        return {
+            'status': ('healthy' if endpoint_healthy and metrics_healthy and drift_healthy
+                       and predictions_healthy else 'unhealthy'),
             'endpoint_healthy': endpoint_healthy,
-            'metrics_healthy': metrics_healthy
+            'metrics_healthy': metrics_healthy,
+            'drift_healthy': drift_healthy,
+            'predictions_healthy': predictions_healthy
         }
+    
+    def send_health_alert(self, report: Dict, topic_arn: str):
+        """Send an SNS alert describing an unhealthy report"""
+        alert_message = f"""
+MLOps Health Alert
+
+Endpoint: {self.endpoint_name}
+Status: UNHEALTHY
+Timestamp: {report['timestamp']}
+
+Issues detected:
+- Endpoint Healthy: {report['overall_health']['endpoint_healthy']}
+- Metrics Healthy: {report['overall_health']['metrics_healthy']}
+- Drift Healthy: {report['overall_health']['drift_healthy']}
+- Predictions Healthy: {report['overall_health'].get('predictions_healthy', True)}
+
+Please check the CloudWatch dashboard for more details.
+        """
         
-        return report
+        self.send_alert(
+            topic_arn,
+            f"MLOps Alert: {self.endpoint_name} Unhealthy",
+            alert_message.strip()
+        )
     
     def save_report(self, report: Dict, s3_key: str = None):
-        """Save monitoring report to S3"""
+        """Save monitoring report to S3.
+        
+        The report's numeric fields are appended to the columnar report store
+        for trend queries, and the full report overwrites a single latest.json
+        (or is written to ``s3_key`` when one is given).
+        """
         if not s3_key:
-            timestamp = datetime.utcnow().strftime('%Y/%m/%d/%H%M%S')
-            s3_key = f"monitoring-reports/{timestamp}-health-report.json"
+            s3_key = f"{REPORTS_PREFIX}/{self.endpoint_name}/latest.json"
         
         try:
             self.s3.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_key,
-                Body=json.dumps(report, indent=2, default=str),
+                Body=json.dumps(report, default=str),
                 ContentType='application/json'
             )
-            logger.info(f"Report saved to s3://{self.bucket_name}/{s3_key}")
+            segment_key = self.report_store.append(report)
+            logger.info(f"Report saved to s3://{self.bucket_name}/{s3_key} and {segment_key}")
         except Exception as e:
             logger.error(f"Failed to save report: {e}")
+    
+    def compact_reports(self) -> Dict[str, int]:
+        """Compact the stored report segments of recent days; run on its own schedule"""
+        return self.report_store.compact()
 
 def main():
     """Main monitoring function"""
-    import os
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='MLOps endpoint monitoring')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running, scheduling each check on its own interval')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='Local HTTP port for the daemon status endpoint')
+    args = parser.parse_args()
     
     # Get configuration from environment or Terraform outputs
     endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'mlops-showcase-endpoint')
     bucket_name = os.environ.get('S3_BUCKET_NAME')
     region = os.environ.get('AWS_REGION', 'us-east-1')
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN')
+    checkpoint_path = os.environ.get('MONITOR_CHECKPOINT_PATH')
     
     if not bucket_name:
         print("Error: S3_BUCKET_NAME environment variable not set")
         return
     
     # Initialize monitor
-    monitor = MLOpsMonitor(endpoint_name, bucket_name, region)
-    
-    # Generate health report
-    print("Generating MLOps health report...")
-    report = monitor.generate_health_report()
-    
-    # Print report
-    print("\n" + "="*60)
-    print("MLOPS HEALTH REPORT")
-    print("="*60)
-    print(f"Timestamp: {report['timestamp']}")
-    print(f"Overall Status: {report['overall_health']['status'].upper()}")
-    print()
-    
-    # Endpoint health
-    endpoint_health = report['endpoint_health']
-    print(f"Endpoint Health:")
-    print(f"  Name: {endpoint_health['endpoint_name']}")
-    print(f"  Status: {endpoint_health['status']}")
-    print(f"  Healthy: {endpoint_health['healthy']}")
-    print()
-    
-    # Metrics
-    print("Metrics (Last 24 hours):")
-    for metric_name, metric_data in report['metrics'].items():
-        if 'error' not in metric_data:
-            print(f"  {metric_name}: {metric_data['latest_value']}")
-    print()
+    monitor = MLOpsMonitor(endpoint_name, bucket_name, region, checkpoint_path=checkpoint_path)
     
-    # Data capture
-    data_analysis = report['data_capture_analysis']
-    print("Data Capture Analysis:")
-    print(f"  Files analyzed: {data_analysis.get('files_analyzed', 0)}")
-    print(f"  Input samples: {data_analysis.get('input_samples', 0)}")
-    print(f"  Output samples: {data_analysis.get('output_samples', 0)}")
-    print()
-    
-    # Save report
-    monitor.save_report(report)
-    
-    # Send alert if unhealthy
-    if report['overall_health']['status'] == 'unhealthy' and sns_topic_arn:
-        alert_message = f"""
-MLOps Health Alert
-
-Endpoint: {endpoint_name}
-Status: UNHEALTHY
-Timestamp: {report['timestamp']}
-
-Issues detected:
-- Endpoint Healthy: {report['overall_health']['endpoint_healthy']}
-- Metrics Healthy: {report['overall_health']['metrics_healthy']}
-
-Please check the CloudWatch dashboard for more details.
-        """
+    try:
+        if args.daemon:
+            from src.monitoring.daemon import MonitorDaemon
+            MonitorDaemon(monitor, port=args.port, sns_topic_arn=sns_topic_arn).run()
+            return
         
-        monitor.send_alert(
-            sns_topic_arn,
-            f"MLOps Alert: {endpoint_name} Unhealthy",
-            alert_message.strip()
-        )
-    
-    print("Monitoring complete!")
+        # Generate health report
+        print("Generating MLOps health report...")
+        report = monitor.generate_health_report()
+        
+        # Print report
+        print("\n" + "="*60)
+        print("MLOPS HEALTH REPORT")
+        print("="*60)
+        print(f"Timestamp: {report['timestamp']}")
+        print(f"Overall Status: {report['overall_health']['status'].upper()}")
+        print()
+        
+        # Endpoint health
+        endpoint_health = report['endpoint_health']
+        print(f"Endpoint Health:")
+        print(f"  Name: {endpoint_health['endpoint_name']}")
+        print(f"  Status: {endpoint_health['status']}")
+        print(f"  Healthy: {endpoint_health['healthy']}")
+        print()
+        
+        # Metrics
+        print("Metrics (Last 24 hours):")
+        for metric_name, metric_data in report['metrics'].items():
+            if 'error' not in metric_data:
+                print(f"  {metric_name}: {metric_data['latest_value']} "
+                      f"(last {HEALTH_WINDOW_MINUTES} min: {metric_data['recent_value']}, {metric_data['unit']})")
+        print()
+        
+        # Data capture
+        data_analysis = report['data_capture_analysis']
+        print("Data Capture Analysis:")
+        print(f"  Files analyzed: {data_analysis.get('files_analyzed', 0)}")
+        print(f"  Input samples: {data_analysis.get('input_samples', 0)}")
+        print(f"  Output samples: {data_analysis.get('output_samples', 0)}")
+        print(f"  Rows processed: {data_analysis.get('rows_processed', 0)} "
+              f"({data_analysis.get('rows_rejected', 0)} rejected)")
+        for window_name, window_stats in data_analysis.get('rolling_windows', {}).items():
+            print(f"  Rows ({window_name}): {window_stats['count']}")
+        drift_indicators = data_analysis.get('drift_indicators', {})
+        print(f"  Drift score: {drift_indicators.get('drift_score', 'unknown')}")
+        if drift_indicators.get('drifted_features'):
+            print(f"  Drifted features: {', '.join(drift_indicators['drifted_features'])}")
+        for window_name, window_predictions in data_analysis.get('prediction_distribution', {}).items():
+            if window_predictions['count']:
+                balance = ', '.join(f"{label}: {fraction:.1%}"
+                                    for label, fraction in window_predictions['class_balance'].items())
+                confidence = window_predictions['mean_confidence']
+                print(f"  Predictions ({window_name}): {window_predictions['count']} [{balance}]"
+                      + (f", mean confidence {confidence:.3f}" if confidence is not None else ""))
+        prediction_drift = data_analysis.get('prediction_drift', {})
+        print(f"  Prediction drift score: {prediction_drift.get('drift_score', 'unknown')}")
+        print()
+        
+        # Save report
+        monitor.save_report(report)
+        
+        # Send alert if unhealthy
+        if report['overall_health']['status'] == 'unhealthy' and sns_topic_arn:
+            monitor.send_health_alert(report, sns_topic_arn)
+        
+        print("Monitoring complete!")
+    finally:
+        monitor.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
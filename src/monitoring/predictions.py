@@ -0,0 +1,152 @@
+"""
+Prediction distribution monitoring
+Mergeable class balance, confidence and entropy histograms of captured
+predictions, compared against the test-set distribution saved at training
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.models.baseline import PREDICTION_BINS, prediction_confidence_entropy, unit_bin_indices
+from src.monitoring.drift import DRIFT_THRESHOLDS, MIN_DRIFT_ROWS, SEVERITIES, _severity, js_divergence, psi
+
+
+class PredictionHistogram:
+    """Mergeable counts of predicted classes, confidence and entropy.
+
+    Class labels are kept as strings so JSON round trips and labels of any
+    type compare equal. Confidence is the top-class probability and entropy is
+    normalized by the log of the class count, both binned over [0, 1].
+    """
+
+    def __init__(self, class_counts: Optional[Dict[str, int]] = None,
+                 confidence_counts: Optional[np.ndarray] = None,
+                 entropy_counts: Optional[np.ndarray] = None,
+                 confidence_sum: float = 0.0, entropy_sum: float = 0.0):
+        self.class_counts = class_counts or {}
+        self.confidence_counts = (np.zeros(PREDICTION_BINS, dtype=np.int64)
+                                  if confidence_counts is None else confidence_counts)
+        self.entropy_counts = (np.zeros(PREDICTION_BINS, dtype=np.int64)
+                               if entropy_counts is None else entropy_counts)
+        self.confidence_sum = confidence_sum
+        self.entropy_sum = entropy_sum
+
+    @property
+    def count(self) -> int:
+        return sum(self.class_counts.values())
+
+    @property
+    def scored(self) -> int:
+        """Predictions that came with class probabilities"""
+        return int(self.confidence_counts.sum())
+
+    def update(self, predictions: np.ndarray, probabilities: np.ndarray):
+        predictions = np.asarray(predictions)
+        if len(predictions):
+            labels, counts = np.unique(predictions.astype(str), return_counts=True)
+            for label, count in zip(labels.tolist(), counts.tolist()):
+                self.class_counts[label] = self.class_counts.get(label, 0) + count
+
+        probabilities = np.asarray(probabilities)
+        if probabilities.ndim == 2 and len(probabilities) and probabilities.shape[1]:
+            confidence, entropy = prediction_confidence_entropy(probabilities)
+            n_bins = len(self.confidence_counts)
+            self.confidence_counts += np.bincount(unit_bin_indices(confidence, n_bins), minlength=n_bins)
+            self.entropy_counts += np.bincount(unit_bin_indices(entropy, n_bins), minlength=n_bins)
+            self.confidence_sum += float(confidence.sum())
+            self.entropy_sum += float(entropy.sum())
+
+    def merge(self, other: 'PredictionHistogram'):
+        for label, count in other.class_counts.items():
+            self.class_counts[label] = self.class_counts.get(label, 0) + count
+        self.confidence_counts = self.confidence_counts + other.confidence_counts
+        self.entropy_counts = self.entropy_counts + other.entropy_counts
+        self.confidence_sum += other.confidence_sum
+        self.entropy_sum += other.entropy_sum
+
+    def summary(self) -> Dict:
+        count = self.count
+        scored = self.scored
+        return {
+            'count': count,
+            'class_balance': {label: n / count for label, n in sorted(self.class_counts.items())},
+            'mean_confidence': self.confidence_sum / scored if scored else None,
+            'mean_entropy': self.entropy_sum / scored if scored else None,
+            'confidence_histogram': (self.confidence_counts / max(scored, 1)).tolist(),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'class_counts': self.class_counts,
+            'confidence_counts': self.confidence_counts.tolist(),
+            'entropy_counts': self.entropy_counts.tolist(),
+            'confidence_sum': self.confidence_sum,
+            'entropy_sum': self.entropy_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PredictionHistogram':
+        return cls(
+            dict(data['class_counts']),
+            np.array(data['confidence_counts'], dtype=np.int64),
+            np.array(data['entropy_counts'], dtype=np.int64),
+            data['confidence_sum'],
+            data['entropy_sum'],
+        )
+
+
+def compute_prediction_drift(histogram: PredictionHistogram, baseline: Dict,
+                             thresholds: Optional[Dict] = None, min_rows: int = MIN_DRIFT_ROWS) -> Dict:
+    """Compare captured predictions with the test-set ``baseline['predictions']``.
+
+    Class balance, confidence and entropy histograms are each scored with PSI;
+    labels never seen at training time form an extra class with no expected mass.
+    """
+    thresholds = thresholds or DRIFT_THRESHOLDS
+    expected_predictions = baseline['predictions']
+    rows = histogram.count
+
+    if rows < min_rows or histogram.scored < min_rows:
+        return {
+            'samples_analyzed': rows,
+            'drift_score': 'insufficient_data',
+            'drift_detected': False,
+            'message': f'Need at least {min_rows} scored predictions for prediction drift analysis'
+        }
+
+    classes = [str(label) for label in expected_predictions['classes']]
+    unseen = rows - sum(histogram.class_counts.get(label, 0) for label in classes)
+    actual_classes = np.array([histogram.class_counts.get(label, 0) for label in classes] + [unseen]) / rows
+    expected_classes = np.array(list(expected_predictions['class_fractions']) + [0.0])
+
+    expected = np.array([
+        expected_predictions['confidence_fractions'],
+        expected_predictions['entropy_fractions'],
+    ])
+    actual = np.array([histogram.confidence_counts, histogram.entropy_counts]) / histogram.scored
+
+    class_psi = float(psi(expected_classes[np.newaxis], actual_classes[np.newaxis])[0])
+    confidence_psi, entropy_psi = psi(expected, actual).tolist()
+    confidence_js = float(js_divergence(expected[:1], actual[:1])[0])
+    severity = int(_severity(np.array([class_psi, confidence_psi, entropy_psi]), thresholds['psi']).max())
+
+    summary = histogram.summary()
+    return {
+        'samples_analyzed': rows,
+        'class_balance': {
+            label: {'expected': float(expected_classes[i]), 'actual': float(actual_classes[i])}
+            for i, label in enumerate(classes)
+        },
+        'unseen_class_fraction': float(actual_classes[-1]),
+        'class_psi': class_psi,
+        'confidence_psi': confidence_psi,
+        'confidence_js': confidence_js,
+        'entropy_psi': entropy_psi,
+        'mean_confidence': summary['mean_confidence'],
+        'baseline_mean_confidence': expected_predictions['mean_confidence'],
+        'mean_entropy': summary['mean_entropy'],
+        'baseline_mean_entropy': expected_predictions['mean_entropy'],
+        'drift_score': SEVERITIES[severity],
+        'drift_detected': severity == len(SEVERITIES) - 1
+    }
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Columnar health report store
+Appends flattened health reports to small npz segments in S3, compacts each
+day into one .npy object per column, and answers trend queries by loading
+only the requested columns and days
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+REPORTS_PREFIX = 'monitoring-reports'
+TIMESTAMP_COLUMN = 'timestamp'
+# Random id of the segment a report was appended in, identifying the report
+# when several share a timestamp. 53 bits, so it is exact as a float64.
+SEGMENT_COLUMN = 'segment_id'
+SEVERITY_CODES = {'low': 0.0, 'moderate': 1.0, 'high': 2.0}
+
+# Compact a day once it has this many segments; past days are always compacted
+COMPACT_SEGMENTS = 24
+
+
+def _epoch(moment: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime"""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def columnar_prefix(endpoint_name: str) -> str:
+    """Prefix of an endpoint's columnar report store"""
+    return f"{REPORTS_PREFIX}/{endpoint_name}/columnar"
+
+
+def flatten_report(report: Dict) -> Dict[str, float]:
+    """Flatten a health report into dotted numeric columns.
+
+    Numbers and booleans are kept as floats, drift scores are encoded by
+    severity, and everything else (strings, lists) is left out.
+    """
+    row = {TIMESTAMP_COLUMN: _epoch(datetime.fromisoformat(report['timestamp']))}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(f"{prefix}.{key}" if prefix else key, child)
+        elif isinstance(value, (bool, int, float, np.integer, np.floating)):
+            row[prefix] = float(value)
+        elif prefix.endswith('drift_score') or prefix.endswith('.severity'):
+            row[prefix] = SEVERITY_CODES.get(value, np.nan)
+
+    for section, value in report.items():
+        if section != TIMESTAMP_COLUMN:
+            walk(section, value)
+    return row
+
+
+def _to_bytes(save, data) -> bytes:
+    buffer = io.BytesIO()
+    save(buffer, data)
+    return buffer.getvalue()
+
+
+class ReportStore:
+    """Daily-partitioned columnar storage for health reports in S3.
+
+    Layout under ``prefix``::
+
+        date=YYYY-MM-DD/segments/<time>-<id>.npz   one appended report each
+        date=YYYY-MM-DD/columns/<column>.npy       compacted column arrays
+        date=YYYY-MM-DD/columns/_manifest.json     compacted columns and rows
+    """
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+
+    def _day_prefix(self, day: str) -> str:
+        return f"{self.prefix}/date={day}"
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        paginator = self.s3.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return keys
+
+    def _get(self, key: str) -> bytes:
+        return self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+
+    def _put(self, key: str, body: bytes, content_type: str = 'application/octet-stream'):
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body, ContentType=content_type)
+
+    def append(self, report: Dict) -> str:
+        """Append one report as a single-row segment"""
+        row = flatten_report(report)
+        segment_id = uuid.uuid4().int >> 75
+        row[SEGMENT_COLUMN] = float(segment_id)
+        moment = _from_epoch(row[TIMESTAMP_COLUMN])
+        key = (f"{self._day_prefix(moment.strftime('%Y-%m-%d'))}/segments/"
+               f"{moment.strftime('%H%M%S')}-{segment_id:014x}.npz")
+        arrays = {column: np.array([value]) for column, value in row.items()}
+        self._put(key, _to_bytes(lambda f, a: np.savez_compressed(f, **a), arrays))
+        return key
+
+    def _manifest(self, day: str) -> Optional[Dict]:
+        try:
+            return json.loads(self._get(f"{self._day_prefix(day)}/columns/_manifest.json"))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def _load_segments(self, keys: Iterable[str]) -> List[Dict[str, np.ndarray]]:
+        segments = []
+        for key in keys:
+            with np.load(io.BytesIO(self._get(key)), allow_pickle=False) as data:
+                segments.append({column: data[column] for column in data.files})
+        return segments
+
+    def _load_compacted(self, day: str, columns: Optional[List[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Load the requested compacted column arrays of one day"""
+        manifest = self._manifest(day)
+        if not manifest:
+            return None
+        wanted = manifest['columns'] if columns is None else [
+            column for column in columns if column in manifest['columns']
+        ]
+        for column in (SEGMENT_COLUMN, TIMESTAMP_COLUMN):
+            if column in manifest['columns'] and column not in wanted:
+                wanted = [column] + wanted
+        return {
+            column: np.load(io.BytesIO(self._get(f"{self._day_prefix(day)}/columns/{column}.npy")),
+                            allow_pickle=False)
+            for column in wanted
+        }
+
+    def _load_day(self, day: str, columns: Optional[List[str]] = None) -> List[Dict[str, np.ndarray]]:
+        """Load the compacted columns and any pending segments of one day"""
+        compacted = self._load_compacted(day, columns)
+        blocks = [compacted] if compacted else []
+        blocks.extend(self._load_segments(self._list_keys(f"{self._day_prefix(day)}/segments/")))
+        return blocks
+
+    @staticmethod
+    def _concat(blocks: List[Dict[str, np.ndarray]], columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        if columns is None:
+            columns = sorted(set().union(*(block.keys() for block in blocks)) - {TIMESTAMP_COLUMN, SEGMENT_COLUMN})
+        result = {}
+        for column in [TIMESTAMP_COLUMN, SEGMENT_COLUMN] + [c for c in columns if c != SEGMENT_COLUMN]:
+            # Reports stored before segment ids were added all get id -1
+            fill = -1.0 if column == SEGMENT_COLUMN else np.nan
+            result[column] = np.concatenate([
+                block.get(column, np.full(len(block[TIMESTAMP_COLUMN]), fill)) for block in blocks
+            ])
+        # Sort by time and drop reports seen twice while a compaction is in flight
+        identity = np.stack([result[TIMESTAMP_COLUMN], result[SEGMENT_COLUMN]], axis=1)
+        _, order = np.unique(identity, axis=0, return_index=True)
+        return {column: values[order] for column, values in result.items()}
+
+    def days(self) -> List[str]:
+        """List the days that hold reports"""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        days = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{self.prefix}/date=", Delimiter='/'):
+            for common_prefix in page.get('CommonPrefixes', []):
+                days.append(common_prefix['Prefix'].rstrip('/').split('date=', 1)[1])
+        return sorted(days)
+
+    def compact_day(self, day: str) -> int:
+        """Merge a day's segments into its per-column arrays; returns rows stored"""
+        segment_keys = self._list_keys(f"{self._day_prefix(day)}/segments/")
+        if not segment_keys:
+            return 0
+
+        compacted = self._load_compacted(day)
+        blocks = [compacted] if compacted else []
+        blocks.extend(self._load_segments(segment_keys))
+        merged = self._concat(blocks)
+
+        for column, values in merged.items():
+            self._put(f"{self._day_prefix(day)}/columns/{column}.npy", _to_bytes(np.save, values))
+        manifest = {'columns': sorted(merged), 'rows': len(merged[TIMESTAMP_COLUMN]),
+                    'compacted_at': datetime.utcnow().isoformat()}
+        self._put(f"{self._day_prefix(day)}/columns/_manifest.json", json.dumps(manifest).encode(),
+                  content_type='application/json')
+
+        # Segments are deleted only after the manifest is written, so readers
+        # never miss rows (duplicates in between are dropped by _concat)
+        for i in range(0, len(segment_keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in segment_keys[i:i + 1000]]}
+            )
+        return manifest['rows']
+
+    def compact(self, min_segments: int = COMPACT_SEGMENTS, lookback_days: int = 7,
+                now: Optional[datetime] = None) -> Dict[str, int]:
+        """Compact recent past days, and today once it has ``min_segments`` segments"""
+        now = now or datetime.utcnow()
+        today = now.strftime('%Y-%m-%d')
+        compacted = {}
+        for offset in range(lookback_days, -1, -1):
+            day = (now - timedelta(days=offset)).strftime('%Y-%m-%d')
+            segments = self._list_keys(f"{self._day_prefix(day)}/segments/")
+            if segments and (day < today or len(segments) >= min_segments):
+                compacted[day] = self.compact_day(day)
+        return compacted
+
+    def query(self, columns: List[str], start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """Load the requested columns for reports between ``start`` and ``end``.
+
+        Only the days in range are read, and for compacted days only the
+        requested column objects are downloaded. Columns missing from a day
+        are filled with NaN.
+        """
+        blocks = []
+        day = start.date()
+        while day <= end.date():
+            blocks.extend(self._load_day(day.strftime('%Y-%m-%d'), columns))
+            day += timedelta(days=1)
+
+        if not blocks:
+            return {column: np.empty(0) for column in [TIMESTAMP_COLUMN] + list(columns)}
+
+        result = self._concat(blocks, list(columns))
+        timestamps = result[TIMESTAMP_COLUMN]
+        in_range = (timestamps >= _epoch(start)) & (timestamps <= _epoch(end))
+        return {column: result[column][in_range] for column in [TIMESTAMP_COLUMN] + list(columns)}
+
+
+def main():
+    """Query report trends from the command line"""
+    import argparse
+
+    # Add project root to path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from src.aws_clients import get_client
+
+    parser = argparse.ArgumentParser(description='Query stored MLOps health report trends')
+    parser.add_argument('columns', nargs='*',
+                        default=['overall_health.endpoint_healthy', 'metrics.ModelLatency_p99.recent_value',
+                                 'data_capture_analysis.drift_indicators.max_psi'],
+                        help='Dotted report columns to load')
+    parser.add_argument('--days', type=int, default=30, help='How many days back to query')
+    parser.add_argument('--list-columns', action='store_true', help='List the columns of the latest day')
+    parser.add_argument('--compact', action='store_true', help='Compact pending segments first')
+    args = parser.parse_args()
+
+    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'mlops-showcase-endpoint')
+    bucket_name = os.environ.get('S3_BUCKET_NAME')
+    if not bucket_name:
+        print("Error: S3_BUCKET_NAME environment variable not set")
+        return
+
+    s3 = get_client('s3', os.environ.get('AWS_REGION', 'us-east-1'))
+    store = ReportStore(s3, bucket_name, columnar_prefix(endpoint_name))
+
+    if args.compact:
+        for day, rows in store.compact(min_segments=1).items():
+            print(f"Compacted {day}: {rows} reports")
+
+    if args.list_columns:
+        days = store.days()
+        if days:
+            result = store._concat(store._load_day(days[-1]))
+            print('\n'.join(sorted(column for column in result if column != SEGMENT_COLUMN)))
+        return
+
+    end = datetime.utcnow()
+    result = store.query(args.columns, end - timedelta(days=args.days), end)
+    print(','.join([TIMESTAMP_COLUMN] + args.columns))
+    for i, timestamp in enumerate(result[TIMESTAMP_COLUMN]):
+        values = [f"{result[column][i]:g}" for column in args.columns]
+        print(','.join([_from_epoch(timestamp).isoformat()] + values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Mergeable distribution sketches
+KLL-style quantile sketches per feature plus class-probability histograms,
+summarizing capture files compactly so that stored hourly sketches can be
+merged to answer any time window without rereading raw capture data
+"""
+
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from src.monitoring.checkpoint import HOUR_FORMAT
+
+# Default sketch size; rank error is roughly 1.7 / k
+SKETCH_K = 200
+PROBABILITY_BINS = np.linspace(0, 1, 11)
+SUMMARY_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+# Staged runs remembered by each stored hourly sketch, so a retried merge is skipped
+APPLIED_RUNS = 32
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty compactors).
+
+    Level ``h`` holds items that each stand for ``2 ** h`` values. When a
+    level outgrows its capacity it is sorted and every other item, from a
+    random offset, is promoted to the next level.
+    """
+
+    def __init__(self, k: int = SKETCH_K, seed: Optional[int] = None):
+        self.k = k
+        self.levels = [np.empty(0, dtype=np.float32)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.RandomState(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float32))
+                items = np.sort(items)
+                # Compact an even number of items; an odd one out stays here
+                leftover = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.randint(2):len(items) - len(leftover):2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # A new top level shrinks the capacity of the levels below it
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values).ravel()
+        if values.dtype != np.float32:
+            values = values.astype(np.float64, copy=False)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        # Items are kept as float32, the precision sketches are stored at;
+        # the extremes above stay exact
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float32)])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        if other.count == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float32))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Approximate values at the requested quantile levels"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        items, cumulative = self._weighted_items()
+        index = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        values = items[np.minimum(index, len(items) - 1)].astype(np.float64)
+        # The exact extremes are tracked separately
+        values = np.where(qs <= 0, self.min, values)
+        return np.where(qs >= 1, self.max, values)
+
+    def cdf(self, values) -> np.ndarray:
+        """Approximate fraction of values at or below each point"""
+        if self.count == 0:
+            return np.full(np.shape(values), np.nan)
+        items, cumulative = self._weighted_items()
+        index = np.searchsorted(items, values, side='right')
+        below = np.where(index > 0, cumulative[np.maximum(index - 1, 0)], 0)
+        return below / cumulative[-1]
+
+
+class CaptureSketch:
+    """Per-feature quantile sketches and a class-probability histogram"""
+
+    def __init__(self, n_features: int = 0, k: int = SKETCH_K, seed: Optional[int] = None):
+        self.k = k
+        self.seed = seed
+        self.features = [KLLSketch(k, seed) for _ in range(n_features)]
+        self.class_histogram = None
+        # Ids of the staged runs merged into a stored sketch
+        self.applied_runs: List[str] = []
+
+    @property
+    def rows(self) -> int:
+        return self.features[0].count if self.features else 0
+
+    def update_features(self, data: np.ndarray):
+        data = np.asarray(data)
+        if data.ndim != 2 or len(data) == 0:
+            return
+        if not self.features:
+            self.features = [KLLSketch(self.k, self.seed) for _ in range(data.shape[1])]
+        if data.shape[1] != len(self.features):
+            raise ValueError(f"Rows have {data.shape[1]} features but the sketch has {len(self.features)}")
+        for sketch, column in zip(self.features, data.T):
+            sketch.update(column)
+
+    def update_probabilities(self, probabilities: np.ndarray):
+        """Count predicted class probabilities, shape (rows, classes), into bins"""
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if probabilities.ndim != 2 or len(probabilities) == 0:
+            return
+        n_bins = len(PROBABILITY_BINS) - 1
+        if self.class_histogram is None:
+            self.class_histogram = np.zeros((probabilities.shape[1], n_bins), dtype=np.int64)
+        if probabilities.shape[1] != len(self.class_histogram):
+            raise ValueError(f"Outputs have {probabilities.shape[1]} classes, expected {len(self.class_histogram)}")
+        bins = np.clip(np.searchsorted(PROBABILITY_BINS, probabilities, side='right') - 1, 0, n_bins - 1)
+        for c in range(probabilities.shape[1]):
+            self.class_histogram[c] += np.bincount(bins[:, c], minlength=n_bins)
+
+    def merge(self, other: 'CaptureSketch'):
+        if not self.features:
+            self.features = [KLLSketch(self.k, self.seed) for _ in other.features]
+        if other.features and len(other.features) != len(self.features):
+            raise ValueError(f"Cannot merge a sketch of {len(other.features)} features into {len(self.features)}")
+        for mine, theirs in zip(self.features, other.features):
+            mine.merge(theirs)
+        if other.class_histogram is not None:
+            if self.class_histogram is None:
+                self.class_histogram = other.class_histogram.copy()
+            else:
+                self.class_histogram = self.class_histogram + other.class_histogram
+
+    def summary(self, feature_names: Optional[List[str]] = None, quantiles=SUMMARY_QUANTILES) -> Dict:
+        names = feature_names or [f'feature_{i}' for i in range(len(self.features))]
+        summary = {
+            'rows': self.rows,
+            'quantile_levels': list(quantiles),
+            'feature_quantiles': {
+                name: sketch.quantiles(quantiles).tolist()
+                for name, sketch in zip(names, self.features)
+            }
+        }
+        if self.class_histogram is not None:
+            summary['probability_bins'] = PROBABILITY_BINS.tolist()
+            summary['class_probability_histogram'] = self.class_histogram.tolist()
+        return summary
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compressed npz archive"""
+        meta = {
+            'k': self.k,
+            'features': [
+                {'count': s.count, 'min': s.min, 'max': s.max, 'levels': len(s.levels)}
+                for s in self.features
+            ],
+            'applied_runs': self.applied_runs,
+        }
+        arrays = {'meta': np.array(json.dumps(meta))}
+        for f, sketch in enumerate(self.features):
+            for h, items in enumerate(sketch.levels):
+                arrays[f'f{f}_l{h}'] = items.astype(np.float32)
+        if self.class_histogram is not None:
+            arrays['class_histogram'] = self.class_histogram
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CaptureSketch':
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            meta = json.loads(str(archive['meta']))
+            sketch = cls(k=meta['k'])
+            sketch.applied_runs = meta.get('applied_runs', [])
+            for f, info in enumerate(meta['features']):
+                feature = KLLSketch(meta['k'])
+                feature.count = info['count']
+                feature.min = info['min']
+                feature.max = info['max']
+                feature.levels = [archive[f'f{f}_l{h}'].astype(np.float32) for h in range(info['levels'])]
+                sketch.features.append(feature)
+            if 'class_histogram' in archive.files:
+                sketch.class_histogram = archive['class_histogram']
+        return sketch
+
+
+class SketchStore:
+    """Hourly CaptureSketch objects in S3, one ``<YYYY-MM-DDTHH>.npz`` per hour.
+
+    A run's new sketches are first staged under ``pending/<run id>/``. Once the
+    checkpoint that covers their files is saved, they are merged into the
+    hourly sketches. Each hourly sketch records the runs merged into it, so a
+    merge interrupted part way can be retried without counting rows twice.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+
+    def _key(self, hour: str) -> str:
+        return f"{self.prefix}/{hour}.npz"
+
+    def _pending_prefix(self, run_id: str) -> str:
+        return f"{self.prefix}/pending/{run_id}/"
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        paginator = self.s3.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return keys
+
+    def _delete(self, keys: List[str]):
+        for i in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]]}
+            )
+
+    def load(self, hour: str) -> Optional[CaptureSketch]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=self._key(hour))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return CaptureSketch.from_bytes(response['Body'].read())
+
+    def save(self, hour: str, sketch: CaptureSketch):
+        self.s3.put_object(Bucket=self.bucket_name, Key=self._key(hour), Body=sketch.to_bytes(),
+                           ContentType='application/octet-stream')
+
+    def add(self, hour: str, sketch: CaptureSketch, run_id: Optional[str] = None):
+        """Merge a new sketch into the stored sketch of an hour, once per ``run_id``"""
+        stored = self.load(hour)
+        if stored is not None:
+            if run_id is not None and run_id in stored.applied_runs:
+                return
+            stored.merge(sketch)
+            sketch = stored
+        if run_id is not None:
+            sketch.applied_runs = (sketch.applied_runs + [run_id])[-APPLIED_RUNS:]
+        self.save(hour, sketch)
+
+    def stage(self, run_id: str, sketches: Dict[str, CaptureSketch]):
+        """Store a run's new hourly sketches without merging them yet"""
+        for hour, sketch in sketches.items():
+            self.s3.put_object(Bucket=self.bucket_name, Key=f"{self._pending_prefix(run_id)}{hour}.npz",
+                               Body=sketch.to_bytes(), ContentType='application/octet-stream')
+
+    def apply_staged(self, run_id: str) -> int:
+        """Merge a staged run into the hourly sketches and delete it; returns hours merged"""
+        keys = self._list_keys(self._pending_prefix(run_id))
+        for key in keys:
+            hour = key.rsplit('/', 1)[-1][:-len('.npz')]
+            body = self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+            self.add(hour, CaptureSketch.from_bytes(body), run_id)
+        self._delete(keys)
+        return len(keys)
+
+    def discard_staged(self) -> int:
+        """Delete every staged run; returns objects deleted"""
+        keys = self._list_keys(f"{self.prefix}/pending/")
+        self._delete(keys)
+        return len(keys)
+
+    def hours(self) -> List[str]:
+        hours = []
+        for key in self._list_keys(f"{self.prefix}/"):
+            directory, name = key.rsplit('/', 1)
+            if directory == self.prefix and name.endswith('.npz'):
+                hours.append(name[:-len('.npz')])
+        return sorted(hours)
+
+    def window(self, start: datetime, end: datetime) -> CaptureSketch:
+        """Merge the stored sketches of every hour from ``start`` to ``end``"""
+        merged = CaptureSketch()
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        while hour <= end:
+            sketch = self.load(hour.strftime(HOUR_FORMAT))
+            if sketch is not None:
+                merged.merge(sketch)
+            hour += timedelta(hours=1)
+        return merged
+
+    def prune(self, retention_hours: int, now: Optional[datetime] = None) -> int:
+        """Delete hourly sketches older than the retention period"""
+        now = now or datetime.utcnow()
+        cutoff = (now - timedelta(hours=retention_hours)).strftime(HOUR_FORMAT)
+        expired = [self._key(hour) for hour in self.hours() if hour <= cutoff]
+        self._delete(expired)
+        return len(expired)
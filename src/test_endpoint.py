@@ -7,11 +7,21 @@ Uses Terraform outputs to get endpoint name and configuration
 import os
 import json
 import subprocess
-import boto3
+import sys
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.aws_clients import get_client
+from src.inference.client import EndpointClient
+from src.inference.loadgen import (
+    DEFAULT_COLD_START_MS, LOAD_MODES, PAYLOAD_FORMATS, load_test_endpoint, print_load_report
+)
+
 def get_terraform_outputs():
     """Get Terraform outputs to find endpoint name"""
     terraform_dir = Path("terraform")
@@ -54,7 +64,7 @@ def test_model_endpoint(endpoint_name=None):
     
     try:
         # Check endpoint status first
-        sagemaker_client = boto3.client('sagemaker')
+        sagemaker_client = get_client('sagemaker')
         endpoint_info = sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
         
         print(f"Endpoint status: {endpoint_info['EndpointStatus']}")
@@ -75,9 +85,10 @@ def test_model_endpoint(endpoint_name=None):
         csv_data = sample_data.to_csv(index=False)
         
         # Call the endpoint
-        runtime = boto3.client('sagemaker-runtime')
+        runtime = get_client('sagemaker-runtime')
         
         print("\nInvoking endpoint...")
+        started = time.perf_counter()
         response = runtime.invoke_endpoint(
             EndpointName=endpoint_name,
             ContentType='text/csv',
@@ -86,18 +97,20 @@ def test_model_endpoint(endpoint_name=None):
         
         # Parse the response
         result = response['Body'].read().decode()
+        response_ms = (time.perf_counter() - started) * 1000
         print(f"\nModel predictions:")
         print(result)
         
         # Log successful test
         print(f"\n✅ Endpoint test successful!")
         print(f"Endpoint: {endpoint_name}")
-        print(f"Response time: {response['ResponseMetadata'].get('HTTPHeaders', {}).get('x-amzn-requestid', 'N/A')}")
+        print(f"Response time: {response_ms:.1f} ms")
+        print(f"Request ID: {response.get('ResponseMetadata', {}).get('RequestId', 'N/A')}")
         
         return True
         
     except sagemaker_client.exceptions.ClientError as e:
-        if 'does not exist' in str(e):
+        if 'Could not find endpoint' in str(e):
             print(f"❌ Endpoint '{endpoint_name}' does not exist.")
             print("Available endpoints:")
             try:
@@ -151,10 +164,84 @@ def test_with_monitoring():
     
     return success
 
+def resolve_endpoint_name():
+    outputs = get_terraform_outputs()
+    if outputs and 'sagemaker_endpoint_name' in outputs:
+        return outputs['sagemaker_endpoint_name']['value']
+    return os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'mlops-showcase-endpoint')
+
+def run_batch_prediction(endpoint_name, n_rows):
+    """Predict a large synthetic batch through the batching client"""
+    print(f"Batch predicting {n_rows} rows on endpoint: {endpoint_name}")
+    sample_data = pd.DataFrame({
+        f'feature_{i}': np.random.randn(n_rows) for i in range(20)
+    })
+    result = EndpointClient(endpoint_name).predict(sample_data)
+    stats = result.stats
+    print(f"✅ {stats['rows']} predictions in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['rows_per_second']:.0f} rows/s, {stats['mb_per_second']:.2f} MB/s)")
+    print(f"   {stats['requests']} requests, {stats['retries']} retries, {stats['encoding']} encoding")
+    return stats
+
+def run_load_test(args):
+    """Load test the endpoint, or a local model artifact, and report latency as JSON"""
+    options = dict(
+        mode=args.mode,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        duration_seconds=args.duration,
+        max_requests=args.requests,
+        warmup_requests=args.warmup,
+        cold_start_ms=args.cold_start_ms,
+    )
+    if args.local:
+        print(f"Load testing local model: {args.local}")
+        report = load_test_endpoint(local_artifact=args.local, rows_per_request=args.rows,
+                                    payload_format=args.format, **options)
+    else:
+        endpoint_name = args.endpoint or resolve_endpoint_name()
+        print(f"Load testing endpoint: {endpoint_name}")
+        report = load_test_endpoint(endpoint_name, rows_per_request=args.rows,
+                                    payload_format=args.format, **options)
+    report['rows_per_request'] = args.rows
+    report['payload_format'] = args.format
+
+    print_load_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"   Report saved to {args.output}")
+    else:
+        print(json.dumps({key: report[key] for key in ('latency', 'throughput_rps', 'error_rate', 'cold_starts')}, indent=2))
+    return report['error_rate'] == 0
+
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "--with-monitoring":
+    parser = argparse.ArgumentParser(description='Test the SageMaker endpoint')
+    parser.add_argument('--with-monitoring', action='store_true', help='Print monitoring setup after the test')
+    parser.add_argument('--load', action='store_true', help='Run a load test instead of a single request')
+    parser.add_argument('--endpoint', help='Endpoint name (default: Terraform output or SAGEMAKER_ENDPOINT_NAME)')
+    parser.add_argument('--batch-rows', type=int, help='Predict this many rows through the batching client')
+    parser.add_argument('--local', metavar='ARTIFACT', help='Load test a model.tar.gz or directory served locally')
+    parser.add_argument('--mode', choices=LOAD_MODES, default='closed',
+                        help='closed: N concurrent clients; open: fixed request rate')
+    parser.add_argument('--concurrency', type=int, default=4, help='Clients (closed) or max requests in flight (open)')
+    parser.add_argument('--rps', type=float, default=10.0, help='Request rate in open-loop mode')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests')
+    parser.add_argument('--rows', type=int, default=1, help='Rows per request')
+    parser.add_argument('--format', choices=list(PAYLOAD_FORMATS), default='csv', help='Request body format')
+    parser.add_argument('--warmup', type=int, default=5, help='Warm-up requests before measuring')
+    parser.add_argument('--cold-start-ms', type=float, default=DEFAULT_COLD_START_MS,
+                        help='Requests slower than this are reported as cold starts')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args()
+
+    if args.load or args.local:
+        if not run_load_test(args):
+            exit(1)
+    elif args.batch_rows:
+        run_batch_prediction(args.endpoint or resolve_endpoint_name(), args.batch_rows)
+    elif args.with_monitoring:
         test_with_monitoring()
     else:
-        test_model_endpoint()
\ No newline at end of file
+        test_model_endpoint(args.endpoint)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Performance benchmark suite
+Times the inference handlers, model loading, training, capture parsing and
+data generation on fixed seeds, and compares throughput and peak memory
+against a stored baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from src.data.generate_data import generate_synthetic_data
+from src.inference import inference
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SEED = 42
+HANDLER_ROWS = [1, 100, 10_000, 1_000_000]
+# Rows encoded once; larger payloads repeat this block
+PAYLOAD_BLOCK_ROWS = 10_000
+BENCHMARK_TREES = 20
+
+# Allowed relative throughput drop and peak memory growth before a benchmark regresses
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.25
+# Memory differences below this are noise
+MEMORY_NOISE_MB = 1.0
+
+# Fast calls are looped so each timed round lasts at least this long
+MIN_REPEAT_SECONDS = 0.2
+
+
+def measure(fn: Callable, items: int, unit: str, repeats: int = 5) -> Dict:
+    """Peak traced memory of one call, then the best per-call time over ``repeats`` timed rounds"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    first_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    number = max(1, int(MIN_REPEAT_SECONDS / max(first_seconds, 1e-6)))
+    if first_seconds > 1:
+        repeats = min(repeats, 2)
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+
+    return {
+        'seconds': best,
+        'throughput': items / best if best > 0 else 0.0,
+        'unit': unit,
+        'peak_memory_mb': peak / (1024 * 1024),
+    }
+
+
+def csv_payload(features: pd.DataFrame, n_rows: int) -> str:
+    """CSV request body of n_rows, built by repeating a fixed block for large sizes"""
+    if n_rows <= len(features):
+        return features.iloc[:n_rows].to_csv(index=False)
+    header, block = features.to_csv(index=False).split('\n', 1)
+    repeats, remainder = divmod(n_rows, len(features))
+    return header + '\n' + block * repeats + features.iloc[:remainder].to_csv(index=False, header=False)
+
+
+def bench_data_generation() -> Dict[str, Dict]:
+    n_samples = 100_000
+    return {'data/generate_synthetic_data': measure(
+        lambda: generate_synthetic_data(n_samples=n_samples), n_samples, 'rows/s')}
+
+
+def bench_training(train_df: pd.DataFrame) -> Dict[str, Dict]:
+    X = train_df.drop('target', axis=1)
+    y = train_df['target']
+
+    def fit():
+        RandomForestClassifier(n_estimators=BENCHMARK_TREES, random_state=SEED, n_jobs=1).fit(X, y)
+
+    result = measure(fit, BENCHMARK_TREES, 'trees/s', repeats=2)
+    result['seconds_per_tree'] = result['seconds'] / BENCHMARK_TREES
+    return {f'training/random_forest/rows={len(X)}': result}
+
+
+def bench_model_load(model_dir: str) -> Dict[str, Dict]:
+    return {'inference/model_fn': measure(lambda: inference.model_fn(model_dir), 1, 'loads/s')}
+
+
+def bench_handlers(model, features: pd.DataFrame, sizes: List[int]) -> Dict[str, Dict]:
+    results = {}
+    for n_rows in sizes:
+        payload = csv_payload(features, n_rows)
+        data = inference.input_fn(payload, 'text/csv')
+        prediction = inference.predict_fn(data, model)
+        results[f'inference/input_fn/rows={n_rows}'] = measure(
+            lambda: inference.input_fn(payload, 'text/csv'), n_rows, 'rows/s')
+        results[f'inference/predict_fn/rows={n_rows}'] = measure(
+            lambda: inference.predict_fn(data, model), n_rows, 'rows/s')
+        results[f'inference/output_fn/rows={n_rows}'] = measure(
+            lambda: inference.output_fn(prediction, 'application/json'), n_rows, 'rows/s')
+        del payload, data, prediction
+    return results
+
+
+def bench_capture_parsing(model, features: pd.DataFrame, workdir: str,
+                          n_files: int = 5, records_per_file: int = 1000) -> Dict[str, Dict]:
+    """Read and summarize data capture files through MLOpsMonitor on the local S3 backend"""
+    previous_env = {name: os.environ.get(name) for name in ('MLOPS_AWS_BACKEND', 'MLOPS_LOCAL_ROOT')}
+    os.environ.update({'MLOPS_AWS_BACKEND': 'local', 'MLOPS_LOCAL_ROOT': workdir})
+    from src.aws_clients import clear_clients
+    from src.monitoring.mlops_monitor import MLOpsMonitor, summarize_capture_file
+    clear_clients()
+
+    monitor = MLOpsMonitor('bench-endpoint', 'bench-bucket', summary_workers=0)
+    feature_names = list(features.columns)
+    rng = np.random.RandomState(SEED)
+    keys = []
+    for i in range(n_files):
+        rows = features.iloc[rng.randint(0, len(features), size=records_per_file)]
+        prediction = inference.predict_fn(rows, model)
+        lines = []
+        for j in range(records_per_file):
+            body = rows.iloc[[j]].to_csv(index=False)
+            output = json.dumps({'predictions': prediction['predictions'][j:j + 1],
+                                 'probabilities': prediction['probabilities'][j:j + 1]})
+            lines.append(json.dumps({'captureData': {
+                'endpointInput': {'data': body, 'encoding': 'CSV', 'mode': 'INPUT'},
+                'endpointOutput': {'data': output, 'encoding': 'JSON', 'mode': 'OUTPUT'},
+            }}))
+        key = f'data-capture/bench-endpoint/primary/2024/01/01/00/capture-{i}.jsonl'
+        monitor.s3.put_object(Bucket='bench-bucket', Key=key, Body='\n'.join(lines))
+        keys.append(key)
+
+    def parse():
+        for key in keys:
+            summarize_capture_file(monitor._read_capture_file(key), feature_names)
+
+    try:
+        return {'monitoring/capture_parsing': measure(parse, n_files * records_per_file, 'records/s')}
+    finally:
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name)
+            else:
+                os.environ[name] = value
+        clear_clients()
+
+
+def run_benchmarks(max_rows: Optional[int] = None) -> Dict:
+    """Run every benchmark; handler sizes above ``max_rows`` are skipped"""
+    np.random.seed(SEED)
+    sizes = [n for n in HANDLER_ROWS if max_rows is None or n <= max_rows]
+    train_df, _ = generate_synthetic_data(n_samples=12_500)
+    features = train_df.drop('target', axis=1).iloc[:PAYLOAD_BLOCK_ROWS]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        model = RandomForestClassifier(n_estimators=BENCHMARK_TREES, random_state=SEED)
+        model.fit(train_df.drop('target', axis=1), train_df['target'])
+        joblib.dump(model, os.path.join(workdir, 'model.pkl'))
+
+        for name, bench in [
+            ('data generation', bench_data_generation),
+            ('training', lambda: bench_training(train_df)),
+            ('model load', lambda: bench_model_load(workdir)),
+            ('handlers', lambda: bench_handlers(model, features, sizes)),
+            ('capture parsing', lambda: bench_capture_parsing(model, features, workdir)),
+        ]:
+            print(f"⏱️  Benchmarking {name}...")
+            results.update(bench())
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'benchmarks': results,
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float = DEFAULT_TOLERANCE,
+                    memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE) -> Dict:
+    """Benchmarks whose throughput dropped or peak memory grew beyond the tolerances"""
+    comparison = {}
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if before is None:
+            continue
+        throughput_change = result['throughput'] / before['throughput'] - 1 if before['throughput'] else 0.0
+        memory_growth = result['peak_memory_mb'] - before['peak_memory_mb']
+        memory_change = memory_growth / before['peak_memory_mb'] if before['peak_memory_mb'] else 0.0
+        slower = throughput_change < -tolerance
+        bigger = memory_change > memory_tolerance and memory_growth > MEMORY_NOISE_MB
+        comparison[name] = {
+            'throughput_change': throughput_change,
+            'memory_change': memory_change,
+            'regressed': slower or bigger,
+        }
+        if slower:
+            regressions.append(f"{name}: throughput {throughput_change:+.1%}")
+        if bigger:
+            regressions.append(f"{name}: peak memory {memory_change:+.1%}")
+
+    return {
+        'benchmarks': comparison,
+        'missing': sorted(set(baseline['benchmarks']) - set(current['benchmarks'])),
+        'regressions': regressions,
+        'passed': not regressions,
+    }
+
+
+def print_results(results: Dict, comparison: Optional[Dict] = None):
+    for name, result in results['benchmarks'].items():
+        line = (f"   {name}: {result['throughput']:,.1f} {result['unit']}, "
+                f"{result['seconds'] * 1000:.2f} ms, {result['peak_memory_mb']:.1f} MB")
+        if comparison and name in comparison['benchmarks']:
+            change = comparison['benchmarks'][name]
+            marker = '❌' if change['regressed'] else '✅'
+            line = (f"{line} ({marker} throughput {change['throughput_change']:+.1%}, "
+                    f"memory {change['memory_change']:+.1%})")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run performance benchmarks and compare them to the baseline')
+    parser.add_argument('--compare', action='store_true', help='Fail if results regress against the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--output', help='Write the results to this path')
+    parser.add_argument('--max-rows', type=int, help='Skip handler benchmarks above this many rows')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative throughput drop')
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help='Allowed relative peak memory growth')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.max_rows)
+
+    comparison = None
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare_results(baseline, results, args.tolerance, args.memory_tolerance)
+        results['comparison'] = comparison
+
+    print("📊 Benchmark results:")
+    print_results(results, comparison)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({key: results[key] for key in ('created_at', 'environment', 'benchmarks')}, f, indent=2)
+        print(f"   Baseline saved to {args.baseline}")
+
+    if comparison is not None:
+        if not comparison['passed']:
+            print("❌ Performance regressions:")
+            for regression in comparison['regressions']:
+                print(f"   {regression}")
+            exit(1)
+        print("✅ No performance regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import pytest
+import json
+import sys
+import os
+import tarfile
+import joblib
+from botocore.exceptions import ClientError
+from sklearn.ensemble import RandomForestClassifier
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src import aws_clients
+from src.aws_clients import clear_clients, get_client
+from src.data.generate_data import generate_synthetic_data
+from src.local_backend import LocalS3, LocalSageMakerRuntime, deploy_local_endpoint
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv('MLOPS_AWS_BACKEND', 'local')
+    monkeypatch.setenv('MLOPS_LOCAL_ROOT', str(tmp_path))
+    clear_clients()
+    yield tmp_path
+    clear_clients()
+
+
+def test_clients_are_shared_and_pooled(monkeypatch):
+    monkeypatch.setenv('MLOPS_AWS_BACKEND', 'aws')
+    clear_clients()
+    try:
+        s3 = get_client('s3', 'us-east-1')
+        assert get_client('s3', 'us-east-1') is s3
+        assert get_client('s3', 'eu-west-1') is not s3
+        assert s3.meta.config.retries['mode'] == 'adaptive'
+
+        # A caller needing a bigger pool gets a rebuilt client that then serves everyone
+        pooled = get_client('s3', 'us-east-1', max_pool_connections=32)
+        assert pooled is not s3
+        assert pooled.meta.config.max_pool_connections == 32
+        assert get_client('s3', 'us-east-1') is pooled
+        assert len(aws_clients._sessions) == 2
+    finally:
+        clear_clients()
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv('MLOPS_AWS_BACKEND', 'moto')
+    with pytest.raises(ValueError):
+        get_client('s3')
+
+
+def test_local_s3_round_trip_and_listing(local_backend):
+    s3 = get_client('s3')
+    assert isinstance(s3, LocalS3)
+
+    for hour in ['00', '01', '02']:
+        for i in range(3):
+            s3.put_object(Bucket='bucket', Key=f'capture/2024/01/01/{hour}/{i}.jsonl', Body=f'{hour}-{i}\n')
+    s3.put_object(Bucket='bucket', Key='other/file.txt', Body=b'x')
+
+    body = s3.get_object(Bucket='bucket', Key='capture/2024/01/01/01/2.jsonl')['Body']
+    assert list(body.iter_lines()) == [b'01-2']
+    assert s3.head_object(Bucket='bucket', Key='other/file.txt')['ContentLength'] == 1
+    with pytest.raises(ClientError) as missing:
+        s3.get_object(Bucket='bucket', Key='capture/missing.jsonl')
+    assert missing.value.response['Error']['Code'] == 'NoSuchKey'
+
+    paginator = s3.get_paginator('list_objects_v2')
+    pages = list(paginator.paginate(Bucket='bucket', Prefix='capture/', StartAfter='capture/2024/01/01/00/2.jsonl',
+                                    MaxKeys=4))
+    keys = [obj['Key'] for page in pages for obj in page['Contents']]
+    assert len(pages) == 2
+    assert keys == [f'capture/2024/01/01/{hour}/{i}.jsonl' for hour in ['01', '02'] for i in range(3)]
+
+    hours = s3.list_objects_v2(Bucket='bucket', Prefix='capture/2024/01/01/', Delimiter='/')
+    assert [p['Prefix'] for p in hours['CommonPrefixes']] == [f'capture/2024/01/01/{h}/' for h in ['00', '01', '02']]
+
+    s3.copy({'Bucket': 'bucket', 'Key': 'other/file.txt'}, 'bucket', 'other/copy.txt')
+    s3.delete_objects(Bucket='bucket', Delete={'Objects': [{'Key': 'other/file.txt'}]})
+    assert [obj['Key'] for obj in s3.list_objects_v2(Bucket='bucket', Prefix='other/')['Contents']] == ['other/copy.txt']
+
+
+def test_local_runtime_serves_inference_handlers(local_backend):
+    train_df, test_df = generate_synthetic_data(n_samples=500)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(train_df.drop('target', axis=1), train_df['target'])
+    model_dir = local_backend / 'artifact'
+    model_dir.mkdir()
+    joblib.dump(model, model_dir / 'model.pkl')
+    deploy_local_endpoint('local-endpoint', str(model_dir))
+
+    runtime = get_client('sagemaker-runtime')
+    assert isinstance(runtime, LocalSageMakerRuntime)
+    response = runtime.invoke_endpoint(EndpointName='local-endpoint', ContentType='text/csv',
+                                       Body=test_df.drop('target', axis=1).head(3).to_csv(index=False))
+    result = json.loads(response['Body'].read())
+
+    assert len(result['predictions']) == 3
+    assert get_client('sagemaker').describe_endpoint(EndpointName='local-endpoint')['EndpointStatus'] == 'InService'
+    with pytest.raises(ClientError):
+        runtime.invoke_endpoint(EndpointName='local-endpoint', ContentType='application/json', Body='{}')
+    with pytest.raises(ValueError):
+        get_client('dynamodb')
+
+
+def test_local_s3_lists_objects_named_like_temp_files(local_backend):
+    s3 = get_client('s3')
+    s3.put_object(Bucket='bucket', Key='data/tmp_features.csv', Body=b'x')
+    s3.put_object(Bucket='bucket', Key='data/train.csv', Body=b'y')
+    (local_backend / 's3' / 'bucket' / 'data' / '.mlops-tmp-abc').write_bytes(b'partial')
+
+    keys = [obj['Key'] for obj in s3.list_objects_v2(Bucket='bucket', Prefix='data/')['Contents']]
+    assert keys == ['data/tmp_features.csv', 'data/train.csv']
+
+
+def test_local_sagemaker_control_plane(local_backend):
+    train_df, test_df = generate_synthetic_data(n_samples=500)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(train_df.drop('target', axis=1), train_df['target'])
+    joblib.dump(model, local_backend / 'model.pkl')
+    with tarfile.open(local_backend / 'model.tar.gz', 'w:gz') as tar:
+        tar.add(local_backend / 'model.pkl', arcname='model.pkl')
+    s3 = get_client('s3')
+    s3.upload_file(str(local_backend / 'model.tar.gz'), 'bucket', 'models/model.tar.gz')
+
+    sagemaker = get_client('sagemaker')
+    for version in ['1', '2']:
+        sagemaker.create_model(ModelName=f'mlops-model-{version}',
+                               PrimaryContainer={'Image': 'sklearn',
+                                                 'ModelDataUrl': 's3://bucket/models/model.tar.gz'})
+        sagemaker.create_endpoint_config(EndpointConfigName=f'mlops-endpoint-config-{version}',
+                                         ProductionVariants=[{'VariantName': 'primary',
+                                                              'ModelName': f'mlops-model-{version}'}])
+    sagemaker.create_endpoint(EndpointName='mlops-endpoint', EndpointConfigName='mlops-endpoint-config-1')
+    with pytest.raises(sagemaker.exceptions.ClientError):
+        sagemaker.create_endpoint(EndpointName='mlops-endpoint', EndpointConfigName='mlops-endpoint-config-1')
+
+    runtime = get_client('sagemaker-runtime')
+    body = test_df.drop('target', axis=1).head(2).to_csv(index=False)
+    assert len(json.loads(runtime.invoke_endpoint(EndpointName='mlops-endpoint', Body=body)['Body'].read())
+               ['predictions']) == 2
+
+    sagemaker.update_endpoint(EndpointName='mlops-endpoint', EndpointConfigName='mlops-endpoint-config-2')
+    endpoint = sagemaker.describe_endpoint(EndpointName='mlops-endpoint')
+    assert endpoint['EndpointConfigName'] == 'mlops-endpoint-config-2'
+    assert endpoint['EndpointStatus'] == 'InService'
+
+    pages = list(sagemaker.get_paginator('list_models').paginate(NameContains='mlops-model', MaxResults=1))
+    assert [m['ModelName'] for page in pages for m in page['Models']] == ['mlops-model-1', 'mlops-model-2']
+    assert [e['EndpointName'] for e in sagemaker.list_endpoints()['Endpoints']] == ['mlops-endpoint']
+
+    sagemaker.delete_endpoint(EndpointName='mlops-endpoint')
+    sagemaker.get_waiter('endpoint_deleted').wait(EndpointName='mlops-endpoint')
+    with pytest.raises(ClientError):
+        sagemaker.describe_endpoint(EndpointName='mlops-endpoint')
+    with pytest.raises(ClientError):
+        runtime.invoke_endpoint(EndpointName='mlops-endpoint', Body=body)
+    sagemaker.delete_endpoint_config(EndpointConfigName='mlops-endpoint-config-1')
+    sagemaker.delete_model(ModelName='mlops-model-1')
+    assert [c['EndpointConfigName'] for c in sagemaker.list_endpoint_configs()['EndpointConfigs']] == \
+        ['mlops-endpoint-config-2']
+
+
+def test_local_cloudwatch_and_sns(local_backend):
+    metrics = get_client('cloudwatch').get_metric_data(
+        MetricDataQueries=[{'Id': 'm0', 'MetricStat': {}}], StartTime=None, EndTime=None)
+    assert metrics['MetricDataResults'] == [
+        {'Id': 'm0', 'Label': 'm0', 'Timestamps': [], 'Values': [], 'StatusCode': 'Complete'}]
+
+    get_client('sns').publish(TopicArn='arn:aws:sns:us-east-1:000000000000:alerts', Subject='s', Message='hi')
+    lines = (local_backend / 'sns' / 'alerts.jsonl').read_text().splitlines()
+    assert [json.loads(line)['Message'] for line in lines] == ['hi']
@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'benchmarks'))
+from src.data.generate_data import generate_synthetic_data
+from run_benchmarks import BASELINE_PATH, compare_results, csv_payload, measure
+
+
+def make_results(**benchmarks):
+    return {'benchmarks': {
+        name: {'throughput': throughput, 'peak_memory_mb': memory, 'seconds': 1 / throughput, 'unit': 'rows/s'}
+        for name, (throughput, memory) in benchmarks.items()
+    }}
+
+
+def test_compare_flags_throughput_and_memory_regressions():
+    baseline = make_results(fast=(1000.0, 50.0), lean=(1000.0, 50.0), tiny=(1000.0, 0.1), gone=(1.0, 1.0))
+    current = make_results(fast=(700.0, 50.0), lean=(1100.0, 70.0), tiny=(1000.0, 0.5), new=(1.0, 1.0))
+
+    comparison = compare_results(baseline, current, tolerance=0.25, memory_tolerance=0.25)
+
+    assert comparison['regressions'] == ['fast: throughput -30.0%', 'lean: peak memory +40.0%']
+    assert not comparison['passed']
+    # Growth under the noise floor does not count
+    assert not comparison['benchmarks']['tiny']['regressed']
+    assert comparison['missing'] == ['gone']
+    assert compare_results(baseline, baseline)['passed']
+
+
+def test_measure_and_payloads():
+    features = generate_synthetic_data(n_samples=500)[0].drop('target', axis=1)
+    payload = csv_payload(features, 1050)
+    assert len(payload.splitlines()) == 1051
+    assert payload.splitlines()[401] == payload.splitlines()[1]
+
+    result = measure(lambda: sum(range(1000)), 1000, 'items/s', repeats=2)
+    assert result['throughput'] > 0
+    assert result['unit'] == 'items/s'
+
+
+def test_baseline_covers_every_benchmark():
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    names = set(baseline['benchmarks'])
+    for stage in ['input_fn', 'predict_fn', 'output_fn']:
+        for rows in [1, 100, 10_000, 1_000_000]:
+            assert f'inference/{stage}/rows={rows}' in names
+    assert {'inference/model_fn', 'data/generate_synthetic_data', 'monitoring/capture_parsing'} <= names
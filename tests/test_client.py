@@ -0,0 +1,87 @@
+import pytest
+import sys
+import os
+import threading
+import joblib
+import numpy as np
+from botocore.exceptions import ClientError
+from sklearn.ensemble import RandomForestClassifier
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.data.generate_data import generate_synthetic_data
+from src.inference.client import ENCODERS, EndpointClient, InvocationError
+from src.local_backend import LocalSageMakerRuntime, deploy_local_endpoint
+
+
+class FlakyRuntime:
+    """Fails the first attempt of every request body before passing retries to the local runtime"""
+
+    def __init__(self, runtime, error_code='ThrottlingException'):
+        self.runtime = runtime
+        self.error_code = error_code
+        self.bodies = []
+        self._lock = threading.Lock()
+
+    def invoke_endpoint(self, **kwargs):
+        with self._lock:
+            first_attempt = kwargs['Body'] not in self.bodies
+            self.bodies.append(kwargs['Body'])
+        if first_attempt:
+            raise ClientError({'Error': {'Code': self.error_code, 'Message': 'no'}}, 'InvokeEndpoint')
+        return self.runtime.invoke_endpoint(**kwargs)
+
+
+@pytest.fixture(scope='module')
+def local_endpoint(tmp_path_factory):
+    root = tmp_path_factory.mktemp('local')
+    train_df, test_df = generate_synthetic_data(n_samples=2500)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(train_df.drop('target', axis=1), train_df['target'])
+    joblib.dump(model, root / 'model.pkl')
+    deploy_local_endpoint('batch-endpoint', str(root), root=str(root))
+    return LocalSageMakerRuntime(str(root)), model, test_df.drop('target', axis=1)
+
+
+def test_encoders_are_lossless():
+    values = np.random.RandomState(0).randn(50, 4) * 1e3
+    for dtype in (np.float64, np.float32):
+        for name, encoder in ENCODERS.items():
+            text = encoder(values.astype(dtype), 'a,b,c,d\n')
+            decoded = np.loadtxt(text.splitlines()[1:], delimiter=',', dtype=dtype)
+            assert np.array_equal(decoded, values.astype(dtype)), (name, dtype)
+            # float32 bodies carry only the digits float32 needs
+            if dtype == np.float32:
+                assert len(text) < 0.75 * len(encoder(values, 'a,b,c,d\n')), name
+
+
+def test_large_input_is_split_and_reassembled_in_order(local_endpoint):
+    runtime, model, features = local_endpoint
+    flaky = FlakyRuntime(runtime)
+    client = EndpointClient('batch-endpoint', flaky, max_payload_bytes=20_000, concurrency=4, max_retries=2)
+
+    result = client.predict(features)
+
+    assert result.stats['chunks'] > 5
+    assert all(len(body) <= 20_000 for body in flaky.bodies)
+    np.testing.assert_array_equal(result.predictions, model.predict(features))
+    np.testing.assert_allclose(result.probabilities, model.predict_proba(features))
+    assert result.stats['retries'] == result.stats['requests']
+    assert result.stats['rows'] == len(features)
+    assert result.stats['rows_per_second'] > 0
+
+    # An ndarray without column names gets the training feature names
+    array_result = EndpointClient('batch-endpoint', runtime, max_payload_bytes=20_000).predict(features.to_numpy()[:10])
+    np.testing.assert_array_equal(array_result.predictions, result.predictions[:10])
+
+
+def test_non_retryable_errors_fail_the_call(local_endpoint):
+    runtime, _, features = local_endpoint
+    client = EndpointClient('batch-endpoint', FlakyRuntime(runtime, error_code='ValidationError'),
+                            max_payload_bytes=20_000)
+    with pytest.raises(InvocationError) as failed:
+        client.predict(features)
+    assert failed.value.error.response['Error']['Code'] == 'ValidationError'
+
+    with pytest.raises(InvocationError, match='single row'):
+        EndpointClient('batch-endpoint', runtime, max_payload_bytes=100).predict(features.head(2))
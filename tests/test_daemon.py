@@ -0,0 +1,76 @@
+import json
+import sys
+import os
+import threading
+import time
+import urllib.request
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.monitoring.daemon import MonitorDaemon
+from src.monitoring.mlops_monitor import MLOpsMonitor
+
+
+class FakeMonitor:
+    """Monitor stand-in whose capture analysis is slower than its timeout"""
+
+    endpoint_name = 'test-endpoint'
+    assess_health = MLOpsMonitor.assess_health
+
+    def __init__(self):
+        self.saved = []
+        self.capture_calls = 0
+        self.closed = False
+
+    def check_endpoint_health(self):
+        return {'endpoint_name': self.endpoint_name, 'healthy': True}
+
+    def get_endpoint_metrics(self):
+        return {'ModelLatency_p99': {'recent_value': 1000.0}}
+
+    def analyze_data_capture(self):
+        self.capture_calls += 1
+        time.sleep(0.5)
+        return {'files_analyzed': 1}
+
+    def save_report(self, report):
+        self.saved.append(report)
+
+    def compact_reports(self):
+        return {}
+
+    def close(self):
+        self.closed = True
+
+
+def test_daemon_runs_checks_and_serves_report():
+    monitor = FakeMonitor()
+    daemon = MonitorDaemon(monitor, port=0, schedule={
+        'endpoint_health': (0.05, 1),
+        'metrics': (0.05, 1),
+        'data_capture_analysis': (0.1, 0.2),
+        'save_report': (0.3, 1),
+    })
+    responses = {}
+
+    def query():
+        time.sleep(0.6)
+        for path in ('/report', '/timings'):
+            with urllib.request.urlopen(f'http://127.0.0.1:{daemon.port}{path}') as response:
+                responses[path] = json.loads(response.read())
+
+    client = threading.Thread(target=query)
+    client.start()
+    daemon.run(duration=1.0)
+    client.join()
+
+    checks = responses['/timings']['checks']
+    assert checks['endpoint_health']['runs'] > 5
+    assert checks['endpoint_health']['failures'] == 0
+    # The slow check times out and later ticks are skipped, not queued
+    assert checks['data_capture_analysis']['timeouts'] >= 1
+    assert checks['data_capture_analysis']['skipped'] >= 1
+    assert monitor.capture_calls <= 2
+    assert responses['/report']['overall_health']['status'] == 'healthy'
+    assert monitor.saved and 'daemon' in monitor.saved[0]
+    assert monitor.closed
@@ -0,0 +1,311 @@
+import pytest
+import json
+import sys
+import os
+import threading
+import time
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.aws_clients import clear_clients, get_client
+from src.data.generate_data import generate_synthetic_data
+from src.inference import deploy
+from src.inference.deploy import ModelDeployer
+from src.inference.latency_gate import LatencyRegressionError, compare_benchmarks
+from src.inference.sizing import recommend, serverless_config
+from src.models.registry import build_artifact
+
+
+class FakePaginator:
+    def __init__(self, items, result_key, name_key):
+        self.items = items
+        self.result_key = result_key
+        self.name_key = name_key
+        self.calls = []
+
+    def paginate(self, NameContains):
+        self.calls.append(NameContains)
+        names = [name for name in self.items if NameContains in name]
+        for i in range(0, len(names), 2):
+            yield {self.result_key: [{self.name_key: name} for name in names[i:i + 2]]}
+
+
+class FakeWaiter:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def wait(self, EndpointName):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+
+
+class FakeSageMaker:
+    """Endpoints whose deletion takes ``delay`` seconds to complete"""
+
+    def __init__(self, endpoints, models, delay=0.2):
+        self.endpoints = dict(endpoints)
+        self.models = set(models)
+        self.deleted_configs = []
+        self.waiter = FakeWaiter(delay)
+        self.waiters_created = 0
+        self.paginators = {}
+
+    def get_paginator(self, operation):
+        if operation == 'list_endpoints':
+            paginator = FakePaginator(sorted(self.endpoints), 'Endpoints', 'EndpointName')
+        else:
+            paginator = FakePaginator(sorted(self.models), 'Models', 'ModelName')
+        self.paginators[operation] = paginator
+        return paginator
+
+    def get_waiter(self, name):
+        self.waiters_created += 1
+        return self.waiter
+
+    def describe_endpoint(self, EndpointName):
+        return {'EndpointConfigName': f'{EndpointName}-config'}
+
+    def describe_endpoint_config(self, EndpointConfigName):
+        endpoint_name = EndpointConfigName[:-len('-config')]
+        return {'ProductionVariants': [{'ModelName': self.endpoints[endpoint_name]}]}
+
+    def delete_endpoint(self, EndpointName):
+        pass
+
+    def delete_endpoint_config(self, EndpointConfigName):
+        self.deleted_configs.append(EndpointConfigName)
+
+    def delete_model(self, ModelName):
+        self.models.remove(ModelName)
+
+
+def test_cleanup_deletes_endpoints_concurrently():
+    endpoints = {f'mlops-endpoint-{i}': f'mlops-endpoint-model-{i}' for i in range(6)}
+    endpoints['other-endpoint'] = 'other-model'
+    models = list(endpoints.values()) + ['mlops-endpoint-model-stale']
+    deployer = ModelDeployer('test-bucket', 'arn:aws:iam::123456789012:role/test')
+    deployer.sagemaker_client = FakeSageMaker(endpoints, models, delay=0.3)
+
+    summary = deployer._cleanup_existing_endpoints('mlops-endpoint')
+
+    client = deployer.sagemaker_client
+    assert sorted(summary['endpoints']) == [f'mlops-endpoint-{i}' for i in range(6)]
+    assert len(summary['endpoint_configs']) == 6
+    assert sorted(summary['models']) == sorted([f'mlops-endpoint-model-{i}' for i in range(6)]
+                                               + ['mlops-endpoint-model-stale'])
+    assert summary['errors'] == []
+    assert client.models == {'other-model'}
+    assert client.paginators['list_endpoints'].calls == ['mlops-endpoint']
+    # One shared waiter, and six 0.3s waits overlap instead of adding up
+    assert client.waiters_created == 1
+    assert client.waiter.calls == 6
+    assert summary['elapsed_seconds'] < 1.0
+
+
+def make_benchmark(peak_rss_mb, mean_ms, p99_ms, cold_start_seconds):
+    return {
+        'cold_start': {'peak_rss_mb': peak_rss_mb, 'cold_start_seconds': cold_start_seconds},
+        'sweep': [
+            {'concurrency': 1, 'mean_ms': mean_ms, 'p50_ms': mean_ms, 'p99_ms': p99_ms},
+            {'concurrency': 4, 'mean_ms': mean_ms * 3, 'p50_ms': mean_ms * 3, 'p99_ms': p99_ms * 3},
+        ],
+    }
+
+
+def test_sizing_recommendation_from_benchmark():
+    # 1.2 GB model, 50 ms per request, 4 s cold start, 100 req/s at p99 <= 200 ms
+    report = {'recommendation': recommend(make_benchmark(1200, 50, 80, 4.0), 100, 200, provision=True)}
+    recommendation = report['recommendation']
+
+    assert recommendation['MemorySizeInMB'] == 3072
+    assert recommendation['MaxConcurrency'] == 8
+    assert recommendation['ProvisionedConcurrency'] == 5
+    assert recommendation['warnings'] == []
+    assert serverless_config(report) == {'MemorySizeInMB': 3072, 'MaxConcurrency': 8,
+                                         'ProvisionedConcurrency': 5}
+
+    small = recommend(make_benchmark(100, 10, 300, 0.1), 1, 200)
+    assert small['MemorySizeInMB'] == 1024
+    assert small['MaxConcurrency'] == 1
+    assert small['ProvisionedConcurrency'] == 0
+    assert len(small['warnings']) == 1
+
+    # Provisioned concurrency is billed while idle, so it is only recommended on request
+    unprovisioned = recommend(make_benchmark(1200, 50, 80, 4.0), 100, 200)
+    assert unprovisioned['ProvisionedConcurrency'] == 0
+    assert '--provision would keep 5' in unprovisioned['warnings'][0]
+
+
+def test_sizing_needs_a_successful_single_request_level():
+    benchmark = make_benchmark(100, 10, 20, 0.1)
+    with pytest.raises(ValueError, match='concurrency 1'):
+        recommend({**benchmark, 'sweep': benchmark['sweep'][1:]}, 1, 200)
+
+    failed = {'concurrency': 1, 'mean_ms': None, 'p99_ms': None, 'first_error': 'boom'}
+    with pytest.raises(ValueError, match='boom'):
+        recommend({**benchmark, 'sweep': [failed]}, 1, 200)
+
+
+def test_deployer_uses_sizing_report(tmp_path):
+    report_path = tmp_path / 'sizing_report.json'
+    report_path.write_text('{"recommendation": {"MemorySizeInMB": 4096, "MaxConcurrency": 3, '
+                           '"ProvisionedConcurrency": 0}}')
+    sized = ModelDeployer('test-bucket', 'role', sizing_report=str(report_path))
+    unsized = ModelDeployer('test-bucket', 'role', sizing_report={})
+
+    assert sized._serverless_config() == {'MemorySizeInMB': 4096, 'MaxConcurrency': 3}
+    assert unsized._serverless_config() == {'MemorySizeInMB': 2048, 'MaxConcurrency': 1}
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[f's3://{Bucket}/{Key}'] = json.loads(Body)
+
+
+def test_latency_gate_flags_regressions_beyond_budget():
+    deployed = make_benchmark(200, 10, 20, 2.0)
+    deployed['sweep'][1]['throughput_rps'] = 300.0
+    deployed['sweep'][0]['throughput_rps'] = 100.0
+
+    # p99 worse by 12% stays within budget; p50 worse by 40% does not
+    candidate = make_benchmark(200, 14, 22.4, 2.1)
+    candidate['sweep'][1]['throughput_rps'] = 200.0
+    candidate['sweep'][0]['throughput_rps'] = 70.0
+
+    report = compare_benchmarks(deployed, candidate)
+
+    assert report['regressions'] == ['p50_ms', 'throughput_rps']
+    assert not report['passed']
+    assert report['metrics']['p99_ms']['change'] == pytest.approx(0.12)
+    assert compare_benchmarks(deployed, deployed)['passed']
+
+
+def test_latency_gate_reports_missing_levels_and_rejects_unknown_budgets():
+    deployed = make_benchmark(200, 10, 20, 2.0)
+    for level in deployed['sweep']:
+        level['throughput_rps'] = 100.0
+    candidate = {**deployed, 'sweep': deployed['sweep'][1:]}
+
+    report = compare_benchmarks(deployed, candidate)
+
+    assert not report['passed']
+    assert report['errors'] == ['candidate model: no concurrency-1 level in the benchmark sweep']
+    assert 'concurrency-1' in str(LatencyRegressionError(report))
+    with pytest.raises(ValueError, match='p95_ms'):
+        compare_benchmarks(deployed, deployed, {'p95_ms': [0.1, 1.0]})
+    with pytest.raises(ValueError, match='p95_ms'):
+        ModelDeployer('test-bucket', 'role', latency_budgets={'p95_ms': [0.1, 1.0]})
+    with pytest.raises(ValueError, match='relative, absolute'):
+        compare_benchmarks(deployed, deployed, {'p99_ms': 0.1})
+
+
+def test_deployer_refuses_slower_candidate(monkeypatch):
+    report = {'candidate': 's3://test-bucket/models/model.tar.gz', 'deployed': 's3://test-bucket/models/deployed/1/model.tar.gz',
+              'passed': False, 'regressions': ['p99_ms'],
+              'metrics': {'p99_ms': {'deployed': 20.0, 'candidate': 40.0, 'change': 1.0, 'regressed': True}}}
+    monkeypatch.setattr(deploy, 'run_latency_gate', lambda candidate, deployed, budgets: report)
+
+    enforcing = ModelDeployer('test-bucket', 'role', latency_gate='enforce')
+    enforcing.s3_client = FakeS3()
+    warning = ModelDeployer('test-bucket', 'role', latency_gate='warn')
+    warning.s3_client = FakeS3()
+
+    with pytest.raises(LatencyRegressionError):
+        enforcing._check_latency(report['candidate'], report['deployed'])
+    assert warning._check_latency(report['candidate'], report['deployed']) is report
+    # The comparison is stored next to the candidate artifact
+    assert list(enforcing.s3_client.objects) == ['s3://test-bucket/models/latency_gate_report.json']
+    assert enforcing._check_latency(report['candidate'], report['candidate']) is None
+
+
+class ServingSageMaker:
+    """An endpoint serving one model artifact; records any call that would change it"""
+
+    def __init__(self, model_data_url):
+        self.model_data_url = model_data_url
+        self.changes = []
+
+    def describe_endpoint(self, EndpointName):
+        return {'EndpointConfigName': 'mlops-endpoint-config-1', 'EndpointStatus': 'InService'}
+
+    def describe_endpoint_config(self, EndpointConfigName):
+        return {'ProductionVariants': [{'ModelName': 'mlops-model-1'}]}
+
+    def describe_model(self, ModelName):
+        return {'PrimaryContainer': {'ModelDataUrl': self.model_data_url}}
+
+    def __getattr__(self, name):
+        if name.startswith(('create_', 'update_')):
+            return lambda **kwargs: self.changes.append(name)
+        raise AttributeError(name)
+
+
+class FakeRegistry:
+    def __init__(self, manifest):
+        self._manifest = manifest
+
+    def latest(self):
+        return self._manifest
+
+
+def test_deployer_skips_unchanged_artifact(monkeypatch):
+    digest = 'ab' * 32
+    artifact = f's3://test-bucket/models/artifacts/{digest}/model.tar.gz'
+    deployer = ModelDeployer('test-bucket', 'role', latency_gate='off')
+    deployer.registry = FakeRegistry({'hash': digest, 'artifact': artifact})
+    deployer.sagemaker_client = ServingSageMaker(artifact)
+
+    assert deployer.deploy_serverless() == 'mlops-endpoint'
+    assert deployer.sagemaker_client.changes == []
+
+    # A different artifact, or a forced deploy, goes through the update
+    monkeypatch.setattr(deploy.image_uris, 'retrieve', lambda **kwargs: 'image')
+    monkeypatch.setattr(deployer, '_serverless_config', lambda: {'MemorySizeInMB': 2048, 'MaxConcurrency': 1})
+    deployer.deploy_serverless(force=True)
+    assert deployer.sagemaker_client.changes == ['create_model', 'create_endpoint_config', 'update_endpoint']
+
+
+def test_deployer_takes_an_explicit_artifact_without_a_manifest():
+    artifact = f"s3://test-bucket/models/artifacts/{'cd' * 32}/model.tar.gz"
+    deployer = ModelDeployer('test-bucket', 'role', latency_gate='off')
+    deployer.registry = FakeRegistry(None)
+    deployer.sagemaker_client = ServingSageMaker(artifact)
+
+    with pytest.raises(RuntimeError, match='MODEL_S3_PATH'):
+        deployer.deploy_serverless()
+    assert deployer.deploy_serverless(artifact) == 'mlops-endpoint'
+    assert deployer.sagemaker_client.changes == []
+
+
+def test_deployer_creates_a_missing_endpoint_on_the_local_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv('MLOPS_AWS_BACKEND', 'local')
+    monkeypatch.setenv('MLOPS_LOCAL_ROOT', str(tmp_path))
+    monkeypatch.setattr(deploy.image_uris, 'retrieve', lambda **kwargs: 'image')
+    clear_clients()
+    try:
+        train_df, test_df = generate_synthetic_data(n_samples=300)
+        model = RandomForestClassifier(n_estimators=5, random_state=42)
+        model.fit(train_df.drop('target', axis=1), train_df['target'])
+        joblib.dump(model, tmp_path / 'model.pkl')
+        build_artifact({'model.pkl': str(tmp_path / 'model.pkl')}, str(tmp_path / 'model.tar.gz'))
+
+        deployer = ModelDeployer('bucket', 'role', latency_gate='off')
+        deployer.registry.register(str(tmp_path / 'model.tar.gz'))
+        assert deployer.deploy_serverless() == 'mlops-endpoint'
+
+        endpoint = get_client('sagemaker').describe_endpoint(EndpointName='mlops-endpoint')
+        assert endpoint['EndpointStatus'] == 'InService'
+        response = get_client('sagemaker-runtime').invoke_endpoint(
+            EndpointName='mlops-endpoint', ContentType='text/csv',
+            Body=test_df.drop('target', axis=1).head(2).to_csv(index=False))
+        assert len(json.loads(response['Body'].read())['predictions']) == 2
+    finally:
+        clear_clients()
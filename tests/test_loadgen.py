@@ -0,0 +1,80 @@
+import pytest
+import sys
+import os
+import threading
+import time
+import numpy as np
+from botocore.exceptions import ClientError
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.inference.loadgen import LatencyHistogram, run_load_test
+
+
+class SleepyTarget:
+    """Responds after ``delay`` seconds; the first call is a slow cold start, every ``fail_every``-th call is throttled"""
+
+    def __init__(self, delay, cold_start=0.0, fail_every=None):
+        self.delay = delay
+        self.cold_start = cold_start
+        self.fail_every = fail_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, body):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.cold_start if call == 1 else self.delay)
+        if self.fail_every and call % self.fail_every == 0:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'InvokeEndpoint')
+        return b'{}'
+
+
+def test_histogram_percentiles_match_exact_values():
+    rng = np.random.RandomState(0)
+    latencies = rng.lognormal(mean=3, sigma=0.8, size=20000)
+    histogram = LatencyHistogram()
+    halves = LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(latencies):
+        histogram.record(value)
+        halves[i % 2].record(value)
+    halves[0].merge(halves[1])
+
+    ordered = np.sort(latencies)
+    for q in [50, 90, 99, 99.9]:
+        # Within one 1% bucket of the nearest-rank percentile
+        exact = ordered[int(np.ceil(q / 100 * len(ordered))) - 1]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.011)
+        assert halves[0].percentile(q) == histogram.percentile(q)
+    assert histogram.percentile(100) == latencies.max()
+    assert sum(count for _, count in histogram.buckets()) == len(latencies)
+    assert LatencyHistogram().summary()['p99_ms'] is None
+
+
+def test_closed_loop_throughput_and_cold_start():
+    target = SleepyTarget(delay=0.01, cold_start=0.3)
+    report = run_load_test(target, ['a', 'b'], mode='closed', concurrency=4, duration_seconds=0.5,
+                           warmup_requests=2, cold_start_ms=200)
+
+    # The cold start lands in warm-up, not in the measured histogram
+    assert report['warmup']['first_request_ms'] >= 300
+    assert report['cold_starts']['count'] == 0
+    assert report['latency']['p50_ms'] == pytest.approx(10, abs=5)
+    # Four clients waiting 10 ms each: about 400 req/s
+    assert 200 < report['throughput_rps'] < 420
+    assert report['error_rate'] == 0
+
+
+def test_open_loop_rate_errors_and_cold_starts():
+    target = SleepyTarget(delay=0.005, cold_start=0.25, fail_every=10)
+    report = run_load_test(target, ['a'], mode='open', rps=100, duration_seconds=0.5, concurrency=4,
+                           warmup_requests=0, cold_start_ms=200)
+
+    assert report['requests'] == 50
+    assert report['errors'] == {'ThrottlingException': 5}
+    assert report['error_rate'] == pytest.approx(0.1)
+    assert report['cold_starts']['count'] == 1
+    assert report['latency']['count'] == 44
+    with pytest.raises(ValueError):
+        run_load_test(target, ['a'], mode='burst')
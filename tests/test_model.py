@@ -1,8 +1,10 @@
 import pytest
 import pandas as pd
 import numpy as np
+import joblib
 import sys
 import os
+import warnings
 from sklearn.ensemble import RandomForestClassifier
 
 # Add project root to path
@@ -48,4 +50,149 @@ def test_feature_consistency():
     test_features = set(test_df.columns) - {'target'}
     
     assert train_features == test_features
-    assert len(train_features) == 20  # Expected number of features
\ No newline at end of file
+    assert len(train_features) == 20  # Expected number of features
+
+
+def test_float32_features_give_identical_models():
+    """Trees cast features to float32, so float32 data trains and predicts exactly like float64"""
+    train32, test32 = generate_synthetic_data(n_samples=1000, dtype='float32')
+    train64, test64 = generate_synthetic_data(n_samples=1000, dtype='float64')
+    X32, X64 = train32.drop('target', axis=1), train64.drop('target', axis=1)
+
+    assert (X32.dtypes == np.float32).all()
+    assert train32['target'].dtype == train64['target'].dtype
+    assert X32.memory_usage(index=False).sum() * 2 == X64.memory_usage(index=False).sum()
+
+    model32 = RandomForestClassifier(n_estimators=10, random_state=42).fit(X32, train32['target'])
+    model64 = RandomForestClassifier(n_estimators=10, random_state=42).fit(X64, train64['target'])
+    X_test32, X_test64 = test32.drop('target', axis=1), test64.drop('target', axis=1)
+    for model in (model32, model64):
+        np.testing.assert_array_equal(model.predict(X_test32), model64.predict(X_test64))
+        np.testing.assert_array_equal(model.predict_proba(X_test32), model64.predict_proba(X_test64))
+
+
+def test_float32_csv_round_trip(tmp_path):
+    from src.inference import inference
+    from src.models.features import read_training_csv
+
+    train_df, _ = generate_synthetic_data(n_samples=500)
+    path = tmp_path / 'train.csv'
+    train_df.to_csv(path, index=False)
+
+    restored = read_training_csv(str(path))
+    pd.testing.assert_frame_equal(restored, train_df.reset_index(drop=True))
+    float64_csv = generate_synthetic_data(n_samples=500, dtype='float64')[0].to_csv(index=False)
+    assert len(path.read_bytes()) < 0.6 * len(float64_csv)
+
+    features = train_df.drop('target', axis=1)
+    parsed = inference.input_fn(features.to_csv(index=False), 'text/csv')
+    assert parsed.values.dtype == np.float32
+    np.testing.assert_array_equal(parsed.values, features.to_numpy())
+
+    with pytest.raises(ValueError, match='Unsupported feature dtype'):
+        read_training_csv(str(path), 'float16')
+
+
+def test_inference_parses_plain_csv_without_pandas(tmp_path):
+    from src.inference import inference
+
+    train_df, test_df = generate_synthetic_data(n_samples=1000)
+    features = test_df.drop('target', axis=1)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(train_df.drop('target', axis=1), train_df['target'])
+    payload = features.to_csv(index=False)
+
+    rows = inference.input_fn(payload.replace('\n', '\r\n').encode(), 'text/csv')
+    assert isinstance(rows, inference.CSVRows)
+    np.testing.assert_array_equal(rows.values, features.to_numpy())
+    assert inference.predict_fn(rows, model) == inference.predict_fn(features, model)
+
+    # Anything the NumPy path cannot take exactly goes through pandas
+    header, first_row, rest = payload.split('\n', 2)
+    missing = '\n'.join([header, ',' + first_row.split(',', 1)[1], rest])
+    for body in [missing, payload.replace('feature_0', '"feature_0"'), payload.replace('\n', ',1\n', 2)]:
+        assert isinstance(inference.input_fn(body, 'text/csv'), pd.DataFrame)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(inference, 'NUMPY_PARSE_MAX_BYTES', 100)
+        assert isinstance(inference.input_fn(payload, 'text/csv'), pd.DataFrame)
+
+    # Both paths reorder shuffled columns by name
+    reordered = features.iloc[:, ::-1]
+    assert isinstance(inference.input_fn(reordered.to_csv(index=False), 'text/csv'), inference.CSVRows)
+    assert inference.predict_fn(inference.input_fn(reordered.to_csv(index=False), 'text/csv'), model) == \
+        inference.predict_fn(features, model)
+    assert inference.predict_fn(reordered, model) == inference.predict_fn(features, model)
+
+    # Other columns reach sklearn's own check on either path
+    renamed = features.rename(columns={'feature_0': 'unknown'})
+    outcomes = []
+    for request in [inference.input_fn(renamed.to_csv(index=False), 'text/csv'), renamed]:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                outcomes.append(inference.predict_fn(request, model))
+        except ValueError as e:
+            outcomes.append(str(e))
+    assert outcomes[0] == outcomes[1]
+
+
+def test_startup_profile_reports_imports_by_phase(tmp_path):
+    from src.inference.profile_startup import import_breakdown, parse_importtime, profile_once
+
+    entries = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 | site\n"
+        "startup-phase: model_fn\n"
+        "import time:      2000 |       2000 |   pandas.core\n"
+        "import time:       500 |       2500 | pandas\n"
+    )
+    assert [(e['module'], e['depth'], e['phase']) for e in entries] == [
+        ('site', 0, 'interpreter'), ('pandas.core', 1, 'model_fn'), ('pandas', 0, 'model_fn')]
+    breakdown = import_breakdown(entries)
+    assert breakdown['by_package'][0] == {'package': 'pandas', 'seconds': 0.0025, 'modules': 2, 'first_phase': 'model_fn'}
+    assert breakdown['slowest'][0]['module'] == 'pandas'
+    assert breakdown['watched']['sklearn'] is None
+
+    train_df, _ = generate_synthetic_data(n_samples=500)
+    model = RandomForestClassifier(n_estimators=2, random_state=42)
+    joblib.dump(model.fit(train_df.drop('target', axis=1), train_df['target']), tmp_path / 'model.pkl')
+    (tmp_path / 'payload.csv').write_text(train_df.drop('target', axis=1).head(1).to_csv(index=False))
+
+    report = profile_once(str(tmp_path), str(tmp_path / 'payload.csv'))
+
+    assert report['time_to_first_prediction_seconds'] >= sum(report['phases'].values())
+    # The handler module itself loads neither pandas nor joblib
+    assert report['imports']['watched']['numpy'] == 'import_handler'
+    assert report['imports']['watched']['joblib'] == 'model_fn'
+    assert report['imports']['watched']['pandas'] != 'import_handler'
+
+
+def test_binned_training_mode_packs_bin_edges_into_the_model(tmp_path):
+    from src.models.binning import bin_features, compare_training_modes, fit_model
+    from src.inference import inference
+
+    train_df, test_df = generate_synthetic_data(n_samples=2000)
+    X_train, y_train = train_df.drop('target', axis=1), train_df['target']
+    X_test, y_test = test_df.drop('target', axis=1), test_df['target']
+
+    model = fit_model(X_train, y_train, 'binned', n_bins=32, n_estimators=10, random_state=42)
+    binner = model.named_steps['bins']
+    codes = bin_features(binner, X_train)
+    assert codes.dtype == np.uint8 and codes.max() == 31
+    np.testing.assert_array_equal(codes, binner.transform(X_train))
+    assert bin_features(binner, X_train, np.float32).dtype == np.float32
+    assert (model.predict(X_test) == y_test).mean() > 0.85
+
+    # The served artifact bins request rows with the learned edges, even beyond the training range
+    joblib.dump(model, tmp_path / 'model.pkl')
+    served = inference.model_fn(str(tmp_path))
+    extreme = X_test.head(3) * 1000
+    for rows in [X_test, extreme]:
+        prediction = inference.predict_fn(inference.input_fn(rows.to_csv(index=False), 'text/csv'), served)
+        assert prediction['predictions'] == model.predict(rows).tolist()
+
+    results = compare_training_modes(X_train, y_train, X_test, y_test, n_bins=32, n_estimators=5, random_state=42)
+    assert set(results) == {'exact', 'binned'}
+    assert all(result['fit_seconds'] > 0 and result['accuracy'] > 0.8 for result in results.values())
+    with pytest.raises(ValueError, match='n_bins'):
+        fit_model(X_train, y_train, 'binned', n_bins=300)
@@ -0,0 +1,635 @@
+import pytest
+import base64
+import json
+import numpy as np
+import sys
+import os
+from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.monitoring.mlops_monitor import (
+    CaptureFile, MLOpsMonitor, capture_hour_prefixes, summarize_capture_file
+)
+from src.monitoring.decoder import decode_csv_payloads, decode_json_outputs
+from src.monitoring.checkpoint import RunningStats, capture_key_hour
+from src.monitoring.drift import DriftHistogram, compute_drift, prepare_baseline
+from src.monitoring.predictions import PredictionHistogram, compute_prediction_drift
+from src.monitoring.report_store import ReportStore
+from src.monitoring.sketch import CaptureSketch, KLLSketch
+from src.models.baseline import build_feature_baseline, build_prediction_baseline
+
+
+class FakeBody:
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+    def iter_lines(self):
+        for line in self.content.split(b'\n'):
+            yield line
+
+
+class FakePaginator:
+    def __init__(self, objects, page_size):
+        self.objects = objects
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix, StartAfter='', Delimiter=None, **kwargs):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix) and k > StartAfter)
+        if Delimiter:
+            common = sorted({Prefix + k[len(Prefix):].split(Delimiter, 1)[0] + Delimiter
+                             for k in keys if Delimiter in k[len(Prefix):]})
+            yield {'CommonPrefixes': [{'Prefix': p} for p in common]}
+            return
+        for i in range(0, len(keys), self.page_size):
+            yield {'Contents': [{'Key': k} for k in keys[i:i + self.page_size]]}
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 calls used by the monitor"""
+
+    def __init__(self, objects=None, page_size=2):
+        self.objects = dict(objects or {})
+        self.page_size = page_size
+
+    def get_paginator(self, name):
+        return FakePaginator(self.objects, self.page_size)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        return {'Body': FakeBody(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.encode()
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+
+
+def capture_line(csv_payload, output=None):
+    record = {'captureData': {'endpointInput': {'data': csv_payload, 'encoding': 'CSV'}}}
+    if output is not None:
+        record['captureData']['endpointOutput'] = {'data': output, 'encoding': 'JSON'}
+    return json.dumps(record)
+
+
+def make_monitor(objects=None):
+    monitor = MLOpsMonitor('test-endpoint', 'test-bucket', max_workers=4, summary_workers=0)
+    monitor.s3 = FakeS3(objects)
+    monitor.checkpoint_store.s3 = monitor.s3
+    monitor.report_store.s3 = monitor.s3
+    monitor.sketch_store.s3 = monitor.s3
+    return monitor
+
+
+def test_capture_hour_prefixes():
+    prefixes = capture_hour_prefixes('ep', datetime(2024, 1, 1, 22, 30), datetime(2024, 1, 2, 1, 5))
+
+    assert prefixes == [
+        'data-capture/ep/primary/2024/01/01/22/',
+        'data-capture/ep/primary/2024/01/01/23/',
+        'data-capture/ep/primary/2024/01/02/00/',
+        'data-capture/ep/primary/2024/01/02/01/',
+    ]
+
+
+def test_analyze_data_capture_reads_all_pages():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    payload = 'a,b\n1.0,2.0\n'
+    objects = {
+        f'data-capture/test-endpoint/primary/{hour}/file-{i:02d}.jsonl':
+            '\n'.join(capture_line(payload, '{"predictions": [1]}') for _ in range(3)).encode()
+        for i in range(25)
+    }
+    # Objects outside the requested window must not be read
+    objects['data-capture/test-endpoint/primary/2001/01/01/00/old.jsonl'] = capture_line(payload).encode()
+
+    analysis = make_monitor(objects).analyze_data_capture(hours_back=1)
+
+    assert analysis['files_analyzed'] == 25
+    assert analysis['total_recent_files'] == 25
+    assert analysis['input_samples'] == 75
+    assert analysis['output_samples'] == 75
+
+
+def test_analyze_data_capture_without_files():
+    analysis = make_monitor().analyze_data_capture(hours_back=1)
+
+    assert analysis['files_analyzed'] == 0
+
+
+def test_running_stats_merge_matches_full_pass():
+    rng = np.random.RandomState(0)
+    data = rng.randn(1000, 5) * 3 + 1
+
+    stats = RunningStats()
+    for chunk in np.array_split(data, 7):
+        partial = RunningStats()
+        partial.update(chunk)
+        stats.merge(partial)
+    restored = RunningStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+
+    assert restored.count == 1000
+    np.testing.assert_allclose(restored.mean, data.mean(axis=0))
+    np.testing.assert_allclose(restored.std, data.std(axis=0, ddof=1))
+    np.testing.assert_allclose(restored.min, data.min(axis=0))
+    np.testing.assert_allclose(restored.max, data.max(axis=0))
+
+
+def test_running_stats_accumulates_float32_in_float64_blocks(monkeypatch):
+    import src.monitoring.checkpoint as checkpoint
+    monkeypatch.setattr(checkpoint, 'STATS_BLOCK_ROWS', 128)
+    data = (np.random.RandomState(1).randn(1000, 4) * 50 + 1e3).astype(np.float32)
+
+    stats32 = RunningStats()
+    stats32.update(data)
+    stats64 = RunningStats()
+    stats64.update(data.astype(np.float64))
+
+    assert stats32.mean.dtype == np.float64
+    np.testing.assert_allclose(stats32.mean, stats64.mean, rtol=1e-12)
+    np.testing.assert_allclose(stats32.std, stats64.std, rtol=1e-9)
+    np.testing.assert_array_equal(stats32.min, stats64.min)
+    np.testing.assert_array_equal(stats32.max, stats64.max)
+
+
+def test_capture_key_hour():
+    assert capture_key_hour('data-capture/ep/primary/2024/03/05/17/01-02-003-abc.jsonl') == '2024-03-05T17'
+    assert capture_key_hour('data-capture/other.jsonl') is None
+
+
+def test_analyze_data_capture_is_incremental():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    prefix = f'data-capture/test-endpoint/primary/{hour}'
+    monitor = make_monitor({
+        f'{prefix}/file-00.jsonl': capture_line('a,b\n1.0,2.0\n3.0,4.0\n').encode(),
+    })
+
+    first = monitor.analyze_data_capture(hours_back=1)
+    monitor.s3.objects[f'{prefix}/file-01.jsonl'] = capture_line('a,b\n5.0,6.0\n').encode()
+    second = monitor.analyze_data_capture(hours_back=1)
+    third = monitor.analyze_data_capture(hours_back=1)
+
+    assert first['files_analyzed'] == 1
+    assert second['files_analyzed'] == 1
+    assert third['files_analyzed'] == 0
+    assert third['checkpoint']['last_key'] == f'{prefix}/file-01.jsonl'
+    window = third['rolling_windows']['last_1h']
+    assert window['count'] == 3
+    assert window['mean_values'] == pytest.approx([3.0, 4.0])
+    assert window['max_values'] == [5.0, 6.0]
+
+
+def test_analyze_data_capture_retries_failures_and_late_files():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    prefix = f'data-capture/test-endpoint/primary/{hour}'
+    monitor = make_monitor({
+        f'{prefix}/file-00.jsonl': b'not json',
+        f'{prefix}/file-02.jsonl': capture_line('a,b\n1.0,2.0\n').encode(),
+    })
+
+    first = monitor.analyze_data_capture(hours_back=1)
+    # The broken file is fixed and a file that sorts before the newest key lands late
+    monitor.s3.objects[f'{prefix}/file-00.jsonl'] = capture_line('a,b\n3.0,4.0\n').encode()
+    monitor.s3.objects[f'{prefix}/file-01.jsonl'] = capture_line('a,b\n5.0,6.0\n').encode()
+    second = monitor.analyze_data_capture(hours_back=1)
+    third = monitor.analyze_data_capture(hours_back=1)
+
+    assert first['files_analyzed'] == 1
+    assert first['checkpoint']['failed_keys'] == 1
+    assert second['files_analyzed'] == 2
+    assert second['checkpoint']['failed_keys'] == 0
+    assert third['files_analyzed'] == 0
+    assert third['checkpoint']['last_key'] == f'{prefix}/file-02.jsonl'
+    assert third['rolling_windows']['last_1h']['count'] == 3
+
+
+def test_analyze_data_capture_reads_late_files_in_earlier_hours():
+    now = datetime.utcnow()
+    prefix = 'data-capture/test-endpoint/primary'
+    earlier = f"{prefix}/{now - timedelta(hours=3):%Y/%m/%d/%H}"
+    current = f"{prefix}/{now:%Y/%m/%d/%H}"
+    monitor = make_monitor({
+        f'{earlier}/file-00.jsonl': capture_line('a,b\n1.0,2.0\n').encode(),
+        f'{current}/file-00.jsonl': capture_line('a,b\n3.0,4.0\n').encode(),
+    })
+
+    first = monitor.analyze_data_capture(hours_back=24)
+    # Uploaded after the checkpoint moved on to the current hour
+    monitor.s3.objects[f'{earlier}/file-01.jsonl'] = capture_line('a,b\n5.0,6.0\n').encode()
+    second = monitor.analyze_data_capture(hours_back=24)
+    third = monitor.analyze_data_capture(hours_back=24)
+
+    assert first['files_analyzed'] == 2
+    assert second['files_analyzed'] == 1
+    assert second['checkpoint']['late_files'] == 1
+    assert third['files_analyzed'] == 0
+    assert third['rolling_windows']['last_24h']['count'] == 3
+    assert monitor._checkpoint.seen_keys == {f'{earlier}/file-00.jsonl', f'{earlier}/file-01.jsonl',
+                                             f'{current}/file-00.jsonl'}
+
+
+def test_checkpoint_gives_up_on_files_that_keep_failing():
+    from src.monitoring.checkpoint import MonitorCheckpoint
+    checkpoint = MonitorCheckpoint()
+
+    assert checkpoint.advance(['h/01/b'], ['h/01/a'], max_attempts=2) == []
+    restored = MonitorCheckpoint.from_dict(json.loads(json.dumps(checkpoint.to_dict())))
+    assert restored.failed_keys == {'h/01/a': 1}
+    assert restored.advance([], ['h/01/a'], max_attempts=2) == ['h/01/a']
+    assert restored.failed_keys == {}
+    assert restored.seen_keys == {'h/01/a', 'h/01/b'}
+    restored.advance(['h/02/a'], [])
+    assert restored.last_key == 'h/02/a'
+    assert restored.seen_keys == {'h/02/a'}
+
+    # Capture keys are kept for the hours that can still receive late files
+    capture = 'data-capture/ep/primary/2024/01/01'
+    restored = MonitorCheckpoint()
+    restored.advance([f'{capture}/00/a', f'{capture}/05/a'], [], late_hours=4)
+    assert restored.seen_keys == {f'{capture}/05/a'}
+    restored.advance([f'{capture}/08/a'], [], late_hours=4)
+    assert restored.seen_keys == {f'{capture}/05/a', f'{capture}/08/a'}
+
+
+def drift_for(baseline, rows):
+    histogram = DriftHistogram.empty(baseline)
+    for chunk in np.array_split(rows, 4):
+        histogram.update(chunk, baseline)
+    return compute_drift(histogram, baseline)
+
+
+def test_drift_scores_against_training_baseline():
+    rng = np.random.RandomState(42)
+    names = [f'feature_{i}' for i in range(3)]
+    baseline = prepare_baseline(json.loads(json.dumps(
+        build_feature_baseline(rng.randn(20000, 3), names)
+    )))
+
+    same = drift_for(baseline, rng.randn(20000, 3))
+    shifted_rows = rng.randn(20000, 3)
+    shifted_rows[:, 1] += 1.0
+    shifted = drift_for(baseline, shifted_rows)
+
+    assert same['drift_score'] == 'low'
+    assert not same['drift_detected']
+    assert shifted['drift_detected']
+    assert shifted['drifted_features'] == ['feature_1']
+    assert shifted['features']['feature_1']['ks'] == pytest.approx(0.38, abs=0.03)
+    assert shifted['features']['feature_0']['severity'] == 'low'
+
+
+def test_float32_drift_counts_match_float64_exactly():
+    rng = np.random.RandomState(7)
+    baseline = prepare_baseline(json.loads(json.dumps(
+        build_feature_baseline(rng.randn(5000, 2), ['a', 'b'])
+    )))
+    # Values straddling every edge after rounding to float32
+    edges = np.concatenate([baseline['bin_edges'], baseline['quantile_values']], axis=1).T.astype(np.float32)
+    rows = np.concatenate([
+        edges, np.nextafter(edges, np.float32(np.inf)), np.nextafter(edges, np.float32(-np.inf)),
+        rng.randn(5000, 2).astype(np.float32)
+    ])
+
+    counts32 = DriftHistogram.empty(baseline)
+    counts32.update(rows, baseline)
+    counts64 = DriftHistogram.empty(baseline)
+    counts64.update(rows.astype(np.float64), baseline)
+
+    assert baseline['bin_edges_float32'].dtype == np.float32
+    assert counts32.to_dict() == counts64.to_dict()
+
+
+def test_drift_needs_enough_rows():
+    rng = np.random.RandomState(0)
+    baseline = prepare_baseline(build_feature_baseline(rng.randn(1000, 2), ['a', 'b']))
+
+    result = drift_for(baseline, rng.randn(20, 2) + 5)
+
+    assert result['drift_score'] == 'insufficient_data'
+    assert not result['drift_detected']
+
+
+def test_decode_csv_payloads_keeps_every_row():
+    payloads = [
+        'feature_0,feature_1\n1.0,2.0\n3.0,4.0\n',
+        base64.b64encode(b'feature_1,feature_0\n6.0,5.0\n').decode(),
+        '7.0,8.0',
+    ]
+
+    decoded = decode_csv_payloads(payloads, ['CSV', 'BASE64', 'CSV'], ['feature_0', 'feature_1'])
+
+    assert decoded.data.dtype == np.float32
+    assert decoded.rows_rejected == 0
+    assert sorted(decoded.data.tolist()) == [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0], [7.0, 8.0]]
+
+
+def test_decode_csv_payloads_counts_rejected_rows():
+    payloads = [
+        'feature_0,feature_1\n1.0,2.0\nbad,4.0\n5.0,6.0,7.0\n8.0\n',
+        'other,columns\n1.0,2.0\n',
+        '!!not base64!!',
+    ]
+
+    decoded = decode_csv_payloads(payloads, ['CSV', 'CSV', 'BASE64'], ['feature_0', 'feature_1'])
+
+    assert decoded.data.tolist() == [[1.0, 2.0]]
+    assert decoded.rows_decoded == 1
+    assert decoded.rows_rejected == 5
+
+
+def test_decode_csv_payloads_keeps_rows_after_a_malformed_first_row():
+    payloads = ['bad,2.0\n3.0,4.0\n\n', '\n5.0,6.0\n\n\n7.0,8.0\n']
+
+    decoded = decode_csv_payloads(payloads, None, ['feature_0', 'feature_1'])
+
+    assert decoded.data.tolist() == [[3.0, 4.0], [5.0, 6.0], [7.0, 8.0]]
+    assert decoded.rows_rejected == 1
+
+
+
+def test_decode_json_outputs_rejects_mismatched_outputs():
+    payloads = [
+        json.dumps({'predictions': [1, 0], 'probabilities': [[0.1, 0.9], [0.8, 0.2]]}),
+        base64.b64encode(json.dumps({'predictions': [1], 'probabilities': [[0.3, 0.7]]}).encode()).decode(),
+        json.dumps({'predictions': [0, 1], 'probabilities': [[0.6, 0.4]]}),
+        'not json',
+    ]
+
+    decoded = decode_json_outputs(payloads, ['JSON', 'BASE64', 'JSON', 'JSON'])
+
+    assert decoded.predictions.tolist() == [1, 0, 1]
+    assert decoded.probabilities == pytest.approx(np.array([[0.1, 0.9], [0.8, 0.2], [0.3, 0.7]]))
+    assert decoded.rows_rejected == 3
+
+
+def test_prediction_drift_against_test_set_distribution():
+    rng = np.random.RandomState(7)
+    positive = rng.beta(2, 2, size=5000)
+    baseline = {'predictions': json.loads(json.dumps(
+        build_prediction_baseline([0, 1], np.column_stack([1 - positive, positive]))
+    ))}
+
+    def histogram_for(p):
+        probabilities = np.column_stack([1 - p, p])
+        histogram = PredictionHistogram()
+        for chunk in np.array_split(np.arange(len(p)), 5):
+            histogram.update(probabilities[chunk].argmax(axis=1), probabilities[chunk])
+        return PredictionHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+
+    same = compute_prediction_drift(histogram_for(rng.beta(2, 2, size=5000)), baseline)
+    skewed = compute_prediction_drift(histogram_for(rng.beta(8, 1, size=5000)), baseline)
+
+    assert same['drift_score'] == 'low'
+    assert skewed['drift_detected']
+    assert skewed['class_balance']['1']['actual'] > 0.95
+    assert skewed['mean_confidence'] > same['mean_confidence']
+    assert skewed['mean_entropy'] < skewed['baseline_mean_entropy']
+
+
+def test_prediction_drift_feeds_overall_health():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    features = np.random.RandomState(0).randn(500, 2)
+    baseline = build_feature_baseline(features, ['a', 'b'])
+    baseline['predictions'] = build_prediction_baseline([0, 1], [[0.5, 0.5]] * 250 + [[0.4, 0.6]] * 250)
+    rows = '\n'.join(f'{x:.4f},{y:.4f}' for x, y in features)
+    # Every captured prediction is a confident class 1
+    output = json.dumps({'predictions': [1] * 500, 'probabilities': [[0.02, 0.98]] * 500})
+    monitor = make_monitor({
+        'models/baseline.json': json.dumps(baseline).encode(),
+        f'data-capture/test-endpoint/primary/{hour}/file.jsonl': capture_line(f'a,b\n{rows}', output).encode(),
+    })
+
+    analysis = monitor.analyze_data_capture(hours_back=1)
+    health = monitor.assess_health({'endpoint_health': {'healthy': True}, 'data_capture_analysis': analysis})
+
+    assert analysis['prediction_distribution']['last_1h']['class_balance'] == {'1': 1.0}
+    assert analysis['prediction_drift']['drift_detected']
+    assert analysis['drift_indicators']['drift_score'] == 'low'
+    assert not health['predictions_healthy']
+    assert health['status'] == 'unhealthy'
+
+
+class FakeCloudWatch:
+    """Returns GetMetricData results over two pages with unordered datapoints"""
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def get_metric_data(self, MetricDataQueries, **kwargs):
+        self.calls.append(kwargs)
+        now = datetime.utcnow()
+        page = 1 if 'NextToken' in kwargs else 0
+        results = []
+        for query in MetricDataQueries:
+            points = self.values.get(query['Label'], [])[page::2]
+            results.append({
+                'Id': query['Id'],
+                'Timestamps': [now - timedelta(minutes=minutes) for minutes, _ in points],
+                'Values': [value for _, value in points]
+            })
+        response = {'MetricDataResults': results}
+        if page == 0:
+            response['NextToken'] = 'page-2'
+        return response
+
+
+def test_get_endpoint_metrics_batches_and_orders_datapoints():
+    monitor = make_monitor()
+    monitor.cloudwatch = FakeCloudWatch({
+        'ModelLatency_p99': [(30, 7000000.0), (1, 2000.0), (120, 9000000.0), (5, 3000.0)],
+        'ModelInvocation5XXErrors': [(90, 2.0), (2, 0.0)],
+    })
+
+    metrics = monitor.get_endpoint_metrics(hours_back=3)
+
+    assert len(monitor.cloudwatch.calls) == 2
+    p99 = metrics['ModelLatency_p99']
+    assert p99['datapoints'] == 4
+    assert p99['latest_value'] == 2000.0
+    assert p99['recent_value'] == 7000000.0
+    assert p99['window_value'] == 9000000.0
+    assert metrics['ModelInvocation5XXErrors']['recent_value'] == 0.0
+    assert metrics['ModelInvocation5XXErrors']['window_value'] == 2.0
+    assert metrics['ColdStarts']['datapoints'] == 0
+    assert metrics['ColdStarts']['unit'] == 'count'
+    assert metrics['ModelSetupTime_p99']['unit'] == 'microseconds'
+
+
+def test_health_report_applies_latency_threshold_to_p99():
+    monitor = make_monitor()
+    monitor.cloudwatch = FakeCloudWatch({'ModelLatency_p99': [(10, 6000000.0), (20, 100.0)]})
+    monitor.check_endpoint_health = lambda: {'endpoint_name': 'test-endpoint', 'healthy': True}
+
+    report = monitor.generate_health_report()
+
+    assert report['overall_health']['endpoint_healthy']
+    assert not report['overall_health']['metrics_healthy']
+    assert report['overall_health']['status'] == 'unhealthy'
+
+
+def make_report(timestamp, latency, healthy=True):
+    return {
+        'timestamp': timestamp.isoformat(),
+        'endpoint_health': {'endpoint_name': 'test-endpoint', 'status': 'InService', 'healthy': healthy},
+        'metrics': {'ModelLatency_p99': {'recent_value': latency, 'unit': 'microseconds'}},
+        'data_capture_analysis': {'drift_indicators': {'drift_score': 'moderate'}},
+    }
+
+
+def test_report_store_compacts_and_queries_columns():
+    s3 = FakeS3()
+    store = ReportStore(s3, 'test-bucket', 'monitoring-reports/test-endpoint/columnar')
+    start = datetime(2024, 5, 1, 22)
+    for hour in range(6):
+        store.append(make_report(start + timedelta(hours=hour), 1000.0 * hour, healthy=hour != 3))
+
+    compacted = store.compact(min_segments=100, now=datetime(2024, 5, 2, 12))
+    # A late report for the compacted day stays as a segment until the next compaction
+    store.append(make_report(datetime(2024, 5, 1, 23, 30), 9999.0))
+    result = store.query(['metrics.ModelLatency_p99.recent_value', 'endpoint_health.healthy'],
+                         datetime(2024, 5, 1, 23), datetime(2024, 5, 2, 2))
+
+    assert compacted == {'2024-05-01': 2}
+    assert len([key for key in s3.objects if 'date=2024-05-01/segments/' in key]) == 1
+    assert store.days() == ['2024-05-01', '2024-05-02']
+    assert result['metrics.ModelLatency_p99.recent_value'].tolist() == [1000.0, 9999.0, 2000.0, 3000.0, 4000.0]
+    assert result['endpoint_health.healthy'].tolist() == [1.0, 1.0, 1.0, 0.0, 1.0]
+    # Only the requested columns of the compacted day were read
+    assert 'data_capture_analysis.drift_indicators.drift_score' not in result
+
+
+def test_report_store_keeps_reports_that_share_a_timestamp():
+    s3 = FakeS3()
+    store = ReportStore(s3, 'test-bucket', 'monitoring-reports/test-endpoint/columnar')
+    moment = datetime(2024, 5, 1, 12)
+    store.append(make_report(moment, 1000.0))
+    store.append(make_report(moment, 2000.0))
+
+    before = store.query(['metrics.ModelLatency_p99.recent_value'], moment, moment)
+    store.compact(min_segments=1, now=moment)
+    after = store.query(['metrics.ModelLatency_p99.recent_value'], moment, moment)
+
+    assert sorted(before['metrics.ModelLatency_p99.recent_value'].tolist()) == [1000.0, 2000.0]
+    assert sorted(after['metrics.ModelLatency_p99.recent_value'].tolist()) == [1000.0, 2000.0]
+    assert set(after) == {'timestamp', 'metrics.ModelLatency_p99.recent_value'}
+
+
+def test_kll_sketch_merge_tracks_quantiles():
+    rng = np.random.RandomState(3)
+    values = rng.lognormal(size=200_000)
+    merged = KLLSketch(seed=0)
+    for chunk in np.array_split(values, 16):
+        part = KLLSketch(seed=1)
+        part.update(chunk)
+        merged.merge(part)
+
+    levels = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    ranks = np.searchsorted(np.sort(values), merged.quantiles(levels)) / len(values)
+
+    assert merged.count == len(values)
+    assert np.abs(ranks - levels).max() < 0.02
+    assert merged.quantiles([0, 1]).tolist() == [values.min(), values.max()]
+    assert sum(len(level) for level in merged.levels) < 1000
+
+
+def test_capture_sketch_round_trips_bytes():
+    sketch = CaptureSketch(seed=0)
+    sketch.update_features(np.random.RandomState(0).normal(size=(5000, 3)))
+    sketch.update_probabilities([[0.9, 0.1], [0.35, 0.65]])
+
+    restored = CaptureSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.rows == 5000
+    assert restored.class_histogram.tolist() == sketch.class_histogram.tolist()
+    assert restored.summary(['a', 'b', 'c'])['feature_quantiles']['b'] == pytest.approx(
+        sketch.summary(['a', 'b', 'c'])['feature_quantiles']['b'], rel=1e-6)
+
+
+def test_summarize_capture_file_in_worker_process():
+    from concurrent.futures import ProcessPoolExecutor
+
+    capture_file = CaptureFile(
+        'data-capture/ep/primary/2024/03/05/17/file.jsonl', ['a,b\n1.0,2.0\n3.0,4.0'], ['CSV'],
+        [json.dumps({'predictions': [1, 0], 'probabilities': [[0.2, 0.8], [0.7, 0.3]]})]
+    )
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        summary = pool.submit(summarize_capture_file, capture_file, ['b', 'a']).result()
+
+    assert summary.hour == '2024-03-05T17'
+    assert summary.stats.mean.tolist() == [3.0, 2.0]
+    assert summary.sketch.rows == 2
+    assert summary.sketch.class_histogram.sum(axis=1).tolist() == [2, 2]
+
+
+def test_analyze_data_capture_persists_hourly_sketches():
+    now = datetime.utcnow()
+    monitor = make_monitor()
+    for offset in range(3):
+        hour = (now - timedelta(hours=offset)).strftime('%Y/%m/%d/%H')
+        rows = '\n'.join(f'{offset * 100 + i}.0,1.0' for i in range(100))
+        output = json.dumps({'predictions': [1], 'probabilities': [[0.05, 0.95]]})
+        monitor.s3.objects[f'data-capture/test-endpoint/primary/{hour}/file.jsonl'] = \
+            capture_line(f'a,b\n{rows}', output).encode()
+
+    analysis = monitor.analyze_data_capture(hours_back=3)
+    # Capture files are no longer needed to answer window queries
+    for key in [k for k in monitor.s3.objects if k.startswith('data-capture/')]:
+        del monitor.s3.objects[key]
+    window = monitor.sketch_window(now.replace(minute=0, second=0), now)
+
+    stored = [k for k in monitor.s3.objects if k.startswith('monitoring-state/test-endpoint/sketches/')]
+    assert len(stored) == 3
+    assert analysis['distribution']['rows'] == 300
+    assert analysis['distribution']['class_probability_histogram'][1][-1] == 3
+    assert window.rows == 100
+    assert window.features[0].quantiles([0.5])[0] == pytest.approx(50, abs=2)
+
+
+def test_hourly_sketches_count_each_file_once_when_a_save_fails():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    monitor = make_monitor({
+        f'data-capture/test-endpoint/primary/{hour}/file.jsonl': capture_line('a,b\n1.0,2.0\n3.0,4.0').encode(),
+    })
+    save_checkpoint = monitor.checkpoint_store.save
+    merge_sketch = monitor.sketch_store.add
+
+    def failing_once(real):
+        calls = []
+
+        def call(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'retry'}}, 'PutObject')
+            return real(*args, **kwargs)
+        return call
+
+    # The checkpoint save fails, so the file is read again on the next run
+    monitor.checkpoint_store.save = failing_once(save_checkpoint)
+    assert 'error' in monitor.analyze_data_capture(hours_back=1)
+    # The checkpoint is saved but merging its sketches fails; the next run finishes the merge
+    monitor.sketch_store.add = failing_once(merge_sketch)
+    assert monitor.analyze_data_capture(hours_back=1)['files_analyzed'] == 1
+    analysis = monitor.analyze_data_capture(hours_back=1)
+
+    assert analysis['files_analyzed'] == 0
+    assert analysis['distribution']['rows'] == 2
+    assert not [key for key in monitor.s3.objects if '/sketches/pending/' in key]
+
+
+def test_summary_workers_use_spawned_processes_until_closed():
+    hour = datetime.utcnow().strftime('%Y/%m/%d/%H')
+    with make_monitor({
+        f'data-capture/test-endpoint/primary/{hour}/file.jsonl': capture_line('a,b\n1.0,2.0').encode(),
+    }) as monitor:
+        monitor.summary_workers = 1
+        assert monitor.analyze_data_capture(hours_back=1)['rows_processed'] == 1
+        assert monitor._process_pool._mp_context.get_start_method() == 'spawn'
+    assert monitor._process_pool is None
@@ -0,0 +1,61 @@
+import sys
+import os
+import json
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.data.generate_data import generate_synthetic_data
+from src.local_backend import LocalS3
+from src.models.registry import (
+    LATEST_MANIFEST_KEY, ArtifactRegistry, artifact_hash, build_artifact, feature_schema, hash_from_uri
+)
+
+
+def train_artifact(tmp_path, name, baseline):
+    train_df, _ = generate_synthetic_data(n_samples=500)
+    X = train_df.drop('target', axis=1)
+    model = RandomForestClassifier(n_estimators=5, random_state=42).fit(X, train_df['target'])
+    workdir = tmp_path / name
+    workdir.mkdir()
+    joblib.dump(model, workdir / 'model.pkl', protocol=4)
+    (workdir / 'baseline.json').write_text(json.dumps(baseline))
+    tar_path = str(workdir / 'model.tar.gz')
+    digest = build_artifact({'model.pkl': str(workdir / 'model.pkl'),
+                             'baseline.json': str(workdir / 'baseline.json')}, tar_path)
+    return tar_path, digest, X
+
+
+def test_identical_retrain_is_not_uploaded_again(tmp_path):
+    s3 = LocalS3(str(tmp_path / 's3'))
+    registry = ArtifactRegistry(s3, 'bucket')
+    first_tar, first_hash, X = train_artifact(tmp_path, 'first', {'created_at': '2024-01-01'})
+    second_tar, second_hash, _ = train_artifact(tmp_path, 'second', {'created_at': '2024-02-01'})
+
+    # Only the served model counts; the baseline timestamp does not
+    assert first_hash == second_hash == artifact_hash(first_tar)
+
+    first = registry.register(first_tar, feature_schema(X), {'accuracy': 0.9})
+    second = registry.register(second_tar, feature_schema(X), {'accuracy': 0.9})
+
+    assert first['uploaded'] and not second['uploaded']
+    assert second['created_at'] == first['created_at']
+    assert second['artifact'] == f's3://bucket/models/artifacts/{first_hash}/model.tar.gz'
+    assert hash_from_uri(second['artifact']) == first_hash
+    assert registry.latest()['hash'] == first_hash
+    assert registry.latest()['feature_schema'][0] == {'name': 'feature_0', 'dtype': 'float32'}
+    keys = [obj['Key'] for obj in s3.list_objects_v2(Bucket='bucket', Prefix='models/')['Contents']]
+    assert sorted(keys) == sorted([f'models/artifacts/{first_hash}/manifest.json',
+                                   f'models/artifacts/{first_hash}/model.tar.gz', LATEST_MANIFEST_KEY])
+
+
+def test_build_artifact_is_reproducible(tmp_path):
+    first_tar, _, _ = train_artifact(tmp_path, 'first', {'created_at': '2024-01-01'})
+    second_tar, _, _ = train_artifact(tmp_path, 'second', {'created_at': '2024-01-01'})
+    with open(first_tar, 'rb') as first, open(second_tar, 'rb') as second:
+        assert first.read() == second.read()
+
+    assert hash_from_uri('s3://bucket/models/model.tar.gz') is None
+    assert hash_from_uri(None) is None
+    assert ArtifactRegistry(LocalS3(str(tmp_path / 'empty')), 'bucket').latest() is None
@@ -0,0 +1,136 @@
+import pytest
+import sys
+import os
+import json
+
+# Add project root and the training code directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'models'))
+from src.aws_clients import clear_clients, get_client
+from src.data.generate_data import generate_synthetic_data
+from src.local_backend import LocalS3
+from src.models.registry import artifact_hash, build_artifact
+from src.models.training_cache import data_fingerprint, source_hash, training_fingerprint
+import train
+
+
+@pytest.fixture
+def trainer(tmp_path, monkeypatch):
+    monkeypatch.setenv('MLOPS_AWS_BACKEND', 'local')
+    monkeypatch.setenv('MLOPS_LOCAL_ROOT', str(tmp_path))
+    for name in ('TRAINING_MODE', 'TRAINING_BINS', 'FEATURE_DTYPE'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(train.sagemaker, 'Session', lambda: None)
+    clear_clients()
+    s3 = get_client('s3')
+    train_df, test_df = generate_synthetic_data(n_samples=300)
+    s3.put_object(Bucket='bucket', Key='data/train.csv', Body=train_df.to_csv(index=False))
+    s3.put_object(Bucket='bucket', Key='data/test.csv', Body=test_df.to_csv(index=False))
+
+    fits = []
+    fit_model = train.fit_model
+    monkeypatch.setattr(train, 'fit_model', lambda *args, **kwargs: fits.append(args[2]) or fit_model(*args, **kwargs))
+    yield train.ModelTrainer('bucket', 'role'), s3, fits
+    clear_clients()
+
+
+def test_unchanged_training_inputs_reuse_the_stored_run(trainer, monkeypatch):
+    model_trainer, s3, fits = trainer
+
+    accuracy = model_trainer.train_local()
+    latest = json.loads(s3.get_object(Bucket='bucket', Key='models/manifest.json')['Body'].read())
+    s3.delete_object(Bucket='bucket', Key='models/baseline.json')
+
+    assert model_trainer.train_local() == accuracy
+    assert fits == ['exact']
+    reused = json.loads(s3.get_object(Bucket='bucket', Key='models/manifest.json')['Body'].read())
+    assert reused['hash'] == latest['hash']
+    assert reused['registered_at'] > latest['registered_at']
+    # The monitor's baseline is put back from the cached run
+    assert json.loads(s3.get_object(Bucket='bucket', Key='models/baseline.json')['Body'].read())['n_rows'] == 240
+
+    # New data, new settings or forcing all refit
+    model_trainer.train_local(force=True)
+    monkeypatch.setenv('TRAINING_MODE', 'binned')
+    monkeypatch.setenv('TRAINING_BINS', '16')
+    model_trainer.train_local()
+    model_trainer.train_local()
+    train_df, _ = generate_synthetic_data(n_samples=400)
+    s3.put_object(Bucket='bucket', Key='data/train.csv', Body=train_df.to_csv(index=False))
+    model_trainer.train_local()
+    assert fits == ['exact', 'exact', 'binned', 'binned']
+
+
+class FakeSKLearn:
+    """Training job whose output is a model.tar.gz in the local S3"""
+    jobs = []
+
+    def __init__(self, **kwargs):
+        self.model_data = None
+
+    def fit(self, inputs):
+        model_dir = os.path.join(os.environ['MLOPS_LOCAL_ROOT'], 'job-output')
+        os.makedirs(model_dir, exist_ok=True)
+        with open(os.path.join(model_dir, 'model.pkl'), 'wb') as f:
+            f.write(b'trained model')
+        with open(os.path.join(model_dir, 'baseline.json'), 'w') as f:
+            json.dump({'job': len(self.jobs)}, f)
+        build_artifact({'model.pkl': os.path.join(model_dir, 'model.pkl'),
+                        'baseline.json': os.path.join(model_dir, 'baseline.json')},
+                       os.path.join(model_dir, 'model.tar.gz'))
+        name = f'job-{len(self.jobs)}'
+        get_client('s3').upload_file(os.path.join(model_dir, 'model.tar.gz'), 'bucket', f'{name}/output/model.tar.gz')
+        self.jobs.append(name)
+        self.latest_training_job = type('Job', (), {'name': name})
+        self.model_data = f's3://bucket/{name}/output/model.tar.gz'
+
+    @classmethod
+    def attach(cls, training_job, sagemaker_session=None):
+        estimator = cls()
+        estimator.model_data = f's3://bucket/{training_job}/output/model.tar.gz'
+        return estimator
+
+
+def test_sagemaker_training_registers_the_job_output(trainer, monkeypatch):
+    model_trainer, s3, _ = trainer
+    FakeSKLearn.jobs = []
+    monkeypatch.setattr(train, 'SKLearn', FakeSKLearn)
+
+    estimator = model_trainer.train_sagemaker()
+    manifest = json.loads(s3.get_object(Bucket='bucket', Key='models/manifest.json')['Body'].read())
+    assert manifest['hash'] == artifact_hash(os.path.join(os.environ['MLOPS_LOCAL_ROOT'], 'job-output',
+                                                          'model.tar.gz'))
+    assert manifest['artifact'] == f"s3://bucket/models/artifacts/{manifest['hash']}/model.tar.gz"
+    s3.head_object(Bucket='bucket', Key=f"models/artifacts/{manifest['hash']}/model.tar.gz")
+    assert json.loads(s3.get_object(Bucket='bucket', Key='models/baseline.json')['Body'].read()) == {'job': 0}
+
+    # An identical rerun attaches to the job and points the manifest and baseline back at its model
+    s3.delete_object(Bucket='bucket', Key='models/manifest.json')
+    s3.put_object(Bucket='bucket', Key='models/baseline.json', Body=json.dumps({'job': 'local'}))
+    assert model_trainer.train_sagemaker().model_data == estimator.model_data
+    assert FakeSKLearn.jobs == ['job-0']
+    assert json.loads(s3.get_object(Bucket='bucket', Key='models/manifest.json')['Body'].read())['hash'] == \
+        manifest['hash']
+    assert json.loads(s3.get_object(Bucket='bucket', Key='models/baseline.json')['Body'].read()) == {'job': 0}
+
+
+def test_fingerprint_covers_data_settings_and_code(tmp_path):
+    s3 = LocalS3(str(tmp_path / 's3'))
+    s3.put_object(Bucket='bucket', Key='data/train.csv', Body='a,target\n1,0\n')
+    s3.put_object(Bucket='bucket', Key='data/test.csv', Body='a,target\n2,1\n')
+    data = data_fingerprint(s3, 'bucket')
+    code_dir = tmp_path / 'code'
+    code_dir.mkdir()
+    (code_dir / 'train_script.py').write_text('print(1)\n')
+    code = source_hash(str(code_dir))
+
+    fingerprint = training_fingerprint(data, {'n_estimators': 100, 'random_state': 42}, code)
+    assert fingerprint == training_fingerprint(data, {'random_state': 42, 'n_estimators': 100}, code)
+    assert fingerprint != training_fingerprint(data, {'n_estimators': 50, 'random_state': 42}, code)
+    assert fingerprint != training_fingerprint(data, {'n_estimators': 100, 'random_state': 42}, code,
+                                               {'sklearn': '1.0.2'})
+
+    s3.put_object(Bucket='bucket', Key='data/test.csv', Body='a,target\n3,1\n')
+    assert data_fingerprint(s3, 'bucket')['data/test.csv'] != data['data/test.csv']
+    (code_dir / 'train_script.py').write_text('print(2)\n')
+    assert source_hash(str(code_dir)) != code